@@ -0,0 +1,399 @@
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout, redirect_stderr
+from datetime import timedelta
+from types import SimpleNamespace
+from rate_limit import RateLimitStatus
+
+
+# Throughput metrics compared against a baseline; lower values are regressions
+THROUGHPUT_METRICS = ("pages_per_second", "rows_per_second", "chars_per_second")
+
+
+def load_corpus(pattern="../data/*.csv", scale=1):
+    """
+    Builds a replayable tweet corpus from crawler output files.
+
+    Both the current and the legacy column names ('Created At', 'Tweet Id', 'Text') are read.
+    The corpus is repeated `scale` times, each copy shifted back in time, and tweets get
+    fresh descending ids, so pages look like those of a long crawl.
+
+    Args:
+        pattern (str, optional): Glob pattern of the CSV files. Default is "../data/*.csv".
+        scale (int, optional): Number of copies of the files' tweets. Default is 1.
+
+    Returns:
+        list: Tweets as dicts with the fields of the Twitter API, newest first.
+
+    Raises:
+        FileNotFoundError: If no file matches `pattern`.
+    """
+    import pandas as pd
+
+    paths = sorted(glob.glob(pattern))
+    if not paths:
+        raise FileNotFoundError(f"No crawler output matches {pattern}")
+
+    df = pd.concat([pd.read_csv(path) for path in paths], ignore_index=True)
+    df = df.rename(columns={"Created At": "created_at", "Tweet Id": "tweet_id", "Text": "text"})
+    df["created_at"] = pd.to_datetime(df["created_at"], utc=True)
+    df = df.sort_values("created_at", ascending=False, ignore_index=True)
+    span = df["created_at"].max() - df["created_at"].min() + timedelta(seconds=1)
+
+    corpus = []
+    first_id = 1_800_000_000_000_000_000
+    for copy in range(scale):
+        for row in df.itertuples(index=False):
+            corpus.append({
+                "id": first_id - len(corpus),
+                "created_at": (row.created_at - copy * span).to_pydatetime(),
+                "author_id": int(row.author_id),
+                "text": row.text,
+                "lang": row.lang,
+                "public_metrics": {"retweet_count": int(row.retweet_count), "like_count": int(row.like_count)},
+            })
+    return corpus
+
+
+class FakeTwitterClient:
+    """
+    Stand-in for the Twitter API client that replays a corpus page by page.
+
+    `search_recent_tweets` has the signature and response shape of tweepy's, so
+    `recent_tweets_crawler` runs unchanged against it. The query is ignored; pages are
+    cut from the corpus by `max_results`, `next_token` and `since_id`. Every request
+    sleeps `latency` seconds. With `requests_per_window` set, the client reports rate
+    limit headers like the API and raises `tweepy.TooManyRequests` when a window is exhausted.
+
+    Args:
+        corpus (list): Tweets from `load_corpus`, newest first.
+        latency (float, optional): Seconds per request. Default is 0.05.
+        requests_per_window (int, optional): Requests per rate limit window, None for no limit. Default is None.
+        window_seconds (float, optional): Length of the rate limit window in seconds. Default is 900.
+    """
+
+    def __init__(self, corpus, latency=0.05, requests_per_window=None, window_seconds=900):
+        self.corpus = corpus
+        self.latency = latency
+        self.requests_per_window = requests_per_window
+        self.window_seconds = window_seconds
+        self.requests = 0
+
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._window_start = time.time()
+        self._window_requests = 0
+
+    @property
+    def rate_limit(self):
+        """RateLimitStatus or None: Rate limit state reported with the last response of this thread."""
+        return getattr(self._local, "rate_limit", None)
+
+    def _take_request(self):
+        if self.requests_per_window is None:
+            return
+        with self._lock:
+            now = time.time()
+            if now >= self._window_start + self.window_seconds:
+                self._window_start, self._window_requests = now, 0
+            reset = int(self._window_start + self.window_seconds)
+            if self._window_requests >= self.requests_per_window:
+                raise _too_many_requests(self.requests_per_window, reset)
+            self._window_requests += 1
+            self._local.rate_limit = RateLimitStatus(
+                self.requests_per_window, self.requests_per_window - self._window_requests, reset
+            )
+
+    def search_recent_tweets(self, query, max_results=10, next_token=None, since_id=None, **kwargs):
+        import tweepy
+
+        self._take_request()
+        time.sleep(self.latency)
+        with self._lock:
+            self.requests += 1
+
+        start = int(next_token or 0)
+        page = self.corpus[start: start + max_results]
+        if since_id is not None:
+            page = [tweet for tweet in page if tweet["id"] > int(since_id)]
+        end = start + max_results
+        more = bool(page) and end < len(self.corpus) and (since_id is None or self.corpus[end - 1]["id"] > int(since_id))
+
+        tweets = [SimpleNamespace(**tweet) for tweet in page]
+        users = [
+            SimpleNamespace(id=author_id, username=f"user{author_id}", name=f"User {author_id}")
+            for author_id in {tweet["author_id"] for tweet in page}
+        ]
+        meta = {"result_count": len(tweets)}
+        if tweets:
+            meta.update(newest_id=str(tweets[0].id), oldest_id=str(tweets[-1].id))
+        if more:
+            meta["next_token"] = str(end)
+        return tweepy.Response(data=tweets or None, includes={"users": users}, errors=[], meta=meta)
+
+
+def _too_many_requests(limit, reset):
+    """Builds the error tweepy raises for a 429 response with rate limit headers."""
+    import requests
+    import tweepy
+
+    response = requests.Response()
+    response.status_code = 429
+    response.reason = "Too Many Requests"
+    response.headers.update({"x-rate-limit-limit": str(limit), "x-rate-limit-remaining": "0",
+                             "x-rate-limit-reset": str(reset)})
+    response._content = b'{"title": "Too Many Requests", "detail": "Too Many Requests"}'
+    return tweepy.TooManyRequests(response)
+
+
+class FakeTranslationClient:
+    """
+    Stand-in for `translate.TranslationServiceClient` with a latency per request and per character.
+
+    Args:
+        latency (float, optional): Seconds per request. Default is 0.05.
+        seconds_per_char (float, optional): Additional seconds per source character. Default is 2e-6.
+    """
+
+    def __init__(self, latency=0.05, seconds_per_char=2e-6):
+        self.latency = latency
+        self.seconds_per_char = seconds_per_char
+        self.requests = 0
+        self.chars = 0
+        self._lock = threading.Lock()
+
+    def translate_text(self, request):
+        contents = request["contents"]
+        chars = sum(len(text) for text in contents)
+        time.sleep(self.latency + chars * self.seconds_per_char)
+        with self._lock:
+            self.requests += 1
+            self.chars += chars
+        return SimpleNamespace(translations=[SimpleNamespace(translated_text=f"en: {text}") for text in contents])
+
+
+class FakeModelPipeline:
+    """
+    Stand-in for a translation pipeline of `translator_gpu` with a cost per padded token.
+
+    A batch costs `seconds_per_token * batch size * longest input`, like a padded batch on
+    a GPU or CPU, so the benchmark reflects how well texts are bucketed. Tokens are
+    whitespace separated words.
+
+    Args:
+        seconds_per_token (float, optional): Seconds per padded token. Default is 2e-5.
+        load_seconds (float, optional): Model load time in seconds, spent on creation. Default is 0.0.
+    """
+
+    def __init__(self, seconds_per_token=2e-5, load_seconds=0.0):
+        self.seconds_per_token = seconds_per_token
+        self.padded_tokens = 0
+        time.sleep(load_seconds)
+
+    def tokenizer(self, texts, truncation=True):
+        return {"input_ids": [list(range(len(text.split()) + 1)) for text in texts]}
+
+    def __call__(self, texts, batch_size=32):
+        lengths = [len(ids) for ids in self.tokenizer(texts)["input_ids"]]
+        padded_tokens = len(texts) * max(lengths, default=0)
+        self.padded_tokens += padded_tokens
+        time.sleep(padded_tokens * self.seconds_per_token)
+        return [{"translation_text": f"en: {text}"} for text in texts]
+
+
+def arabic_texts(corpus):
+    """Returns the preprocessed texts of the Arabic tweets of a corpus, as the translators send them."""
+    import pandas as pd
+    from preprocessing import preprocess_arabic
+
+    return preprocess_arabic(pd.Series([tweet["text"] for tweet in corpus if tweet["lang"] == "ar"])).tolist()
+
+
+def bench_crawler(corpus, options):
+    """Crawls the whole corpus with `recent_tweets_crawler`."""
+    from utils import recent_tweets_crawler
+
+    client = FakeTwitterClient(corpus, latency=options.twitter_latency,
+                               requests_per_window=options.requests_per_window, window_seconds=options.window_seconds)
+    with tempfile.TemporaryDirectory() as folder_path:
+        recent_tweets_crawler(client, "benchmark", tweets_limit=len(corpus), folder_path=folder_path,
+                              tweets_per_request=options.tweets_per_request, output_format=options.output_format)
+    return {"pages": client.requests, "rows": len(corpus), "chars": 0}
+
+
+def bench_batch_translate(corpus, options):
+    """Translates the Arabic tweets of the corpus with `translator_api.batch_translate`."""
+    from translator_api import batch_translate
+
+    texts = arabic_texts(corpus)
+    client = FakeTranslationClient(latency=options.translation_latency, seconds_per_char=options.seconds_per_char)
+    batch_translate(client, "projects/benchmark/locations/global", texts, batch_size=options.batch_size,
+                    max_workers=options.workers)
+    return {"pages": client.requests, "rows": len(texts), "chars": client.chars}
+
+
+def bench_model_translate(corpus, options):
+    """Translates the Arabic tweets of the corpus with `translator_gpu.bucketed_translate`."""
+    from translator_gpu import bucketed_translate
+
+    texts = arabic_texts(corpus)
+    pipe = FakeModelPipeline(seconds_per_token=options.seconds_per_token, load_seconds=options.model_load_seconds)
+    bucketed_translate(pipe, texts, max_batch_size=options.model_batch_size, progress=False)
+    return {"pages": 0, "rows": len(texts), "chars": sum(len(text) for text in texts)}
+
+
+def bench_pipeline(corpus, options):
+    """Crawls and translates the corpus in one process, as `pipeline.py` does with a local model."""
+    from utils import recent_tweets_crawler, tweet_columns
+    from translator_gpu import bucketed_translate
+    from pipeline import row_translator
+
+    client = FakeTwitterClient(corpus, latency=options.twitter_latency,
+                               requests_per_window=options.requests_per_window, window_seconds=options.window_seconds)
+    pipe = FakeModelPipeline(seconds_per_token=options.seconds_per_token, load_seconds=options.model_load_seconds)
+    translate = lambda texts: bucketed_translate(pipe, texts, max_batch_size=options.model_batch_size, progress=False)
+    with tempfile.TemporaryDirectory() as folder_path:
+        recent_tweets_crawler(client, "benchmark", tweets_limit=len(corpus), folder_path=folder_path,
+                              tweets_per_request=options.tweets_per_request, output_format=options.output_format,
+                              enrich=row_translator(translate, tweet_columns()), enrich_columns=["en_translation"])
+    return {"pages": client.requests, "rows": len(corpus), "chars": sum(len(text) for text in arabic_texts(corpus))}
+
+
+BENCHMARKS = {
+    "crawler": bench_crawler,
+    "batch_translate": bench_batch_translate,
+    "model_translate": bench_model_translate,
+    "pipeline": bench_pipeline,
+}
+
+
+def run_benchmark(name, options):
+    """
+    Runs one benchmark and measures it. Meant to run in a fresh process, so the peak RSS is its own.
+
+    Args:
+        name (str): Key of `BENCHMARKS`.
+        options (argparse.Namespace): Benchmark settings (see the command line arguments).
+
+    Returns:
+        dict: Pages, rows and characters processed, their rates per second, `seconds`
+            end to end (corpus loading excluded) and `peak_rss_mb`.
+    """
+    import resource
+
+    corpus = load_corpus(options.data, scale=options.scale)
+    with open(os.devnull, "w") as devnull, \
+            redirect_stdout(sys.stdout if options.verbose else devnull), \
+            redirect_stderr(sys.stderr if options.verbose else devnull):
+        start = time.perf_counter()
+        result = BENCHMARKS[name](corpus, options)
+        seconds = time.perf_counter() - start
+
+    result.update(
+        seconds=seconds,
+        pages_per_second=result["pages"] / seconds,
+        rows_per_second=result["rows"] / seconds,
+        chars_per_second=result["chars"] / seconds,
+        # ru_maxrss is in kilobytes on Linux
+        peak_rss_mb=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    )
+    return result
+
+
+def run_benchmarks(names, options):
+    """
+    Runs benchmarks, each in its own spawned process.
+
+    Args:
+        names (list): Keys of `BENCHMARKS`.
+        options (argparse.Namespace): Benchmark settings.
+
+    Returns:
+        dict: Results of `run_benchmark` by name.
+    """
+    context = multiprocessing.get_context("spawn")
+    results = {}
+    for name in names:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            results[name] = executor.submit(run_benchmark, name, options).result()
+    return results
+
+
+def print_results(results):
+    """Prints benchmark results as a table."""
+    print(f"{'benchmark':<16} {'seconds':>8} {'pages/s':>9} {'rows/s':>10} {'chars/s':>11} {'peak RSS':>9}")
+    for name, result in results.items():
+        print(f"{name:<16} {result['seconds']:>8.2f} {result['pages_per_second']:>9.1f} "
+              f"{result['rows_per_second']:>10.1f} {result['chars_per_second']:>11.0f} {result['peak_rss_mb']:>7.1f}MB")
+
+
+def find_regressions(results, baseline, tolerance=0.2):
+    """
+    Compares throughput with an earlier run.
+
+    Args:
+        results (dict): Results of `run_benchmarks`.
+        baseline (dict): Results of an earlier run, e.g. loaded from a `--save` file.
+        tolerance (float, optional): Allowed relative drop of a throughput metric. Default is 0.2.
+
+    Returns:
+        list: Descriptions of the metrics that dropped by more than `tolerance`.
+    """
+    regressions = []
+    for name, result in results.items():
+        for metric in THROUGHPUT_METRICS:
+            before = baseline.get(name, {}).get(metric)
+            if before and result[metric] < before * (1 - tolerance):
+                regressions.append(f"{name} {metric}: {result[metric]:.1f} (baseline {before:.1f})")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark crawling and translation offline against stand-in backends.")
+    parser.add_argument("benchmarks", nargs="*", default=list(BENCHMARKS),
+                        help=f"Benchmarks to run: {', '.join(BENCHMARKS)}. Default is all.")
+    parser.add_argument("--data", default="../data/*.csv", help="Glob pattern of the replayed CSV files. Default is ../data/*.csv.")
+    parser.add_argument("--scale", type=int, default=20, help="Number of copies of the replayed tweets. Default is 20.")
+    parser.add_argument("--tweets-per-request", type=int, default=100, help="Tweets per page. Default is 100.")
+    parser.add_argument("--twitter-latency", type=float, default=0.05, help="Seconds per Twitter request. Default is 0.05.")
+    parser.add_argument("--requests-per-window", type=int, default=None, help="Twitter requests per rate limit window. Default is no limit.")
+    parser.add_argument("--window-seconds", type=float, default=900, help="Length of the rate limit window in seconds. Default is 900.")
+    parser.add_argument("--output-format", choices=["csv", "parquet"], default="csv", help="Crawler output format. Default is csv.")
+    parser.add_argument("--translation-latency", type=float, default=0.05, help="Seconds per translation request. Default is 0.05.")
+    parser.add_argument("--seconds-per-char", type=float, default=2e-6, help="Translation seconds per character. Default is 2e-6.")
+    parser.add_argument("--batch-size", type=int, default=20, help="Texts per translation request. Default is 20.")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent translation requests. Default is 4.")
+    parser.add_argument("--seconds-per-token", type=float, default=2e-5, help="Model seconds per padded token. Default is 2e-5.")
+    parser.add_argument("--model-batch-size", type=int, default=64, help="Texts per model batch. Default is 64.")
+    parser.add_argument("--model-load-seconds", type=float, default=0.0, help="Model load time in seconds. Default is 0.")
+    parser.add_argument("--save", help="Write the results to this JSON file.")
+    parser.add_argument("--baseline", help="JSON file of an earlier run; exit with status 1 if throughput dropped.")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative throughput drop. Default is 0.2.")
+    parser.add_argument("--verbose", action="store_true", help="Show the output of the benchmarked code.")
+    args = parser.parse_args()
+
+    unknown = [name for name in args.benchmarks if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"Unknown benchmarks: {', '.join(unknown)}")
+
+    results = run_benchmarks(args.benchmarks, args)
+    print_results(results)
+
+    if args.save:
+        with open(args.save, "w") as file:
+            json.dump(results, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = find_regressions(results, json.load(file), tolerance=args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        sys.exit(1 if regressions else 0)
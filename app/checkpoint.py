@@ -0,0 +1,76 @@
+import os
+import json
+import hashlib
+from datetime import datetime
+
+
+def checkpoint_path(folder_path, query):
+    """
+    Returns the path of the checkpoint file of a query.
+
+    Args:
+        folder_path (str): Crawler output folder. Checkpoints are kept in its '.checkpoints' subfolder.
+        query (str): Twitter search query string.
+
+    Returns:
+        str: Path to '<folder_path>/.checkpoints/<query hash>.json'.
+    """
+    query_hash = hashlib.sha1(query.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(folder_path, ".checkpoints", f"{query_hash}.json")
+
+
+def load_checkpoint(path):
+    """
+    Loads a crawl checkpoint.
+
+    Args:
+        path (str): Path to the checkpoint file.
+
+    Returns:
+        dict or None: Checkpoint state, or None if there is no checkpoint.
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+
+def save_checkpoint(path, state):
+    """
+    Atomically writes a crawl checkpoint.
+
+    The state is written to a temporary file which then replaces the checkpoint,
+    so a killed process leaves either the old or the new checkpoint, never a partial one.
+
+    Args:
+        path (str): Path to the checkpoint file.
+        state (dict): JSON serializable checkpoint state. Keys used by the crawler:
+            query, file_name, output_format, since_id, next_token, newest_id, oldest_id,
+            row_count, output_size (bytes of a CSV output) and completed.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    state = dict(state, updated_at=datetime.now().isoformat(timespec="seconds"))
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        json.dump(state, file, indent=2)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, path)
+
+
+def update_id_range(state, meta):
+    """
+    Widens the newest/oldest tweet id range of a checkpoint with a response page.
+
+    Args:
+        state (dict): Checkpoint state with 'newest_id' and 'oldest_id' (str or None).
+        meta (dict): Response meta with 'newest_id' and 'oldest_id'.
+    """
+    newest_id = meta.get("newest_id")
+    oldest_id = meta.get("oldest_id")
+
+    if newest_id is not None and (state["newest_id"] is None or int(newest_id) > int(state["newest_id"])):
+        state["newest_id"] = str(newest_id)
+    if oldest_id is not None and (state["oldest_id"] is None or int(oldest_id) < int(state["oldest_id"])):
+        state["oldest_id"] = str(oldest_id)
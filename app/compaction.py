@@ -0,0 +1,227 @@
+import os
+import time
+import argparse
+from checkpoint import load_checkpoint, save_checkpoint
+from storage import (LEGACY_COLUMNS, ID_COLUMNS, COUNT_COLUMNS, apply_tweet_schema, parquet_schema, output_files,
+                     hive_partitions, is_parquet)
+
+
+# Columns of the archive, in file order; other columns of the run files are dropped
+ARCHIVE_COLUMNS = ["created_at", "tweet_id", "author_id", "username", "name", "text", "lang", "retweet_count",
+                   "like_count", "en_translation", "matched_seeds", "source", "context_annotations", "geo"]
+
+# Archive columns stored as text
+TEXT_COLUMNS = [column for column in ARCHIVE_COLUMNS if column not in ["created_at"] + ID_COLUMNS + COUNT_COLUMNS]
+
+# File listing the compacted run files; hidden, so dataset readers skip it
+MANIFEST_FILE_NAME = ".compaction.json"
+
+# Name of the single file of every day of the archive
+PARTITION_FILE_NAME = "part-0.parquet"
+
+
+def archive_schema():
+    """Returns the Arrow schema of the archive files."""
+    return parquet_schema(ARCHIVE_COLUMNS)
+
+
+def normalize_tweets(df):
+    """
+    Brings a run file or an archive partition to the archive columns and types.
+
+    Args:
+        df (pandas.DataFrame): Tweets with current or legacy column names.
+
+    Returns:
+        pandas.DataFrame: Tweets with exactly `ARCHIVE_COLUMNS`; missing columns are null and
+            rows without a tweet id are dropped.
+    """
+    df = apply_tweet_schema(df.rename(columns=LEGACY_COLUMNS).reindex(columns=ARCHIVE_COLUMNS))
+    for column in TEXT_COLUMNS:
+        df[column] = df[column].astype("string")
+    return df[df["tweet_id"].notna()]
+
+
+def read_run_file(path):
+    """
+    Reads a CSV run file or a Parquet part file for compaction.
+
+    CSV values are read as text, so ids are parsed exactly even in columns with missing values.
+    Hive partition values of Parquet part files (e.g. `lang`) are added as columns.
+
+    Args:
+        path (str): Path to the file.
+
+    Returns:
+        pandas.DataFrame: Normalized tweets, see `normalize_tweets`.
+    """
+    import pandas as pd
+
+    if not is_parquet(path):
+        return normalize_tweets(pd.read_csv(path, dtype=str))
+    df = pd.read_parquet(path)
+    for column, value in hive_partitions(path).items():
+        if column not in df.columns:
+            df[column] = value
+    return normalize_tweets(df)
+
+
+def deduplicate(df):
+    """
+    Keeps one row per tweet id with the latest non-null value of every column.
+
+    A translated row is thereby preferred over untranslated ones: its translation is kept
+    even if the tweet was crawled again later, while the later crawl still updates the
+    engagement counts.
+
+    Args:
+        df (pandas.DataFrame): Normalized tweets in the order they were written.
+
+    Returns:
+        pandas.DataFrame: Unique tweets.
+    """
+    import pandas as pd
+
+    duplicated = df["tweet_id"].duplicated(keep=False)
+    if not duplicated.any():
+        return df
+
+    # Only the duplicated ids are grouped; `last` takes the last non-null value of every column
+    merged = df[duplicated].groupby("tweet_id", sort=False).last().reset_index()
+    return pd.concat([df[~duplicated], merged[ARCHIVE_COLUMNS]], ignore_index=True)
+
+
+def write_partition(df, path):
+    """
+    Atomically writes one day of the archive, sorted by creation time and tweet id.
+
+    Args:
+        df (pandas.DataFrame): Unique normalized tweets of the day.
+        path (str): Path of the partition file.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    df = df.sort_values(["created_at", "tweet_id"], na_position="first")
+    table = pa.Table.from_pandas(df, schema=archive_schema(), preserve_index=False)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    pq.write_table(table, tmp_path, compression="zstd", row_group_size=100_000)
+    with open(tmp_path, "rb") as file:
+        os.fsync(file.fileno())
+    os.replace(tmp_path, path)
+
+
+def compact(sources, archive_path, min_age_seconds=300, delete_sources=False):
+    """
+    Merges run files added since the last compaction into the archive.
+
+    The archive is a Parquet dataset with one zstd compressed file per day of `created_at`
+    ('<archive_path>/date=YYYY-MM-DD/part-0.parquet'), sorted by creation time and tweet id
+    and holding every tweet once. Run files of the crawler and the translators (CSV files
+    and Parquet part files, with current or legacy headers) are recorded in a manifest with
+    their size and modification time; only new or changed files are read, and only the days
+    they contain are rewritten. Tweets found in several files are merged by `deduplicate`.
+
+    Each day is replaced atomically and the manifest is saved after all days, so an
+    interrupted compaction is simply repeated by the next run.
+
+    Args:
+        sources (list): Folders or files with run outputs.
+        archive_path (str): Folder of the archive. It is never read as a source.
+        min_age_seconds (float, optional): Files modified more recently are left for the next
+            compaction, as a crawler may still be writing them. Default is 300.
+        delete_sources (bool, optional): Delete run files once they are in the archive, including files
+            compacted by earlier runs that are unchanged since. Default is False.
+
+    Returns:
+        tuple: Number of compacted files and number of tweets in the rewritten days.
+
+    Example:
+        compact(["./data", "./output"], "./archive")
+        df = read_tweets("./archive", filters=[("date", ">=", "2023-10-17")])
+    """
+    manifest_path = os.path.join(archive_path, MANIFEST_FILE_NAME)
+    manifest = load_checkpoint(manifest_path) or {"files": {}}
+
+    new_files = []
+    for source in sources:
+        for path in output_files(source, exclude=[archive_path]):
+            path = os.path.abspath(path)
+            stat = os.stat(path)
+            if manifest["files"].get(path) == [stat.st_size, stat.st_mtime]:
+                continue
+            if time.time() - stat.st_mtime < min_age_seconds:
+                print(f"Skipping {path}, modified less than {min_age_seconds}s ago.")
+                continue
+            new_files.append((stat.st_mtime, path, stat))
+    rows = 0
+    if new_files:
+        rows = merge_files(sorted(new_files), archive_path)
+        for _, path, stat in new_files:
+            manifest["files"][path] = [stat.st_size, stat.st_mtime]
+        save_checkpoint(manifest_path, manifest)
+    else:
+        print("No new run files.")
+
+    if delete_sources:
+        # Only files that are unchanged since they were compacted
+        deleted = 0
+        for path, (size, mtime) in list(manifest["files"].items()):
+            if os.path.exists(path) and (os.path.getsize(path), os.path.getmtime(path)) == (size, mtime):
+                os.remove(path)
+                deleted += 1
+            del manifest["files"][path]
+        save_checkpoint(manifest_path, manifest)
+        print(f"Deleted {deleted} compacted run files.")
+    return len(new_files), rows
+
+
+def merge_files(new_files, archive_path):
+    """
+    Merges run files into the days of the archive they contain.
+
+    Args:
+        new_files (list): (mtime, path, stat) tuples, oldest first so rows of later runs win ties in `deduplicate`.
+        archive_path (str): Folder of the archive.
+
+    Returns:
+        int: Number of tweets in the rewritten days.
+    """
+    import pandas as pd
+
+    frames = []
+    for _, path, _ in new_files:
+        df = read_run_file(path)
+        print(f"Read {len(df)} tweets from {path}.")
+        frames.append(df)
+    tweets = deduplicate(pd.concat(frames, ignore_index=True))
+    days = tweets["created_at"].dt.strftime("%Y-%m-%d").fillna("unknown")
+
+    rows = 0
+    for day, day_tweets in tweets.groupby(days, sort=True):
+        partition_path = os.path.join(archive_path, f"date={day}", PARTITION_FILE_NAME)
+        if os.path.exists(partition_path):
+            # Archived rows come first, new rows are preferred
+            day_tweets = deduplicate(pd.concat([normalize_tweets(pd.read_parquet(partition_path)), day_tweets],
+                                               ignore_index=True))
+        write_partition(day_tweets, partition_path)
+        rows += len(day_tweets)
+        print(f"Wrote {len(day_tweets)} tweets to {partition_path}.")
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Merge new run files into a sorted, deduplicated Parquet archive.")
+    parser.add_argument("sources", nargs="*", default=["./data", "./output"], help="Folders or files with run outputs. Default is ./data and ./output.")
+    parser.add_argument("--archive-path", type=str, default="./archive", help="Archive folder. Default is './archive'.")
+    parser.add_argument("--min-age", type=float, default=300, help="Skip files modified less than this many seconds ago. Default is 300.")
+    parser.add_argument("--delete-sources", action="store_true", help="Delete run files once they are in the archive.")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    files, rows = compact([source for source in args.sources if os.path.exists(source)], args.archive_path,
+                          min_age_seconds=args.min_age, delete_sources=args.delete_sources)
+    print(f"Compacted {files} files into {args.archive_path} ({rows} tweets in rewritten days) "
+          f"in {time.perf_counter() - start:.1f}s.")
@@ -0,0 +1,195 @@
+import os
+import math
+import sqlite3
+import struct
+import threading
+
+
+# Odd 64-bit multipliers for the double hashing of tweet ids
+HASH_MULTIPLIER_1 = 0x9E3779B97F4A7C15
+HASH_MULTIPLIER_2 = 0xC2B2AE3D27D4EB4F
+MASK_64 = (1 << 64) - 1
+
+
+class BloomFilter:
+    """
+    In-memory Bloom filter over integer ids.
+
+    Args:
+        capacity (int): Expected number of ids.
+        error_rate (float, optional): Target false positive rate. Default is 0.01.
+    """
+
+    def __init__(self, capacity, error_rate=0.01):
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, value):
+        h1 = (value * HASH_MULTIPLIER_1) & MASK_64
+        h2 = ((value * HASH_MULTIPLIER_2) & MASK_64) | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, value):
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, value):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+    def save(self, path, count):
+        """Writes the filter and the number of ids it was built from to `path`."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(struct.pack("<QQQI", count, self.capacity, self.size, self.hashes))
+            file.write(self.bits)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Reads a filter written by `save`.
+
+        Returns:
+            tuple: (BloomFilter, count) or (None, None) if the file does not exist.
+        """
+        if not os.path.exists(path):
+            return None, None
+        with open(path, "rb") as file:
+            count, capacity, size, hashes = struct.unpack("<QQQI", file.read(struct.calcsize("<QQQI")))
+            bloom = cls.__new__(cls)
+            bloom.capacity, bloom.size, bloom.hashes = capacity, size, hashes
+            bloom.bits = bytearray(file.read())
+        return bloom, count
+
+
+class TweetIdIndex:
+    """
+    On-disk index of tweet ids seen across runs.
+
+    Ids are stored in an SQLite table (one table per namespace, e.g. "stored" for crawled
+    tweets and "translated" for translated tweets). A Bloom filter in front of the table
+    answers most lookups of new ids in memory, so only probable duplicates hit SQLite.
+    The filter is saved next to the database on close and rebuilt if it is missing or stale.
+
+    Added ids become durable on `commit`; call it once the corresponding rows are written,
+    so a crash never marks rows as stored that did not reach the output.
+
+    Args:
+        path (str): Path to the SQLite database file.
+        namespace (str, optional): Name of the id set. Default is "stored".
+        error_rate (float, optional): False positive rate of the Bloom filter. Default is 0.01.
+
+    Example:
+        with TweetIdIndex("./data/tweet_ids.sqlite") as index:
+            new_ids = [tweet_id for tweet_id in ids if tweet_id not in index]
+            index.add_many(new_ids)
+            index.commit()
+    """
+
+    def __init__(self, path, namespace="stored", error_rate=0.01):
+        if not namespace.isidentifier():
+            raise ValueError(f"Invalid namespace: {namespace}")
+
+        self.path = path
+        self.namespace = namespace
+        self.error_rate = error_rate
+        self.bloom_path = f"{path}.{namespace}.bloom"
+
+        self._lock = threading.RLock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(f"CREATE TABLE IF NOT EXISTS {namespace} (tweet_id INTEGER PRIMARY KEY)")
+        self._connection.commit()
+
+        self._count = self._connection.execute(f"SELECT COUNT(*) FROM {namespace}").fetchone()[0]
+        self._bloom, bloom_count = BloomFilter.load(self.bloom_path)
+        if self._bloom is None or bloom_count != self._count or self._count > self._bloom.capacity:
+            self._rebuild_bloom()
+
+    def _rebuild_bloom(self):
+        self._bloom = BloomFilter(max(1_000_000, 2 * self._count), self.error_rate)
+        for (tweet_id,) in self._connection.execute(f"SELECT tweet_id FROM {self.namespace}"):
+            self._bloom.add(tweet_id)
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, tweet_id):
+        tweet_id = int(tweet_id)
+        with self._lock:
+            if tweet_id not in self._bloom:
+                return False
+            query = f"SELECT 1 FROM {self.namespace} WHERE tweet_id = ?"
+            return self._connection.execute(query, (tweet_id,)).fetchone() is not None
+
+    def add_many(self, tweet_ids):
+        """
+        Adds ids to the index. They are visible to lookups at once and durable after `commit`.
+
+        Args:
+            tweet_ids (Iterable[int]): Tweet ids.
+
+        Returns:
+            int: Number of ids that were not in the index yet.
+        """
+        tweet_ids = [(int(tweet_id),) for tweet_id in tweet_ids]
+        with self._lock:
+            before = self._connection.total_changes
+            self._connection.executemany(f"INSERT OR IGNORE INTO {self.namespace} VALUES (?)", tweet_ids)
+            added = self._connection.total_changes - before
+            for (tweet_id,) in tweet_ids:
+                self._bloom.add(tweet_id)
+            self._count += added
+            if self._count > self._bloom.capacity:
+                self._rebuild_bloom()
+        return added
+
+    def commit(self):
+        """Makes all added ids durable."""
+        with self._lock:
+            self._connection.commit()
+
+    def close(self):
+        """Commits pending ids, saves the Bloom filter and closes the database."""
+        with self._lock:
+            if self._connection is None:
+                return
+            self._connection.commit()
+            self._bloom.save(self.bloom_path, self._count)
+            self._connection.close()
+            self._connection = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def tweet_id_column(df):
+    """Returns the name of the tweet id column of a crawler output frame, or None if it has none."""
+    for column in ("tweet_id", "Tweet Id"):
+        if column in df.columns:
+            return column
+    return None
+
+
+def indexed_mask(df, index):
+    """
+    Flags rows whose tweet id is already in the index.
+
+    Args:
+        df (pandas.DataFrame): Crawler output with a `tweet_id` (or legacy `Tweet Id`) column.
+        index (TweetIdIndex or None): Index to look ids up in. None flags no row.
+
+    Returns:
+        pandas.Series: Boolean mask aligned with `df`; False for new or missing tweet ids.
+    """
+    import pandas as pd
+
+    id_column = tweet_id_column(df) if index is not None else None
+    if id_column is None:
+        return pd.Series(False, index=df.index)
+    return df[id_column].map(lambda tweet_id: tweet_id in index, na_action="ignore").fillna(False).astype(bool)
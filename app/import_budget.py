@@ -0,0 +1,81 @@
+import os
+import sys
+import argparse
+import subprocess
+
+
+# Import time budget in milliseconds of every entry point (module import only, without the interpreter start-up)
+IMPORT_BUDGETS_MS = {
+    "scrapper": 50,
+    "pipeline": 60,
+    "translator_api": 60,
+    "translator_gpu": 80,
+    "translation_server": 80,
+}
+
+# Dependencies that must only be loaded by the code paths that use them
+HEAVY_MODULES = ("torch", "transformers", "ctranslate2", "tweepy", "google.cloud", "pandas", "pyarrow")
+
+
+def measure_import(module, runs=3):
+    """
+    Measures the import of a module in a fresh interpreter with `python -X importtime`.
+
+    Args:
+        module (str): Module name, imported from the folder of this script.
+        runs (int, optional): Number of measurements; the fastest is reported. Default is 3.
+
+    Returns:
+        tuple: Cumulative import time in milliseconds, and the set of all imported module names.
+    """
+    best, imported = None, set()
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+
+        # Lines look like 'import time:   self [us] | cumulative | imported package'
+        for line in result.stderr.splitlines():
+            if not line.startswith("import time:") or "cumulative" in line:
+                continue
+            _, cumulative, name = line[len("import time:"):].split("|")
+            imported.add(name.strip())
+            if name.strip() == module and not name.startswith("  "):
+                milliseconds = int(cumulative) / 1000
+                best = milliseconds if best is None else min(best, milliseconds)
+    return best, imported
+
+
+def check_budgets(budgets=None, runs=3):
+    """
+    Checks the import time and the eagerly loaded dependencies of every entry point.
+
+    Args:
+        budgets (dict, optional): Budgets in milliseconds by module. Defaults to `IMPORT_BUDGETS_MS`.
+        runs (int, optional): Measurements per module. Default is 3.
+
+    Returns:
+        bool: True if every entry point is within its budget and loads no heavy dependency.
+    """
+    budgets = budgets or IMPORT_BUDGETS_MS
+    ok = True
+    print(f"{'entry point':<20} {'import':>9} {'budget':>8}  heavy modules")
+    for module, budget in budgets.items():
+        milliseconds, imported = measure_import(module, runs=runs)
+        heavy = [name for name in HEAVY_MODULES if any(m == name or m.startswith(f"{name}.") for m in imported)]
+        passed = milliseconds <= budget and not heavy
+        ok = ok and passed
+        print(f"{module:<20} {milliseconds:>7.1f}ms {budget:>6}ms  {', '.join(heavy) or '-'}"
+              f"{'' if passed else '  OVER BUDGET'}")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the import time budget of the entry points.")
+    parser.add_argument("--runs", type=int, default=3, help="Measurements per entry point; the fastest counts. Default is 3.")
+    args = parser.parse_args()
+
+    sys.exit(0 if check_budgets(runs=args.runs) else 1)
@@ -0,0 +1,242 @@
+import os
+import json
+import time
+import bisect
+import threading
+from datetime import datetime, timezone
+from contextlib import contextmanager
+
+
+# Upper bounds in seconds of the latency histogram buckets, the last bucket is +Inf
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+# Prefix of the metric names in the Prometheus textfile
+PROMETHEUS_PREFIX = "twitter_parser_"
+
+
+def metric_key(name, labels):
+    """Returns the Prometheus style key of a metric, e.g. 'api_request_seconds{api="twitter"}'."""
+    if not labels:
+        return name
+    return name + "{" + ",".join(f'{label}="{value}"' for label, value in sorted(labels.items())) + "}"
+
+
+class Metrics:
+    """
+    Thread-safe registry of the counters, gauges and latency histograms of a run.
+
+    Metrics are identified by a name and optional labels, following Prometheus naming:
+    counters end in `_total` (or `_seconds_total` for accumulated time), histograms
+    observe durations in seconds. Recording is cheap, so instrumented code always records;
+    `record_run` writes the result at the end of a run.
+
+    Example:
+        with metrics.time("api_request_seconds", api="twitter"):
+            response = client.search_recent_tweets(query)
+        metrics.inc("wait_seconds_total", waited, reason="rate_limit")
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Removes all recorded values."""
+        with self._lock:
+            self._counters = {}
+            self._gauges = {}
+            self._histograms = {}
+
+    def inc(self, name, value=1, **labels):
+        """Adds `value` to a counter."""
+        key = metric_key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        """Sets a gauge."""
+        with self._lock:
+            self._gauges[metric_key(name, labels)] = value
+
+    def observe(self, name, seconds, **labels):
+        """Records a duration in seconds in a histogram."""
+        key = metric_key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {"count": 0, "sum": 0.0, "max": 0.0,
+                                                     "buckets": [0] * (len(LATENCY_BUCKETS) + 1)}
+            histogram["count"] += 1
+            histogram["sum"] += seconds
+            histogram["max"] = max(histogram["max"], seconds)
+            histogram["buckets"][bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+
+    @contextmanager
+    def time(self, name, **labels):
+        """Observes the duration of the `with` block in a histogram, also if it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def total(self, name):
+        """Returns the sum of a counter, or of a histogram's observations, over all labels."""
+        with self._lock:
+            counters = sum(value for key, value in self._counters.items() if key.split("{")[0] == name)
+            histograms = sum(value["sum"] for key, value in self._histograms.items() if key.split("{")[0] == name)
+        return counters + histograms
+
+    def drain(self):
+        """
+        Returns the recorded values and resets them, e.g. to send them from a worker process to its parent.
+
+        Returns:
+            dict: Counters, gauges and histograms by key, to be passed to `merge`.
+        """
+        with self._lock:
+            state = {"counters": self._counters, "gauges": self._gauges, "histograms": self._histograms}
+            self._counters, self._gauges, self._histograms = {}, {}, {}
+        return state
+
+    def merge(self, state):
+        """Adds values returned by `drain` of another registry."""
+        with self._lock:
+            for key, value in state["counters"].items():
+                self._counters[key] = self._counters.get(key, 0) + value
+            self._gauges.update(state["gauges"])
+            for key, other in state["histograms"].items():
+                histogram = self._histograms.get(key)
+                if histogram is None:
+                    self._histograms[key] = {**other, "buckets": list(other["buckets"])}
+                    continue
+                histogram["count"] += other["count"]
+                histogram["sum"] += other["sum"]
+                histogram["max"] = max(histogram["max"], other["max"])
+                histogram["buckets"] = [a + b for a, b in zip(histogram["buckets"], other["buckets"])]
+
+    def snapshot(self):
+        """
+        Returns all metrics in a JSON serializable form.
+
+        Returns:
+            dict: `counters` and `gauges` by key, and `histograms` by key with count, sum,
+                mean, max and the number of observations per bucket upper bound.
+        """
+        with self._lock:
+            histograms = {
+                key: {
+                    "count": value["count"],
+                    "sum": value["sum"],
+                    "mean": value["sum"] / value["count"],
+                    "max": value["max"],
+                    "buckets": dict(zip([*map(str, LATENCY_BUCKETS), "+Inf"], value["buckets"])),
+                }
+                for key, value in self._histograms.items()
+            }
+            return {"counters": dict(self._counters), "gauges": dict(self._gauges), "histograms": histograms}
+
+    def prometheus_text(self, labels=None):
+        """
+        Renders all metrics in the Prometheus text exposition format.
+
+        Args:
+            labels (dict, optional): Labels added to every metric, e.g. {"entry_point": "scrapper"}.
+
+        Returns:
+            str: Metrics text.
+        """
+        extra = ",".join(f'{label}="{value}"' for label, value in sorted((labels or {}).items()))
+
+        def series(key, suffix="", more=""):
+            name, _, own = key.partition("{")
+            own = own.rstrip("}")
+            all_labels = ",".join(part for part in (own, extra, more) if part)
+            return f"{PROMETHEUS_PREFIX}{name}{suffix}" + (f"{{{all_labels}}}" if all_labels else "")
+
+        lines = []
+        typed = set()
+        with self._lock:
+            for kind, values in (("counter", self._counters), ("gauge", self._gauges)):
+                for key, value in sorted(values.items()):
+                    name = key.split("{")[0]
+                    if name not in typed:
+                        typed.add(name)
+                        lines.append(f"# TYPE {PROMETHEUS_PREFIX}{name} {kind}")
+                    lines.append(f"{series(key)} {value}")
+
+            for key, value in sorted(self._histograms.items()):
+                name = key.split("{")[0]
+                if name not in typed:
+                    typed.add(name)
+                    lines.append(f"# TYPE {PROMETHEUS_PREFIX}{name} histogram")
+                cumulative = 0
+                for bound, count in zip([*map(str, LATENCY_BUCKETS), "+Inf"], value["buckets"]):
+                    cumulative += count
+                    le = f'le="{bound}"'
+                    lines.append(f"{series(key, '_bucket', le)} {cumulative}")
+                lines.append(f"{series(key, '_sum')} {value['sum']}")
+                lines.append(f"{series(key, '_count')} {value['count']}")
+        return "\n".join(lines) + "\n"
+
+
+# Metrics of this process, recorded by the crawler, the translators and the sinks
+metrics = Metrics()
+
+
+def _write_atomic(path, text):
+    """Writes a file under a temporary name and renames it, so readers never see a partial file."""
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        file.write(text)
+    os.replace(tmp_path, path)
+
+
+@contextmanager
+def record_run(entry_point, json_path=None, prometheus_path=None):
+    """
+    Records the metrics of a run and writes them when it ends, also if it fails or is terminated.
+
+    The JSON file holds all metrics plus the run time and derived throughput: written rows
+    per second of the run, and translated characters per second of translation time.
+    The Prometheus textfile is meant for the textfile collector of the node exporter.
+
+    Args:
+        entry_point (str): Name of the script, e.g. "scrapper"; a label of every Prometheus metric.
+        json_path (str, optional): Path of the JSON file. Default is None (not written).
+        prometheus_path (str, optional): Path of the Prometheus textfile. Default is None (not written).
+
+    Yields:
+        Metrics: The process metrics.
+
+    Example:
+        with record_run("scrapper", json_path="./data/metrics_scrapper.json"):
+            main(...)
+    """
+    started_at = datetime.now(timezone.utc)
+    start = time.perf_counter()
+    try:
+        yield metrics
+    finally:
+        run_seconds = time.perf_counter() - start
+        metrics.set("run_seconds", run_seconds)
+
+        if json_path:
+            translation_seconds = metrics.total("translation_seconds")
+            report = {
+                "entry_point": entry_point,
+                "started_at": started_at.isoformat(),
+                "run_seconds": run_seconds,
+                "rows_per_second": metrics.total("tweets_written_total") / run_seconds if run_seconds else 0.0,
+                "translated_chars_per_second": (metrics.total("translated_chars_total") / translation_seconds
+                                                if translation_seconds else 0.0),
+                **metrics.snapshot(),
+            }
+            _write_atomic(json_path, json.dumps(report, indent=2))
+            print(f"Metrics written to {json_path}.")
+
+        if prometheus_path:
+            _write_atomic(prometheus_path, metrics.prometheus_text({"entry_point": entry_point}))
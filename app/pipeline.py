@@ -0,0 +1,212 @@
+import os
+import sys
+from settings import env_variable_handler
+from preprocessing import preprocess_arabic
+from translation_cache import TranslationCache, translate_with_cache
+from storage import handle_termination
+from metrics import record_run
+from translation_backends import CACHE_BACKENDS, DEFAULT_SERVER_URL, get_translator, server_translator
+
+
+def row_translator(translate, columns, cache=None, backend="google-translate-v3"):
+    """
+    Builds the enrichment step that adds `en_translation` to crawled rows.
+
+    Args:
+        translate (callable): Takes a list of texts and returns their translations in order.
+        columns (list): Columns of the crawled rows; 'text' and 'lang' are used.
+        cache (TranslationCache, optional): Persistent translation cache. Default is None.
+        backend (str, optional): Backend name used in cache keys. Default is "google-translate-v3".
+
+    Returns:
+        callable: Takes a list of rows and returns them with the translation appended
+            (None for tweets that are not Arabic or have no Arabic text).
+    """
+    text_column = columns.index("text")
+    lang_column = columns.index("lang")
+
+    def translate_rows(rows):
+        import pandas as pd
+
+        texts = pd.Series([row[text_column] if row[lang_column] == "ar" else None for row in rows], dtype=object)
+        clean_tweet_text = preprocess_arabic(texts)
+        translation = translate_with_cache(clean_tweet_text.tolist(), translate, cache, backend=backend)
+
+        en_translation = [None] * len(rows)
+        for position, text in zip(clean_tweet_text.index, translation):
+            en_translation[position] = text
+        print(f"Translated {len(translation)} of {len(rows)} tweets.")
+        return [list(row) + [text] for row, text in zip(rows, en_translation)]
+
+    return translate_rows
+
+
+def main(bearer_token, query, tweets_limit, since, until, folder_path, tweets_per_request,
+         backend="google", batch_size=20, translation_workers=4, model_dir="./models",
+         queue_size=8, flush_rows=500, flush_seconds=30.0, output_format="csv",
+         resume=False, incremental=False, index_path=None, cache_path=None, cache_size=1_000_000,
+         server_url=DEFAULT_SERVER_URL, users_path=None):
+    """
+    Crawls tweets and translates them in one process.
+
+    Pages returned by the crawler are put on a bounded queue and translated in a background
+    thread while the crawler fetches the next page or waits for its rate limit window.
+    Translated rows are written as they complete, so the output has the crawler columns
+    plus `en_translation` and no intermediate file is needed.
+
+    Args:
+        bearer_token (str): Twitter API bearer token.
+        query (str): Twitter search query string.
+        tweets_limit (int): Maximum number of tweets to collect.
+        since (str): Start date in format 'YYYY-MM-DDTHH:mm:ssZ', or None.
+        until (str): End date in format 'YYYY-MM-DDTHH:mm:ssZ', or None.
+        folder_path (str): Output folder.
+        tweets_per_request (int): Number of tweets per request.
+        backend (str): "google", "marian" or "ctranslate2". Default is "google".
+        batch_size (int): Maximum number of texts per translation request or batch. Default is 20.
+        translation_workers (int): Concurrent requests of the Google backend. Default is 4.
+        model_dir (str): Folder of converted CTranslate2 models. Default is "./models".
+        queue_size (int): Maximum number of pages waiting for translation. Default is 8.
+        flush_rows (int): Number of buffered rows written to disk at once. Default is 500.
+        flush_seconds (float): Maximum time in seconds rows stay buffered. Default is 30.
+        output_format (str): "csv" or "parquet". Default is "csv".
+        resume (bool): Continue an interrupted crawl of the same query. Default is False.
+        incremental (bool): Only fetch tweets newer than the last crawl of the same query. Default is False.
+        index_path (str): Optional path to the tweet id index shared with the scrapper. Default is None.
+        cache_path (str): Optional path to the persistent translation cache. Default is None.
+        cache_size (int): Maximum number of cached translations. Default is 1,000,000.
+        server_url (str): URL of a translation server serving `backend`; used if reachable. Default is "http://127.0.0.1:8765".
+        users_path (str): Path to the store of tweet authors. Default is '<folder_path>/users.sqlite'.
+    """
+    # Imported here, so reading the configuration does not load tweepy
+    from utils import recent_tweets_crawler, get_client, tweet_columns
+    from dedup_index import TweetIdIndex
+    from users import UserStore
+
+    client = get_client(bearer_token=bearer_token)
+    translate, backend_name = server_translator(backend, url=server_url), CACHE_BACKENDS.get(backend)
+    if translate is None:
+        translate, backend_name = get_translator(backend, batch_size=batch_size, workers=translation_workers,
+                                                 model_dir=model_dir)
+
+    index = TweetIdIndex(index_path) if index_path else None
+    cache = TranslationCache(cache_path, max_entries=cache_size) if cache_path else None
+    users = UserStore(users_path) if users_path else None
+    try:
+        output_path = recent_tweets_crawler(
+            client=client,
+            query=query,
+            tweets_limit=tweets_limit,
+            since=since,
+            until=until,
+            folder_path=folder_path,
+            tweets_per_request=tweets_per_request,
+            flush_rows=flush_rows,
+            flush_seconds=flush_seconds,
+            output_format=output_format,
+            resume=resume,
+            incremental=incremental,
+            index=index,
+            enrich=row_translator(translate, tweet_columns(), cache=cache, backend=backend_name),
+            enrich_columns=["en_translation"],
+            queue_size=queue_size,
+            users=users
+        )
+        print(f"Saved to: {output_path}")
+    finally:
+        if users is not None:
+            users.close()
+        if cache is not None:
+            print(f"Translation cache: {cache.hits} hits, {cache.misses} misses, hit rate {cache.hit_rate:.1%}")
+            cache.close()
+        if index is not None:
+            index.close()
+
+
+if __name__ == "__main__":
+
+    bearer_token = env_variable_handler(os.getenv("SCRAPPER_TOKEN"))
+    query = env_variable_handler(os.getenv("QUERY"))
+
+    tweets_limit = env_variable_handler(os.getenv("SCRAPPER_TWEETS_LIMIT"))
+    tweets_limit = int(tweets_limit) if tweets_limit is not None else None
+
+    since = env_variable_handler(os.getenv("SCRAPPER_SINCE"))
+    until = env_variable_handler(os.getenv("SCRAPPER_UNTIL"))
+    folder_path = env_variable_handler(os.getenv("SCRAPPER_FOLDER_PATH")) or "./output"
+
+    tweets_per_request = env_variable_handler(os.getenv("SCRAPPER_TWEETS_PER_REQUEST"))
+    tweets_per_request = int(tweets_per_request) if tweets_per_request is not None else 100
+
+    backend = env_variable_handler(os.getenv("PIPELINE_BACKEND")) or "google"
+    queue_size = int(env_variable_handler(os.getenv("PIPELINE_QUEUE_SIZE")) or 8)
+
+    batch_size = int(env_variable_handler(os.getenv("TRANSLATION_BATCH_SIZE")) or 20)
+    translation_workers = int(env_variable_handler(os.getenv("TRANSLATION_WORKERS")) or 4)
+    model_dir = env_variable_handler(os.getenv("TRANSLATION_MODEL_DIR")) or "./models"
+
+    flush_rows = int(env_variable_handler(os.getenv("SCRAPPER_FLUSH_ROWS")) or 500)
+    flush_seconds = float(env_variable_handler(os.getenv("SCRAPPER_FLUSH_SECONDS")) or 30.0)
+    output_format = env_variable_handler(os.getenv("SCRAPPER_OUTPUT_FORMAT")) or "csv"
+
+    resume = (env_variable_handler(os.getenv("SCRAPPER_RESUME")) or "false").lower() in {"1", "true", "yes"}
+    incremental = (env_variable_handler(os.getenv("SCRAPPER_INCREMENTAL")) or "false").lower() in {"1", "true", "yes"}
+
+    index_path = env_variable_handler(os.getenv("SCRAPPER_INDEX_PATH"))
+    users_path = env_variable_handler(os.getenv("SCRAPPER_USERS_PATH"))
+    cache_path = env_variable_handler(os.getenv("TRANSLATION_CACHE_PATH"))
+    cache_size = int(env_variable_handler(os.getenv("TRANSLATION_CACHE_SIZE")) or 1_000_000)
+    server_url = env_variable_handler(os.getenv("TRANSLATION_SERVER_URL", DEFAULT_SERVER_URL))
+    metrics_path = env_variable_handler(os.getenv("METRICS_PATH")) or os.path.join(folder_path, "metrics_pipeline.json")
+    prometheus_path = env_variable_handler(os.getenv("METRICS_PROMETHEUS_PATH"))
+
+    print(
+        f"Passed env variables:\n"
+        f"Query: {query}\n"
+        f"Tweets Limit: {tweets_limit}\n"
+        f"Since: {since}\n"
+        f"Until: {until}\n"
+        f"Folder Path: {folder_path}\n"
+        f"Tweets per Request: {tweets_per_request}\n"
+        f"Backend: {backend} (batch size {batch_size}, workers {translation_workers})\n"
+        f"Queue Size: {queue_size}\n"
+        f"Flush: every {flush_rows} rows or {flush_seconds}s\n"
+        f"Output Format: {output_format}\n"
+        f"Resume: {resume}\n"
+        f"Incremental: {incremental}\n"
+        f"Index Path: {index_path}\n"
+        f"Users Path: {users_path}\n"
+        f"Cache Path: {cache_path}\n"
+        f"Server URL: {server_url}\n"
+        f"Metrics: {metrics_path} (Prometheus: {prometheus_path})"
+    )
+
+    # Fail before the crawler and translation dependencies are loaded
+    if bearer_token is None or query is None:
+        sys.exit("SCRAPPER_TOKEN and QUERY must be set.")
+
+    with handle_termination(), record_run("pipeline", json_path=metrics_path, prometheus_path=prometheus_path):
+        main(
+            bearer_token=bearer_token,
+            query=query,
+            tweets_limit=tweets_limit,
+            since=since,
+            until=until,
+            folder_path=folder_path,
+            tweets_per_request=tweets_per_request,
+            backend=backend,
+            batch_size=batch_size,
+            translation_workers=translation_workers,
+            model_dir=model_dir,
+            queue_size=queue_size,
+            flush_rows=flush_rows,
+            flush_seconds=flush_seconds,
+            output_format=output_format,
+            resume=resume,
+            incremental=incremental,
+            index_path=index_path,
+            cache_path=cache_path,
+            cache_size=cache_size,
+            server_url=server_url,
+            users_path=users_path
+        )
@@ -0,0 +1,109 @@
+import re
+
+
+# Arabic, Arabic Supplement and Arabic Extended-A blocks
+ARABIC_RANGES = "\u0600-\u06FF\u0750-\u077F\u08A0-\u08FF"
+# Hebrew block (letters, points, punctuation) and Hebrew presentation forms
+HEBREW_RANGES = "\u0590-\u05FF\uFB1D-\uFB4F"
+CYRILLIC_RANGES = "\u0400-\u052F"
+GREEK_RANGES = "\u0370-\u03FF\u1F00-\u1FFF"
+# Script of every source language whose text is reduced to that script, by Twitter language code.
+# Other languages (e.g. Latin script or CJK) only lose links and mentions.
+SCRIPT_RANGES = {
+    "ar": ARABIC_RANGES, "fa": ARABIC_RANGES, "ur": ARABIC_RANGES, "ps": ARABIC_RANGES, "ckb": ARABIC_RANGES,
+    "he": HEBREW_RANGES, "iw": HEBREW_RANGES, "yi": HEBREW_RANGES,
+    "ru": CYRILLIC_RANGES, "uk": CYRILLIC_RANGES, "bg": CYRILLIC_RANGES, "sr": CYRILLIC_RANGES, "mk": CYRILLIC_RANGES,
+    "el": GREEK_RANGES,
+}
+# Runs of characters outside the script of every language in `SCRIPT_RANGES`
+NON_SCRIPT_PATTERNS = {lang: re.compile(f"[^{ranges}]+") for lang, ranges in SCRIPT_RANGES.items()}
+# Retweet prefixes, links and @mentions carry no translatable text
+ENTITY_PATTERN = re.compile(r"^RT @\w+:|https?://\S+|www\.\S+|@\w+")
+# Tatweel only stretches letters and carries no meaning
+TATWEEL_PATTERN = re.compile("\u0640+")
+# Three or more repetitions of a character (elongated words, emoji runs), kept as two.
+# Digits are never collapsed, so numbers like 1000 or ١٠٠٠ keep their value.
+REPEAT_PATTERN = re.compile(r"([^\d\s])\1{2,}")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def collapse_repeats(texts):
+    """
+    Collapses runs of a repeated character or emoji to two, e.g. 'ههههههه' to 'هه'.
+
+    Digits are left alone, so numbers keep their value.
+
+    Args:
+        texts (pandas.Series): Texts.
+
+    Returns:
+        pandas.Series: Texts with collapsed runs.
+    """
+    return texts.str.replace(REPEAT_PATTERN, r"\1\1", regex=True)
+
+
+def extract_script(texts, non_script_pattern):
+    """
+    Extracts the text segments of one script of every text.
+
+    Everything outside the script's blocks (e.g. Latin words, links, mentions, emoji, punctuation)
+    is replaced by a single space, so the segments are joined with spaces.
+
+    Args:
+        texts (pandas.Series): Texts.
+        non_script_pattern (re.Pattern): Pattern of runs outside the script, e.g. `NON_SCRIPT_PATTERNS["he"]`.
+
+    Returns:
+        pandas.Series: Segments of every text in the script, separated by single spaces.
+    """
+    return texts.str.replace(non_script_pattern, " ", regex=True).str.strip()
+
+
+def preprocess_text(texts, lang):
+    """
+    Prepares tweet texts for translation from a language.
+
+    Texts of languages in `SCRIPT_RANGES` are reduced to the segments in their script, other
+    texts lose their links and mentions. Tatweel is removed, repeated characters other than digits are collapsed
+    and whitespace is normalized. Texts that end up empty are dropped, so they are never sent
+    to a translator; the index tells which rows the remaining texts belong to.
+
+    Args:
+        texts (pandas.Series): Tweet texts; missing values are treated as empty.
+        lang (str): Twitter language code of the texts, e.g. "ar" or "he".
+
+    Returns:
+        pandas.Series: Non-empty preprocessed texts, with the index of `texts`.
+
+    Example:
+        clean = preprocess_text(df.loc[df.lang == "he", "text"], "he")
+        df.loc[clean.index, "en_translation"] = translate(clean.tolist())
+    """
+    texts = texts.fillna("").astype(str)
+    texts = texts.str.replace(TATWEEL_PATTERN, "", regex=True)
+    non_script_pattern = NON_SCRIPT_PATTERNS.get(lang)
+    if non_script_pattern is not None:
+        texts = extract_script(texts, non_script_pattern)
+    else:
+        texts = texts.str.replace(ENTITY_PATTERN, " ", regex=True).str.strip()
+    # After links are removed, so they are never altered
+    texts = collapse_repeats(texts)
+    texts = texts.str.replace(WHITESPACE_PATTERN, " ", regex=True)
+    return texts[texts.str.len() > 0]
+
+
+def preprocess_arabic(texts):
+    """
+    Prepares tweet texts for translation from Arabic, see `preprocess_text`.
+
+    Args:
+        texts (pandas.Series): Tweet texts; missing values are treated as empty.
+
+    Returns:
+        pandas.Series: Non-empty preprocessed texts, with the index of `texts`.
+
+    Example:
+        clean = preprocess_arabic(df.loc[df.lang == "ar", "text"])
+        df.loc[clean.index, "en_translation"] = translate(clean.tolist())
+    """
+    return preprocess_text(texts, "ar")
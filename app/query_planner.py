@@ -0,0 +1,132 @@
+import re
+from collections import namedtuple
+
+
+PlannedQuery = namedtuple("PlannedQuery", ["query", "seeds"])
+
+# Token boundaries used to match seed phrases against tweet text
+TOKEN_PATTERN = re.compile(r"[#@]?\w+", re.UNICODE)
+
+
+def seed_term(phrase):
+    """
+    Returns the query operator for a seed phrase.
+
+    Multi-word phrases are grouped in parentheses, so inside an OR group they keep the
+    meaning they have in `query_builder` (all words must occur), e.g. 'hamas movement'
+    becomes '(hamas movement)'.
+
+    Args:
+        phrase (str): Seed phrase.
+
+    Returns:
+        str: Query term.
+    """
+    phrase = " ".join(phrase.split())
+    return f"({phrase})" if " " in phrase else phrase
+
+
+def query_suffix(include_retweets=False, languages=(), start_date="", end_date=""):
+    """
+    Builds the operators shared by every packed query.
+
+    Args:
+        include_retweets (bool, optional): Include retweets in search results. Defaults to False.
+        languages (Iterable[str], optional): Language codes; several languages are OR-combined.
+        start_date (str, optional): Start date (format: "yyyy-mm-dd"). Defaults to "".
+        end_date (str, optional): End date (format: "yyyy-mm-dd"). Defaults to "".
+
+    Returns:
+        str: Query suffix, starting with a space unless empty.
+    """
+    suffix = ""
+    if not include_retweets:
+        suffix += " -is:retweet"
+
+    languages = [language for language in languages if language in {"en", "ar", "he"}]
+    if len(languages) == 1:
+        suffix += f" lang:{languages[0]}"
+    elif languages:
+        suffix += " (" + " OR ".join(f"lang:{language}" for language in languages) + ")"
+
+    if start_date:
+        suffix += f" since:{start_date}"
+    if end_date:
+        suffix += f" until:{end_date}"
+    return suffix
+
+
+def plan_queries(seeds, body="", include_retweets=False, languages=(), start_date="",
+                 end_date="", max_query_length=512):
+    """
+    Packs seed phrases into as few OR-combined search queries as the query length limit allows.
+
+    Instead of one query (and one pagination chain) per seed and language, seeds are grouped
+    as `<body> (seed1 OR seed2 OR ...) <shared operators>`, filling each query up to
+    `max_query_length` characters (first-fit, longest seeds first). Languages are OR-combined
+    in every query.
+
+    Args:
+        seeds (dict): Seed keys mapped to seed phrases, as returned by `load_seeds`.
+        body (str, optional): Terms every query must contain. Defaults to "".
+        include_retweets (bool, optional): Include retweets in search results. Defaults to False.
+        languages (Iterable[str], optional): Language codes ('en', 'ar', 'he'). Defaults to all languages.
+        start_date (str, optional): Start date (format: "yyyy-mm-dd"). Defaults to "".
+        end_date (str, optional): End date (format: "yyyy-mm-dd"). Defaults to "".
+        max_query_length (int, optional): Query length limit of the endpoint. Defaults to 512.
+
+    Returns:
+        list: PlannedQuery tuples of the query string and the seed keys it covers.
+
+    Raises:
+        ValueError: If a single seed does not fit into a query.
+
+    Example:
+        for planned in plan_queries(load_seeds(), languages=["ar", "he"]):
+            print(planned.query, planned.seeds)
+    """
+    prefix = f"{body} " if body else ""
+    suffix = query_suffix(include_retweets, languages, start_date, end_date)
+    # "(" + ")" around the OR group
+    budget = max_query_length - len(prefix) - len(suffix) - 2
+
+    groups = []
+    for key in sorted(seeds, key=lambda k: len(seed_term(seeds[k])), reverse=True):
+        term = seed_term(seeds[key])
+        if len(term) > budget:
+            raise ValueError(f"Seed '{key}' does not fit into a query of {max_query_length} characters.")
+
+        for group in groups:
+            if group["length"] + len(" OR ") + len(term) <= budget:
+                group["terms"].append(term)
+                group["seeds"].append(key)
+                group["length"] += len(" OR ") + len(term)
+                break
+        else:
+            groups.append({"terms": [term], "seeds": [key], "length": len(term)})
+
+    return [
+        PlannedQuery(query=f"{prefix}({' OR '.join(group['terms'])}){suffix}", seeds=group["seeds"])
+        for group in groups
+    ]
+
+
+def match_seeds(text, seeds):
+    """
+    Routes a tweet back to the seeds it matched.
+
+    A seed matches if every word of its phrase occurs as a token of the text (case-insensitive),
+    which mirrors how the search endpoint matches keywords.
+
+    Args:
+        text (str): Tweet text.
+        seeds (dict): Seed keys mapped to seed phrases.
+
+    Returns:
+        list: Keys of the matched seeds.
+    """
+    tokens = {token.lstrip("#@") for token in TOKEN_PATTERN.findall(text.casefold())}
+    return [
+        key for key, phrase in seeds.items()
+        if all(word.casefold() in tokens for word in phrase.split())
+    ]
@@ -0,0 +1,197 @@
+import random
+import threading
+import time
+from collections import deque, namedtuple
+from storage import shutdown_event
+
+
+RateLimitStatus = namedtuple("RateLimitStatus", ["limit", "remaining", "reset"])
+
+
+class ShutdownRequested(Exception):
+    """Raised instead of finishing a wait when the process is asked to terminate."""
+
+
+def sleep(seconds):
+    """
+    Sleeps like `time.sleep`, but wakes up as soon as `storage.shutdown_event` is set.
+
+    Args:
+        seconds (float): Time to sleep in seconds.
+
+    Raises:
+        ShutdownRequested: If the process is asked to terminate before or while sleeping.
+    """
+    if shutdown_event.wait(seconds):
+        raise ShutdownRequested()
+
+
+def parse_rate_limit_headers(headers):
+    """
+    Reads the rate limit state from Twitter API response headers.
+
+    Args:
+        headers (Mapping): Response headers.
+
+    Returns:
+        RateLimitStatus or None: Request limit, remaining requests and reset time
+            (UNIX epoch seconds) of the current window, or None if the headers are missing.
+    """
+    try:
+        return RateLimitStatus(
+            limit=int(headers["x-rate-limit-limit"]),
+            remaining=int(headers["x-rate-limit-remaining"]),
+            reset=int(headers["x-rate-limit-reset"])
+        )
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt, base_delay=1.0, max_delay=60.0):
+    """
+    Computes a jittered exponential backoff delay ("full jitter").
+
+    Args:
+        attempt (int): Zero based number of the failed attempt.
+        base_delay (float, optional): Delay of the first retry in seconds. Default is 1.0.
+        max_delay (float, optional): Upper bound of the delay in seconds. Default is 60.0.
+
+    Returns:
+        float: Delay in seconds, drawn uniformly from [0, min(max_delay, base_delay * 2 ** attempt)].
+    """
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+
+def wait_until(reset_time):
+    """
+    Sleeps until the given UNIX timestamp (plus one second of safety margin).
+
+    Args:
+        reset_time (float): UNIX epoch seconds.
+
+    Returns:
+        float: Time in seconds spent sleeping.
+
+    Raises:
+        ShutdownRequested: If the process is asked to terminate while sleeping.
+    """
+    delay = max(0.0, reset_time - time.time() + 1)
+    sleep(delay)
+    return delay
+
+
+class RequestScheduler:
+    """
+    Hands out request slots shared by every crawler thread.
+
+    The scheduler keeps a sliding window of the times at which slots were granted,
+    so the combined request rate of all callers never exceeds `max_requests`
+    per `window_seconds`, which is how Twitter defines its endpoint limits.
+    When the API reports an exhausted quota, `pause_until` holds back every caller
+    until the window resets.
+
+    Args:
+        max_requests (int, optional): Requests allowed per window. Default is 60
+            (recent search limit of the Basic tier).
+        window_seconds (float, optional): Length of the rate limit window in seconds. Default is 900.
+
+    Example:
+        scheduler = RequestScheduler(max_requests=450)
+        response = get_tweets(client, query, scheduler=scheduler)
+    """
+
+    def __init__(self, max_requests=60, window_seconds=900):
+        self.max_requests = max_requests
+        self.window_seconds = window_seconds
+        self._granted = deque()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def pause_until(self, reset_time):
+        """
+        Withholds all slots until the given reset time, e.g. after the API reported
+        an exhausted quota or answered with 429 Too Many Requests.
+
+        Args:
+            reset_time (float): UNIX epoch seconds at which the rate limit window resets.
+        """
+        resume_at = time.monotonic() + max(0.0, reset_time - time.time() + 1)
+        with self._lock:
+            self._paused_until = max(self._paused_until, resume_at)
+
+    def acquire(self):
+        """
+        Blocks until a request slot is available and claims it.
+
+        Returns:
+            float: Time in seconds spent waiting for the slot.
+
+        Raises:
+            ShutdownRequested: If the process is asked to terminate while waiting.
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                while self._granted and now - self._granted[0] >= self.window_seconds:
+                    self._granted.popleft()
+
+                if now < self._paused_until:
+                    delay = self._paused_until - now
+                elif len(self._granted) < self.max_requests:
+                    self._granted.append(now)
+                    return waited
+                else:
+                    delay = self.window_seconds - (now - self._granted[0])
+
+            sleep(delay)
+            waited += delay
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket, e.g. for a characters-per-minute quota.
+
+    Args:
+        rate (float): Tokens added per `period`.
+        period (float, optional): Refill period in seconds. Default is 60.
+        capacity (float, optional): Maximum number of stored tokens. Defaults to `rate`.
+
+    Example:
+        bucket = TokenBucket(rate=6_000_000)  # characters per minute
+        bucket.acquire(len(text))
+    """
+
+    def __init__(self, rate, period=60.0, capacity=None):
+        self.rate = rate / period
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens):
+        """
+        Blocks until `tokens` tokens are available and takes them.
+
+        Requests larger than the capacity are allowed once the bucket is full.
+
+        Returns:
+            float: Time in seconds spent waiting.
+
+        Raises:
+            ShutdownRequested: If the process is asked to terminate while waiting.
+        """
+        tokens = min(tokens, self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                delay = (tokens - self._tokens) / self.rate
+
+            sleep(delay)
+            waited += delay
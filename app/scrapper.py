@@ -1,9 +1,38 @@
 import os
-from utils import recent_tweets_crawler, get_client, env_variable_handler
+import sys
+from datetime import timedelta
+from settings import env_variable_handler
+from storage import handle_termination
+from metrics import record_run
+
+
+def load_queries(path):
+    """
+    Load search queries from a text file with one query per line.
+
+    Args:
+        path (str): Path to the queries file. Empty lines and lines starting with '#' are skipped.
+
+    Returns:
+        list: Query strings.
+    """
+    with open(path, 'r', encoding='utf-8') as file:
+        return [line.strip() for line in file if line.strip() and not line.startswith("#")]
 
 
 def main(bearer_token, query, tweets_limit, since,
-         until, folder_path, tweets_per_request, sleep_delay):
+         until, folder_path, tweets_per_request, sleep_delay,
+         queries=None, workers=4, rate_limit=60, rate_window=900,
+         flush_rows=500, flush_seconds=30.0, output_format="csv",
+         resume=False, incremental=False, backfill_window=None,
+         plan_seeds=False, seeds_file="./seeds.json", languages=(), include_retweets=False,
+         max_query_length=512, index_path=None, users_path=None):
+
+    # Imported here, so reading and checking the configuration does not load tweepy
+    from utils import recent_tweets_crawler, multi_query_crawler, backfill_crawler, get_client, load_seeds
+    from query_planner import plan_queries
+    from dedup_index import TweetIdIndex
+    from users import UserStore, users_path as default_users_path
 
     # Get Twitter API client
     client = get_client(bearer_token=bearer_token)
@@ -23,17 +52,94 @@ def main(bearer_token, query, tweets_limit, since,
     )
     """
 
-    # Scrap recent tweets
-    recent_tweets_crawler(
-        client=client,
-        query=query,
-        tweets_limit=tweets_limit,
-        since=since,
-        until=until,
-        folder_path=folder_path,
-        tweets_per_request=tweets_per_request,
-        sleep_delay=sleep_delay
-    )
+    query_seeds = None
+    if plan_seeds:
+        # Pack all seeds into as few queries as the query length limit allows
+        seeds = load_seeds(seeds_file)
+        planned_queries = plan_queries(
+            seeds,
+            body=query or "",
+            include_retweets=include_retweets,
+            languages=languages,
+            max_query_length=max_query_length
+        )
+        queries = [planned.query for planned in planned_queries]
+        query_seeds = {planned.query: {key: seeds[key] for key in planned.seeds} for planned in planned_queries}
+        print(f"Packed {len(seeds)} seeds into {len(queries)} queries.")
+
+    # Cross-run index of stored tweet ids
+    index = TweetIdIndex(index_path) if index_path else None
+    # Authors of all queries, written once per author
+    users = UserStore(users_path or default_users_path(folder_path))
+
+    try:
+        if backfill_window is not None:
+            # Scrap the time range as parallel time windows
+            backfill_crawler(
+                client=client,
+                query=query,
+                since=since,
+                until=until,
+                folder_path=folder_path,
+                tweets_per_request=tweets_per_request,
+                window=timedelta(minutes=backfill_window),
+                max_parallel=workers,
+                max_requests=rate_limit,
+                window_seconds=rate_window,
+                flush_rows=flush_rows,
+                flush_seconds=flush_seconds,
+                output_format=output_format,
+                index=index,
+                users=users
+            )
+            return
+
+        if queries:
+            # Scrap all queries concurrently under a shared rate limit
+            multi_query_crawler(
+                client=client,
+                queries=queries,
+                tweets_limit=tweets_limit,
+                since=since,
+                until=until,
+                folder_path=folder_path,
+                tweets_per_request=tweets_per_request,
+                max_workers=workers,
+                max_requests=rate_limit,
+                window_seconds=rate_window,
+                flush_rows=flush_rows,
+                flush_seconds=flush_seconds,
+                output_format=output_format,
+                resume=resume,
+                incremental=incremental,
+                query_seeds=query_seeds,
+                index=index,
+                users=users
+            )
+            return
+
+        # Scrap recent tweets
+        recent_tweets_crawler(
+            client=client,
+            query=query,
+            tweets_limit=tweets_limit,
+            since=since,
+            until=until,
+            folder_path=folder_path,
+            tweets_per_request=tweets_per_request,
+            sleep_delay=sleep_delay,
+            flush_rows=flush_rows,
+            flush_seconds=flush_seconds,
+            output_format=output_format,
+            resume=resume,
+            incremental=incremental,
+            index=index,
+            users=users
+        )
+    finally:
+        users.close()
+        if index is not None:
+            index.close()
 
 
 if __name__ == "__main__":
@@ -54,6 +160,46 @@ if __name__ == "__main__":
     sleep_delay = env_variable_handler(os.getenv("SCRAPPER_SLEEP_DELAY"))
     sleep_delay = int(sleep_delay) if sleep_delay is not None else None
 
+    queries_file = env_variable_handler(os.getenv("QUERIES_FILE"))
+    queries = load_queries(queries_file) if queries_file is not None else None
+
+    workers = env_variable_handler(os.getenv("SCRAPPER_WORKERS"))
+    workers = int(workers) if workers is not None else 4
+
+    rate_limit = env_variable_handler(os.getenv("SCRAPPER_RATE_LIMIT"))
+    rate_limit = int(rate_limit) if rate_limit is not None else 60
+
+    rate_window = env_variable_handler(os.getenv("SCRAPPER_RATE_WINDOW"))
+    rate_window = int(rate_window) if rate_window is not None else 900
+
+    flush_rows = env_variable_handler(os.getenv("SCRAPPER_FLUSH_ROWS"))
+    flush_rows = int(flush_rows) if flush_rows is not None else 500
+
+    flush_seconds = env_variable_handler(os.getenv("SCRAPPER_FLUSH_SECONDS"))
+    flush_seconds = float(flush_seconds) if flush_seconds is not None else 30.0
+
+    output_format = env_variable_handler(os.getenv("SCRAPPER_OUTPUT_FORMAT")) or "csv"
+
+    resume = (env_variable_handler(os.getenv("SCRAPPER_RESUME")) or "false").lower() in {"1", "true", "yes"}
+    incremental = (env_variable_handler(os.getenv("SCRAPPER_INCREMENTAL")) or "false").lower() in {"1", "true", "yes"}
+
+    backfill_window = env_variable_handler(os.getenv("SCRAPPER_BACKFILL_WINDOW_MINUTES"))
+    backfill_window = int(backfill_window) if backfill_window is not None else None
+
+    plan_seeds = (env_variable_handler(os.getenv("SCRAPPER_PLAN_SEEDS")) or "false").lower() in {"1", "true", "yes"}
+    seeds_file = env_variable_handler(os.getenv("SEEDS_FILE")) or "./seeds.json"
+    languages = [code.strip() for code in (env_variable_handler(os.getenv("QUERY_LANGUAGES")) or "").split(",") if code.strip()]
+    include_retweets = (env_variable_handler(os.getenv("SCRAPPER_INCLUDE_RETWEETS")) or "false").lower() in {"1", "true", "yes"}
+
+    max_query_length = env_variable_handler(os.getenv("SCRAPPER_MAX_QUERY_LENGTH"))
+    max_query_length = int(max_query_length) if max_query_length is not None else 512
+
+    index_path = env_variable_handler(os.getenv("SCRAPPER_INDEX_PATH"))
+    users_path = env_variable_handler(os.getenv("SCRAPPER_USERS_PATH"))
+
+    metrics_path = env_variable_handler(os.getenv("METRICS_PATH")) or os.path.join(folder_path or ".", "metrics_scrapper.json")
+    prometheus_path = env_variable_handler(os.getenv("METRICS_PROMETHEUS_PATH"))
+
     print(
         f"Passed env variables:\n"
         f"Bearer Token: {bearer_token}\n"
@@ -63,16 +209,53 @@ if __name__ == "__main__":
         f"Until: {until}\n"
         f"Folder Path: {folder_path}\n"
         f"Tweets per Request: {tweets_per_request}\n"
-        f"Sleep Delay: {sleep_delay}"
+        f"Sleep Delay: {sleep_delay}\n"
+        f"Queries File: {queries_file}\n"
+        f"Workers: {workers}\n"
+        f"Rate Limit: {rate_limit} requests / {rate_window}s\n"
+        f"Flush: every {flush_rows} rows or {flush_seconds}s\n"
+        f"Output Format: {output_format}\n"
+        f"Resume: {resume}\n"
+        f"Incremental: {incremental}\n"
+        f"Backfill Window: {backfill_window} minutes\n"
+        f"Plan Seeds: {plan_seeds} ({seeds_file}, languages: {languages}, retweets: {include_retweets}, "
+        f"max query length: {max_query_length})\n"
+        f"Index Path: {index_path}\n"
+        f"Users Path: {users_path}\n"
+        f"Metrics: {metrics_path} (Prometheus: {prometheus_path})"
     )
 
-    main(
-        bearer_token=bearer_token,
-        query=query,
-        tweets_limit=tweets_limit,
-        since=since,
-        until=until,
-        folder_path=folder_path,
-        tweets_per_request=tweets_per_request,
-        sleep_delay=sleep_delay
-    )
+    # Fail before the crawler dependencies are loaded
+    if bearer_token is None:
+        sys.exit("SCRAPPER_TOKEN is not set.")
+    if query is None and not queries and not plan_seeds:
+        sys.exit("Set QUERY, QUERIES_FILE or SCRAPPER_PLAN_SEEDS.")
+
+    with handle_termination(), record_run("scrapper", json_path=metrics_path, prometheus_path=prometheus_path):
+        main(
+            bearer_token=bearer_token,
+            query=query,
+            tweets_limit=tweets_limit,
+            since=since,
+            until=until,
+            folder_path=folder_path,
+            tweets_per_request=tweets_per_request,
+            sleep_delay=sleep_delay,
+            queries=queries,
+            workers=workers,
+            rate_limit=rate_limit,
+            rate_window=rate_window,
+            flush_rows=flush_rows,
+            flush_seconds=flush_seconds,
+            output_format=output_format,
+            resume=resume,
+            incremental=incremental,
+            backfill_window=backfill_window,
+            plan_seeds=plan_seeds,
+            seeds_file=seeds_file,
+            languages=languages,
+            include_retweets=include_retweets,
+            max_query_length=max_query_length,
+            index_path=index_path,
+            users_path=users_path
+        )
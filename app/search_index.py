@@ -0,0 +1,335 @@
+import os
+import time
+import sqlite3
+import argparse
+from datetime import datetime, timezone
+from storage import LEGACY_COLUMNS, apply_tweet_schema, iter_tweets, output_files, hive_partitions
+from users import USERS_FILE_NAME
+
+
+# Columns of the indexed tweets, in insert order
+INDEX_COLUMNS = ["tweet_id", "created_at", "author_id", "username", "lang", "retweet_count", "like_count",
+                 "text", "en_translation", "source"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tweets (
+    tweet_id INTEGER PRIMARY KEY, created_at INTEGER, author_id INTEGER, username TEXT, lang TEXT,
+    retweet_count INTEGER, like_count INTEGER, text TEXT, en_translation TEXT, source TEXT
+);
+CREATE INDEX IF NOT EXISTS tweets_created_at ON tweets (created_at);
+CREATE INDEX IF NOT EXISTS tweets_lang_created_at ON tweets (lang, created_at);
+CREATE INDEX IF NOT EXISTS tweets_author ON tweets (username COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS tweets_like_count ON tweets (like_count);
+CREATE INDEX IF NOT EXISTS tweets_retweet_count ON tweets (retweet_count);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS tweets_fts USING fts5 (
+    text, en_translation, content='tweets', content_rowid='tweet_id', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS tweets_insert AFTER INSERT ON tweets BEGIN
+    INSERT INTO tweets_fts (rowid, text, en_translation) VALUES (new.tweet_id, new.text, new.en_translation);
+END;
+CREATE TRIGGER IF NOT EXISTS tweets_delete AFTER DELETE ON tweets BEGIN
+    INSERT INTO tweets_fts (tweets_fts, rowid, text, en_translation) VALUES ('delete', old.tweet_id, old.text, old.en_translation);
+END;
+CREATE TRIGGER IF NOT EXISTS tweets_update AFTER UPDATE OF text, en_translation ON tweets BEGIN
+    INSERT INTO tweets_fts (tweets_fts, rowid, text, en_translation) VALUES ('delete', old.tweet_id, old.text, old.en_translation);
+    INSERT INTO tweets_fts (rowid, text, en_translation) VALUES (new.tweet_id, new.text, new.en_translation);
+END;
+
+CREATE TABLE IF NOT EXISTS indexed_files (path TEXT PRIMARY KEY, size INTEGER, mtime REAL, rows INTEGER, indexed_at REAL);
+"""
+
+
+def index_rows(df, source):
+    """
+    Normalizes a chunk of crawler or translator output to the indexed columns.
+
+    Args:
+        df (pandas.DataFrame): Chunk with current or legacy column names.
+        source (str): Path of the file the chunk was read from.
+
+    Returns:
+        list: Tuples in the order of `INDEX_COLUMNS`; rows without a tweet id are dropped.
+    """
+    import pandas as pd
+
+    df = df.rename(columns=LEGACY_COLUMNS)
+    if "tweet_id" not in df.columns or "text" not in df.columns:
+        return []
+    # Nullable ids and counts, see `apply_tweet_schema`
+    df = apply_tweet_schema(df)
+    df = df[df["tweet_id"].notna()]
+
+    created_at = df["created_at"] if "created_at" in df.columns else None
+    columns = {
+        "tweet_id": df["tweet_id"].astype("int64"),
+        # Epoch seconds, NaN for unparseable times
+        "created_at": (created_at - pd.Timestamp(0, tz="UTC")) // pd.Timedelta(seconds=1) if created_at is not None else None,
+        "author_id": df["author_id"] if "author_id" in df.columns else None,
+        "username": df["username"] if "username" in df.columns else None,
+        "lang": df["lang"].astype("string") if "lang" in df.columns else None,
+        "retweet_count": df["retweet_count"] if "retweet_count" in df.columns else None,
+        "like_count": df["like_count"] if "like_count" in df.columns else None,
+        "text": df["text"],
+        "en_translation": df["en_translation"] if "en_translation" in df.columns else None,
+    }
+    frame = pd.DataFrame({name: values for name, values in columns.items() if values is not None}, index=df.index)
+    frame = frame.reindex(columns=INDEX_COLUMNS[:-1]).astype(object)
+    frame["source"] = source
+    # SQLite stores None as NULL, pandas' missing values would be stored as text or floats
+    frame = frame.where(frame.notna(), None)
+    for column in ("author_id", "created_at", "retweet_count", "like_count"):
+        # Object dtype, a list of ints and None would be inferred as float64
+        frame[column] = pd.Series([int(value) if value is not None else None for value in frame[column]],
+                                  index=frame.index, dtype=object)
+    return list(frame.itertuples(index=False, name=None))
+
+
+class SearchIndex:
+    """
+    Full-text index of crawled and translated tweets in SQLite FTS5.
+
+    Tweets are stored once per `tweet_id` with their text, translation, language, creation
+    time, author and engagement, and `text` and `en_translation` are indexed for full-text
+    search. Filters on date, language, author and engagement use ordinary indexes, so
+    queries stay fast over millions of tweets. Indexed files are recorded with their size
+    and modification time, so `add_folder` only reads new or changed files. A tweet found
+    in several files (e.g. crawled and later translated) keeps its latest values, and a
+    translation is never replaced by a missing one.
+
+    Args:
+        path (str): Path to the SQLite database file.
+
+    Example:
+        with SearchIndex("./output/search.sqlite") as index:
+            index.add_folder("./data")
+            for row in index.search("غزة", lang="ar", min_likes=10):
+                print(row["tweet_url"], row["text"])
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._connection = sqlite3.connect(path)
+        self._connection.row_factory = sqlite3.Row
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(SCHEMA)
+        self._connection.commit()
+
+    def __len__(self):
+        return self._connection.execute("SELECT COUNT(*) FROM tweets").fetchone()[0]
+
+    def add_file(self, path, chunk_size=50_000):
+        """
+        Indexes one output file unless it is unchanged since it was last indexed.
+
+        Args:
+            path (str): CSV file or Parquet part file.
+            chunk_size (int, optional): Number of rows read at once. Default is 50,000.
+
+        Returns:
+            int: Number of indexed rows, 0 if the file was skipped.
+        """
+        stat = os.stat(path)
+        known = self._connection.execute("SELECT size, mtime FROM indexed_files WHERE path = ?", (path,)).fetchone()
+        if known is not None and (known["size"], known["mtime"]) == (stat.st_size, stat.st_mtime):
+            return 0
+
+        partitions = hive_partitions(path) if path.endswith(".parquet") else {}
+        updates = ", ".join(
+            f"{column} = coalesce(excluded.{column}, tweets.{column})" for column in INDEX_COLUMNS[1:]
+        )
+        rows = 0
+        with self._connection:
+            # CSV values are read as text, so ids are parsed exactly even in columns with missing values
+            for chunk in iter_tweets(path, chunk_size=chunk_size, dtype=str):
+                for column, value in partitions.items():
+                    if column not in chunk.columns:
+                        chunk[column] = value
+                records = index_rows(chunk, path)
+                self._connection.executemany(
+                    f"INSERT INTO tweets VALUES ({', '.join('?' * len(INDEX_COLUMNS))}) "
+                    f"ON CONFLICT (tweet_id) DO UPDATE SET {updates}",
+                    records
+                )
+                rows += len(records)
+            self._connection.execute(
+                "INSERT OR REPLACE INTO indexed_files VALUES (?, ?, ?, ?, ?)",
+                (path, stat.st_size, stat.st_mtime, rows, time.time())
+            )
+        return rows
+
+    def add_folder(self, root, users_path=None):
+        """
+        Indexes all new or changed outputs below a folder.
+
+        Args:
+            root (str): Folder with crawler or translator outputs (or a single file).
+            users_path (str, optional): Authors store used to fill in usernames of tweets that
+                only have an `author_id`. Defaults to '<root>/users.sqlite' if it exists.
+
+        Returns:
+            tuple: Number of indexed files and rows.
+        """
+        files, rows = 0, 0
+        for path in output_files(root):
+            added = self.add_file(path)
+            if added:
+                files += 1
+                rows += added
+                print(f"Indexed {added} tweets from {path}.")
+
+        users_path = users_path or os.path.join(root, USERS_FILE_NAME)
+        if os.path.isfile(users_path):
+            self.add_usernames(users_path)
+        return files, rows
+
+    def add_usernames(self, users_path):
+        """Fills in the usernames of indexed tweets from an authors store (see `users.UserStore`)."""
+        self._connection.execute("ATTACH DATABASE ? AS authors", (users_path,))
+        try:
+            with self._connection:
+                self._connection.execute(
+                    "UPDATE tweets SET username = (SELECT username FROM authors.users WHERE author_id = tweets.author_id) "
+                    "WHERE username IS NULL AND author_id IN (SELECT author_id FROM authors.users)"
+                )
+        finally:
+            self._connection.execute("DETACH DATABASE authors")
+
+    def search(self, query=None, since=None, until=None, lang=None, author=None, min_likes=None,
+               min_retweets=None, order="recent", limit=20):
+        """
+        Finds tweets by full-text query and filters.
+
+        Args:
+            query (str, optional): FTS5 query over `text` and `en_translation`, e.g. 'gaza AND hospital',
+                '"ground operation"' or 'en_translation: ceasefire'. Default is None (filters only).
+            since (str, optional): Earliest creation time, ISO date or datetime (UTC). Default is None.
+            until (str, optional): Creation time the tweets are older than, ISO date or datetime (UTC). Default is None.
+            lang (str, optional): Language code. Default is None.
+            author (str, optional): Username (case insensitive) or author id. Default is None.
+            min_likes (int, optional): Minimum `like_count`. Default is None.
+            min_retweets (int, optional): Minimum `retweet_count`. Default is None.
+            order (str, optional): "recent" (newest first), "relevance" (bm25, needs `query`),
+                "likes" or "retweets". Default is "recent".
+            limit (int, optional): Maximum number of results. Default is 20.
+
+        Returns:
+            list: Matching tweets as dicts with the indexed columns, an ISO `created_at` and `tweet_url`.
+        """
+        relevance = order == "relevance" and bool(query)
+        conditions, parameters = [], []
+        if relevance:
+            # bm25 is only available when the FTS table is part of the query
+            conditions.append("tweets_fts MATCH ?")
+            parameters.append(query)
+        elif query:
+            conditions.append("t.tweet_id IN (SELECT rowid FROM tweets_fts WHERE tweets_fts MATCH ?)")
+            parameters.append(query)
+        if since:
+            conditions.append("t.created_at >= ?")
+            parameters.append(parse_time(since))
+        if until:
+            conditions.append("t.created_at < ?")
+            parameters.append(parse_time(until))
+        if lang:
+            conditions.append("t.lang = ?")
+            parameters.append(lang)
+        if author:
+            conditions.append("(t.username = ? COLLATE NOCASE OR t.author_id = ?)")
+            parameters.extend([author.lstrip("@"), int(author) if author.isdigit() else None])
+        if min_likes is not None:
+            conditions.append("t.like_count >= ?")
+            parameters.append(min_likes)
+        if min_retweets is not None:
+            conditions.append("t.retweet_count >= ?")
+            parameters.append(min_retweets)
+
+        sql = "SELECT t.* FROM tweets_fts JOIN tweets t ON t.tweet_id = tweets_fts.rowid" if relevance \
+            else "SELECT t.* FROM tweets t"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += {
+            "recent": " ORDER BY t.created_at DESC",
+            "relevance": " ORDER BY bm25(tweets_fts)" if relevance else " ORDER BY t.created_at DESC",
+            "likes": " ORDER BY t.like_count DESC",
+            "retweets": " ORDER BY t.retweet_count DESC",
+        }[order]
+        sql += " LIMIT ?"
+        parameters.append(limit)
+
+        results = []
+        for row in self._connection.execute(sql, parameters):
+            tweet = dict(row)
+            if tweet["created_at"] is not None:
+                tweet["created_at"] = datetime.fromtimestamp(tweet["created_at"], timezone.utc).isoformat()
+            tweet["tweet_url"] = (f"https://twitter.com/{tweet['username']}/status/{tweet['tweet_id']}"
+                                  if tweet["username"] else f"https://twitter.com/i/web/status/{tweet['tweet_id']}")
+            results.append(tweet)
+        return results
+
+    def close(self):
+        """Closes the database."""
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def parse_time(value):
+    """
+    Parses an ISO date or datetime, UTC unless it has a timezone.
+
+    Returns:
+        int: UNIX epoch seconds.
+    """
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Full-text search over crawled and translated tweets.")
+    parser.add_argument("--index-path", type=str, default="./output/search.sqlite", help="Path to the search index. Default is './output/search.sqlite'.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    index_parser = commands.add_parser("index", help="Index new or changed outputs.")
+    index_parser.add_argument("folders", nargs="*", default=["./data", "./output"], help="Folders or files to index. Default is ./data and ./output.")
+    index_parser.add_argument("--users-path", type=str, default=None, help="Authors store for usernames. Default is 'users.sqlite' of every folder.")
+
+    search_parser = commands.add_parser("search", help="Search indexed tweets.")
+    search_parser.add_argument("query", nargs="?", default=None, help="FTS5 query, e.g. 'gaza AND hospital'. Optional.")
+    search_parser.add_argument("--since", type=str, default=None, help="Earliest creation time, e.g. 2023-10-16 or 2023-10-16T12:00:00Z.")
+    search_parser.add_argument("--until", type=str, default=None, help="Only tweets created before this time.")
+    search_parser.add_argument("--lang", type=str, default=None, help="Language code, e.g. 'ar'.")
+    search_parser.add_argument("--author", type=str, default=None, help="Username or author id.")
+    search_parser.add_argument("--min-likes", type=int, default=None, help="Minimum like count.")
+    search_parser.add_argument("--min-retweets", type=int, default=None, help="Minimum retweet count.")
+    search_parser.add_argument("--order", choices=["recent", "relevance", "likes", "retweets"], default="recent", help="Result order. Default is 'recent'.")
+    search_parser.add_argument("--limit", type=int, default=20, help="Maximum number of results. Default is 20.")
+    args = parser.parse_args()
+
+    with SearchIndex(args.index_path) as index:
+        if args.command == "index":
+            for folder in args.folders:
+                if not os.path.exists(folder):
+                    print(f"Skipping missing {folder}.")
+                    continue
+                files, rows = index.add_folder(folder, users_path=args.users_path)
+                print(f"{folder}: indexed {rows} tweets from {files} new or changed files.")
+            print(f"{len(index)} tweets in {args.index_path}.")
+        else:
+            start = time.perf_counter()
+            results = index.search(args.query, since=args.since, until=args.until, lang=args.lang, author=args.author,
+                                   min_likes=args.min_likes, min_retweets=args.min_retweets, order=args.order,
+                                   limit=args.limit)
+            for tweet in results:
+                print(f"{tweet['created_at']}  {tweet['tweet_url']}  likes {tweet['like_count']}  retweets {tweet['retweet_count']}")
+                print(f"    {tweet['text']!r}")
+                if tweet["en_translation"]:
+                    print(f"    en: {tweet['en_translation']!r}")
+            print(f"{len(results)} results in {(time.perf_counter() - start) * 1000:.1f}ms.")
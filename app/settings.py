@@ -0,0 +1,19 @@
+def env_variable_handler(variable):
+    """
+    Handles a specific environment variable.
+
+    Args:
+        variable (str): The environment variable to handle.
+
+    Returns:
+        str or None: The processed value of the environment variable.
+    """
+    # Check if the variable is set
+    if variable is not None:
+        # Check if it's an empty string or the string "None"
+        if variable == "" or variable.lower() == "none":
+            return None
+        else:
+            return variable
+    else:
+        return None
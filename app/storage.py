@@ -0,0 +1,712 @@
+import os
+import io
+import csv
+import time
+import uuid
+import shutil
+import queue
+import signal
+import threading
+from contextlib import contextmanager
+from checkpoint import load_checkpoint, save_checkpoint
+from metrics import metrics
+
+
+# Column types of the typed (Parquet) output; columns missing from a frame are ignored.
+ID_COLUMNS = ["tweet_id", "author_id"]
+COUNT_COLUMNS = ["retweet_count", "like_count"]
+PARTITION_COLUMNS = ["date", "lang"]
+
+# Column names of earlier crawler and translator outputs
+LEGACY_COLUMNS = {"Created At": "created_at", "Tweet Id": "tweet_id", "Text": "text", "translation": "en_translation"}
+
+
+# Set when the process was asked to terminate; long running loops should stop at the next page.
+shutdown_event = threading.Event()
+
+
+class CsvSink:
+    """
+    Buffered CSV writer that keeps a single file handle open for a whole run.
+
+    Rows are serialized into an in-memory buffer and written to the file in one call
+    once `flush_rows` rows are pending or `flush_seconds` passed since the last flush,
+    so the file only ever receives complete rows. Closing the sink flushes the buffer
+    and fsyncs the file.
+
+    Args:
+        path (str): Path to the CSV file. Rows are appended if the file already exists.
+        columns (list): Column names written as header when the file is empty.
+        flush_rows (int, optional): Number of buffered rows that triggers a flush. Default is 500.
+        flush_seconds (float, optional): Maximum age in seconds of buffered rows. Default is 30.
+        size (int, optional): Truncate an existing file to this many bytes before appending, e.g. the
+            `size` saved with a checkpoint, so a row cut off by a killed process is dropped.
+            Default is None (the whole file is kept).
+
+    Attributes:
+        on_flush (callable or None): Called without arguments after buffered rows reached the file,
+            e.g. to checkpoint the crawl state that produced them.
+        size (int): Size of the file in bytes after the last flush.
+
+    Example:
+        with CsvSink("tweets.csv", columns=["tweet_id", "text"]) as sink:
+            sink.write_rows([[1, "hello"], [2, "world"]])
+    """
+
+    def __init__(self, path, columns, flush_rows=500, flush_seconds=30.0, size=None):
+        self.path = path
+        self.columns = list(columns)
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self.rows_written = 0
+        self.on_flush = None
+
+        if size is not None and os.path.exists(path) and os.path.getsize(path) > size:
+            os.truncate(path, size)
+        # Guards buffer and file against concurrent writers, flushes and close
+        self._lock = threading.RLock()
+        self._file = open(path, mode='a', newline='', encoding='utf-8')
+        self.size = os.fstat(self._file.fileno()).st_size
+        self._new_buffer()
+        self._pending_rows = 0
+        self._last_flush = time.monotonic()
+
+        if self._file.tell() == 0:
+            self._writer.writerow(self.columns)
+
+    def _new_buffer(self):
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer)
+
+    def write_rows(self, rows, on_written=None):
+        """
+        Buffers rows and flushes them if the size or time threshold is reached.
+
+        Args:
+            rows (Iterable[list]): Rows in the order of `columns`.
+            on_written (callable, optional): Called without arguments once the rows are buffered,
+                before they are flushed.
+
+        Returns:
+            int: Number of buffered rows.
+        """
+        with self._lock:
+            count = 0
+            for row in rows:
+                self._writer.writerow(row)
+                count += 1
+            self._pending_rows += count
+            self.rows_written += count
+            if on_written is not None:
+                on_written()
+
+            if (self._pending_rows >= self.flush_rows
+                    or time.monotonic() - self._last_flush >= self.flush_seconds):
+                self._flush(fsync=False)
+        return count
+
+    def flush(self, fsync=False):
+        """
+        Writes all buffered rows to the file.
+
+        Args:
+            fsync (bool, optional): Also force the data to disk. Default is False.
+        """
+        with self._lock:
+            self._flush(fsync=fsync)
+
+    def _flush(self, fsync):
+        data = self._buffer.getvalue()
+        with metrics.time("sink_flush_seconds", format="csv"):
+            if data:
+                self._file.write(data)
+                self._new_buffer()
+                self._pending_rows = 0
+                metrics.inc("output_bytes_total", len(data.encode("utf-8")), format="csv")
+            self._file.flush()
+            if fsync:
+                os.fsync(self._file.fileno())
+        self.size = os.fstat(self._file.fileno()).st_size
+        self._last_flush = time.monotonic()
+        if data and self.on_flush is not None:
+            self.on_flush()
+
+    def close(self):
+        """Flushes the remaining rows, fsyncs and closes the file."""
+        with self._lock:
+            if self._file.closed:
+                return
+            self._flush(fsync=True)
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class ParquetSink:
+    """
+    Buffered writer of a Parquet dataset partitioned by day and language.
+
+    Every flush writes one file per partition, laid out as
+    `<path>/date=YYYY-MM-DD/lang=<code>/part-<id>.parquet`, so readers can prune
+    partitions and load only the columns they need (see `read_tweets`).
+    Files are written under a temporary name, fsynced and renamed, so an interrupted
+    run never leaves a truncated file behind.
+
+    Args:
+        path (str): Root folder of the dataset. New files are added to an existing dataset.
+        columns (list): Column names of the rows.
+        flush_rows (int, optional): Number of buffered rows that triggers a flush. Default is 500.
+        flush_seconds (float, optional): Maximum age in seconds of buffered rows. Default is 30.
+
+    Attributes:
+        on_flush (callable or None): Called without arguments after buffered rows were written.
+    """
+
+    def __init__(self, path, columns, flush_rows=500, flush_seconds=30.0):
+        self.path = path
+        self.columns = list(columns)
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self.rows_written = 0
+        self.on_flush = None
+
+        self._lock = threading.RLock()
+        self._rows = []
+        self._last_flush = time.monotonic()
+        self._closed = False
+        os.makedirs(path, exist_ok=True)
+
+    def write_rows(self, rows, on_written=None):
+        """
+        Buffers rows and flushes them if the size or time threshold is reached.
+
+        Args:
+            rows (Iterable[list]): Rows in the order of `columns`.
+            on_written (callable, optional): Called without arguments once the rows are buffered,
+                before they are flushed.
+
+        Returns:
+            int: Number of buffered rows.
+        """
+        with self._lock:
+            count = len(self._rows)
+            self._rows.extend(rows)
+            count = len(self._rows) - count
+            self.rows_written += count
+            if on_written is not None:
+                on_written()
+
+            if (len(self._rows) >= self.flush_rows
+                    or time.monotonic() - self._last_flush >= self.flush_seconds):
+                self._flush()
+        return count
+
+    def flush(self, fsync=True):
+        """Writes all buffered rows to new Parquet files. Files are always fsynced."""
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        if self._rows:
+            import pandas as pd
+
+            df = pd.DataFrame(self._rows, columns=self.columns)
+            with metrics.time("sink_flush_seconds", format="parquet"):
+                written = write_parquet_dataset(df, self.path)
+            metrics.inc("output_bytes_total", sum(os.path.getsize(path) for path in written), format="parquet")
+            self._rows = []
+            if self.on_flush is not None:
+                self.on_flush()
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        """Writes the remaining rows."""
+        with self._lock:
+            if self._closed:
+                return
+            self._flush()
+            self._closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class EnrichingSink:
+    """
+    Sink that enriches rows in a background thread before handing them to another sink.
+
+    `write_rows` only puts the rows on a bounded queue and returns, so the producer (e.g. a
+    crawler waiting for its next rate limit window) and the enrichment (e.g. translation)
+    overlap. A full queue blocks the producer until the enrichment caught up. Errors of the
+    enrichment are raised by the next `write_rows`, `flush` or `close`.
+
+    Args:
+        sink (CsvSink or ParquetSink): Sink receiving the enriched rows.
+        enrich (callable): Takes a list of rows and returns the enriched rows
+            (in the column order of `sink`).
+        queue_size (int, optional): Maximum number of pending `write_rows` batches. Default is 8.
+
+    Attributes:
+        on_flush (callable or None): Called without arguments after the wrapped sink flushed
+            while no rows were pending, i.e. once every row written so far reached the output.
+            It is no longer called after an enrichment error.
+
+    Example:
+        with open_sink(path, columns + ["en_translation"]) as file_sink, \
+                EnrichingSink(file_sink, translate_rows) as sink:
+            sink.write_rows(rows)
+    """
+
+    def __init__(self, sink, enrich, queue_size=8):
+        self.sink = sink
+        self.path = sink.path
+        self.enrich = enrich
+        self.on_flush = None
+
+        self._lock = threading.RLock()
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._pending = 0
+        self._error = None
+        self._closed = False
+        sink.on_flush = self._sink_flushed
+        self._thread = threading.Thread(target=self._run, name="enrich", daemon=True)
+        self._thread.start()
+
+    @property
+    def rows_written(self):
+        return self.sink.rows_written
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                rows, on_written = item
+                enriched = None
+                if self._error is None:
+                    try:
+                        enriched = self.enrich(rows)
+                    except BaseException as e:
+                        self._error = e
+                with self._lock:
+                    self._pending -= 1
+                    # After an error the remaining rows are dropped, the producer stops at its next write
+                    if enriched is not None:
+                        self.sink.write_rows(enriched, on_written)
+            except BaseException as e:
+                self._error = e
+            finally:
+                self._queue.task_done()
+
+    def _sink_flushed(self):
+        # After an error some rows never reach the output, so nothing may be checkpointed past them
+        if self._pending == 0 and self._error is None and self.on_flush is not None:
+            self.on_flush()
+
+    def _raise_error(self):
+        if self._error is not None:
+            raise self._error
+
+    def write_rows(self, rows, on_written=None):
+        """
+        Queues rows for enrichment.
+
+        Args:
+            rows (Iterable[list]): Rows.
+            on_written (callable, optional): Called without arguments once the enriched rows
+                reached the wrapped sink (at once if there are no rows); never called for rows
+                dropped after an error.
+
+        Returns:
+            int: Number of queued rows.
+        """
+        self._raise_error()
+        rows = list(rows)
+        if rows:
+            with self._lock:
+                self._pending += 1
+            self._queue.put((rows, on_written))
+        elif on_written is not None:
+            with self._lock:
+                on_written()
+        return len(rows)
+
+    def flush(self, fsync=False):
+        """Waits until all queued rows are enriched and flushes the wrapped sink."""
+        self._queue.join()
+        self._raise_error()
+        with self._lock:
+            self.sink.flush(fsync)
+
+    def close(self):
+        """Enriches the remaining rows and stops the background thread. The wrapped sink stays open."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+        self._raise_error()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def open_sink(path, columns, output_format="csv", flush_rows=500, flush_seconds=30.0, size=None):
+    """
+    Opens a sink for the given output format.
+
+    Args:
+        path (str): Path without extension. CSV sinks write '<path>.csv', Parquet sinks
+            write a dataset folder '<path>/'.
+        columns (list): Column names of the rows.
+        output_format (str, optional): "csv" or "parquet". Default is "csv".
+        flush_rows (int, optional): Number of buffered rows that triggers a flush. Default is 500.
+        flush_seconds (float, optional): Maximum age in seconds of buffered rows. Default is 30.
+        size (int, optional): Size a CSV file is truncated to before appending, see `CsvSink`.
+            Parquet files are written atomically and never need it. Default is None.
+
+    Returns:
+        CsvSink or ParquetSink: Open sink.
+    """
+    if output_format == "csv":
+        return CsvSink(f"{path}.csv", columns, flush_rows=flush_rows, flush_seconds=flush_seconds, size=size)
+    if output_format == "parquet":
+        return ParquetSink(path, columns, flush_rows=flush_rows, flush_seconds=flush_seconds)
+    raise ValueError(f"Unknown output format: {output_format}")
+
+
+def apply_tweet_schema(df):
+    """
+    Casts tweet columns to their typed representation: int64 ids and counts,
+    UTC timestamp `created_at` and categorical `lang`.
+
+    Args:
+        df (pandas.DataFrame): Tweets as read from CSV or built from API rows.
+
+    Returns:
+        pandas.DataFrame: The same frame with converted columns.
+    """
+    import pandas as pd
+
+    for column in ID_COLUMNS + COUNT_COLUMNS:
+        if column in df.columns:
+            # Nullable parsing, a float64 detour would round ids of columns with missing values
+            df[column] = pd.to_numeric(df[column], errors="coerce", dtype_backend="numpy_nullable").astype("Int64")
+    if "created_at" in df.columns:
+        df["created_at"] = pd.to_datetime(df["created_at"], utc=True, errors="coerce")
+    if "lang" in df.columns:
+        df["lang"] = df["lang"].astype("string").astype("category")
+    return df
+
+
+def parquet_schema(columns):
+    """
+    Returns the Arrow schema of tweet columns in Parquet outputs.
+
+    Types are fixed instead of inferred per file, so a column that happens to be empty in one
+    partition (e.g. `en_translation` of English tweets) is not written with Arrow's null type,
+    which readers of the dataset cannot merge with the other files.
+
+    Args:
+        columns (Iterable[str]): Column names in file order.
+
+    Returns:
+        pyarrow.Schema: UTC timestamp `created_at`, int64 ids and counts, strings otherwise.
+    """
+    import pyarrow as pa
+
+    types = {"created_at": pa.timestamp("ns", tz="UTC"), **{column: pa.int64() for column in ID_COLUMNS + COUNT_COLUMNS}}
+    return pa.schema([(column, types.get(column, pa.string())) for column in columns])
+
+
+def write_parquet_dataset(df, path, part_id=None):
+    """
+    Adds tweets to a Parquet dataset partitioned by day of `created_at` and `lang`.
+
+    Args:
+        df (pandas.DataFrame): Tweets to write.
+        path (str): Root folder of the dataset.
+        part_id (str, optional): Name of the written files ('part-<part_id>.parquet'). Writing
+            the same part id again replaces the files. Defaults to a random id.
+
+    Returns:
+        list: Paths of the written files.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    df = apply_tweet_schema(df.drop(columns=["date"], errors="ignore"))
+    # Text columns as strings, matching `parquet_schema`
+    for column in df.columns.difference(["created_at", "lang"] + ID_COLUMNS + COUNT_COLUMNS):
+        df[column] = df[column].astype("string")
+    dates = df["created_at"].dt.strftime("%Y-%m-%d").fillna("unknown")
+    langs = df["lang"].astype("string").fillna("und")
+
+    written = []
+    part_id = part_id or uuid.uuid4().hex
+    for (day, lang), part in df.groupby([dates, langs], sort=False):
+        folder = os.path.join(path, f"date={day}", f"lang={lang}")
+        os.makedirs(folder, exist_ok=True)
+        file_path = os.path.join(folder, f"part-{part_id}.parquet")
+
+        part = part.drop(columns=["lang"])
+        table = pa.Table.from_pandas(part, schema=parquet_schema(part.columns), preserve_index=False)
+        tmp_path = f"{file_path}.tmp"
+        pq.write_table(table, tmp_path)
+        with open(tmp_path, "rb") as file:
+            os.fsync(file.fileno())
+        os.replace(tmp_path, file_path)
+        written.append(file_path)
+    return written
+
+
+def is_parquet(path):
+    """Returns True if `path` is a Parquet file or a Parquet dataset folder."""
+    return os.path.isdir(path) or path.endswith(".parquet")
+
+
+def output_files(root, exclude=()):
+    """
+    Lists the crawler and translator outputs below a folder.
+
+    Args:
+        root (str): Folder (or single file) to scan.
+        exclude (Iterable[str], optional): Folders below `root` to skip, e.g. an archive. Default is none.
+
+    Returns:
+        list: Sorted paths of CSV files and Parquet part files. Parquet datasets are listed
+            file by file, so files added to a dataset later can be processed on their own.
+    """
+    if os.path.isfile(root):
+        return [root]
+    exclude = {os.path.abspath(folder) for folder in exclude}
+    paths = []
+    for folder, folders, files in os.walk(root):
+        # Checkpoints and other hidden state are not tweets
+        folders[:] = [name for name in folders
+                      if not name.startswith(".") and os.path.abspath(os.path.join(folder, name)) not in exclude]
+        paths.extend(os.path.join(folder, name) for name in files if name.endswith((".csv", ".parquet")))
+    return sorted(paths)
+
+
+def hive_partitions(path):
+    """Returns the `key=value` folder names of a Parquet part file path as a dict, e.g. {'lang': 'ar'}."""
+    return dict(part.split("=", 1) for part in os.path.normpath(path).split(os.sep)[:-1] if "=" in part)
+
+
+def read_tweets(path, columns=None, filters=None):
+    """
+    Reads tweets from a CSV file or a Parquet dataset.
+
+    Args:
+        path (str): CSV file, Parquet file or partitioned Parquet dataset folder.
+        columns (list, optional): Columns to load. Parquet input only reads these columns from disk.
+        filters (list, optional): Parquet partition/row filters, e.g. [("lang", "=", "ar")].
+
+    Returns:
+        pandas.DataFrame: Tweets. Parquet datasets also contain the `date` partition column
+            when it is requested or no `columns` are given.
+    """
+    import pandas as pd
+
+    if is_parquet(path):
+        df = pd.read_parquet(path, columns=columns, filters=filters)
+        if "lang" in df.columns:
+            df["lang"] = df["lang"].astype("string").astype("category")
+        return df
+    return pd.read_csv(path, usecols=columns)
+
+
+def iter_tweets(path, chunk_size=10_000, dtype=None):
+    """
+    Reads tweets from a CSV file or a Parquet dataset in chunks of bounded size.
+
+    Args:
+        path (str): CSV file, Parquet file or partitioned Parquet dataset folder.
+        chunk_size (int, optional): Maximum number of rows per chunk. Default is 10,000.
+        dtype (optional): Column types of a CSV input, e.g. str to parse ids exactly later. Ignored for Parquet.
+
+    Yields:
+        pandas.DataFrame: Consecutive chunks of the input, always in the same order.
+    """
+    import pandas as pd
+
+    if not is_parquet(path):
+        yield from pd.read_csv(path, chunksize=chunk_size, dtype=dtype)
+        return
+
+    import pyarrow.dataset as ds
+
+    import pyarrow as pa
+
+    def to_frame(batches):
+        df = pa.Table.from_batches(batches).to_pandas()
+        if "lang" in df.columns:
+            df["lang"] = df["lang"].astype("string").astype("category")
+        return df
+
+    # Record batches end at file boundaries, so small partition files are combined into full chunks
+    dataset = ds.dataset(path, format="parquet", partitioning="hive")
+    batches, rows = [], 0
+    for batch in dataset.to_batches(batch_size=chunk_size):
+        while batch.num_rows:
+            take = batch.slice(0, chunk_size - rows)
+            batches.append(take)
+            rows += take.num_rows
+            batch = batch.slice(take.num_rows)
+            if rows == chunk_size:
+                yield to_frame(batches)
+                batches, rows = [], 0
+    if rows:
+        yield to_frame(batches)
+
+
+def write_tweets(df, path, output_format="csv"):
+    """
+    Writes processed tweets in the given format.
+
+    Args:
+        df (pandas.DataFrame): Tweets to write.
+        path (str): Output path without extension.
+        output_format (str, optional): "csv" writes '<path>.csv', "parquet" writes a dataset
+            partitioned by day and language to '<path>/', replacing an existing one. Default is "csv".
+
+    Returns:
+        str: Path of the written file or dataset folder.
+    """
+    if output_format == "csv":
+        file_path = f"{path}.csv"
+        df.to_csv(file_path, index=False)
+        metrics.inc("tweets_written_total", len(df))
+        return file_path
+    if output_format == "parquet":
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        write_parquet_dataset(df, path)
+        metrics.inc("tweets_written_total", len(df))
+        return path
+    raise ValueError(f"Unknown output format: {output_format}")
+
+
+def process_in_chunks(input_path, output_path, process, output_format="csv", chunk_size=10_000, resume=False,
+                      on_written=None):
+    """
+    Streams an input file through `process` chunk by chunk, appending every result to the output.
+
+    Memory stays bounded by the chunk size. After every chunk the output is fsynced and the
+    progress is saved to '<output_path>.progress.json', so a resumed run continues after the
+    last completed chunk. Rows of a chunk that was cut off by a crash are discarded: a CSV
+    output is truncated to its size after the last completed chunk, and Parquet parts are
+    named after their chunk, so the repeated chunk replaces them.
+
+    Args:
+        input_path (str): CSV file, Parquet file or Parquet dataset folder.
+        output_path (str): Output path without extension.
+        process (callable): Takes a chunk (pandas.DataFrame) and returns the frame to write.
+        output_format (str, optional): "csv" or "parquet". Default is "csv".
+        chunk_size (int, optional): Number of input rows per chunk. Default is 10,000.
+        resume (bool, optional): Continue an interrupted run of the same input and chunk size.
+            Otherwise an existing output is replaced. Default is False.
+        on_written (callable, optional): Called with every processed chunk once it is durable.
+
+    Returns:
+        str: Path of the written file or dataset folder.
+
+    Raises:
+        ValueError: If the progress to resume belongs to another input or chunk size.
+    """
+    if output_format not in ("csv", "parquet"):
+        raise ValueError(f"Unknown output format: {output_format}")
+    file_path = f"{output_path}.csv" if output_format == "csv" else output_path
+    progress_path = f"{output_path}.progress.json"
+
+    state = load_checkpoint(progress_path) if resume else None
+    if state is not None:
+        if state["input"] != os.path.abspath(input_path) or state["chunk_size"] != chunk_size:
+            raise ValueError(f"{progress_path} belongs to another input or chunk size, run without resume.")
+        if state["completed"]:
+            print(f"{file_path} is already complete.")
+            return file_path
+        if output_format == "csv" and os.path.exists(file_path):
+            with open(file_path, "r+b") as file:
+                file.truncate(state["output_size"])
+        print(f"Resuming after chunk {state['chunks_done']} ({state['rows_done']} rows).")
+    else:
+        if os.path.isdir(file_path):
+            shutil.rmtree(file_path)
+        elif os.path.exists(file_path):
+            os.remove(file_path)
+        state = {"input": os.path.abspath(input_path), "chunk_size": chunk_size, "output_format": output_format,
+                 "chunks_done": 0, "rows_done": 0, "output_size": 0, "completed": False}
+
+    for chunk_index, chunk in enumerate(iter_tweets(input_path, chunk_size)):
+        if chunk_index < state["chunks_done"]:
+            continue
+
+        df = process(chunk)
+        if output_format == "csv":
+            with open(file_path, "a", encoding="utf-8", newline="") as file:
+                df.to_csv(file, index=False, header=state["output_size"] == 0)
+                file.flush()
+                os.fsync(file.fileno())
+            state["output_size"] = os.path.getsize(file_path)
+        else:
+            write_parquet_dataset(df, file_path, part_id=f"chunk-{chunk_index:06d}")
+        metrics.inc("tweets_written_total", len(df))
+
+        if on_written is not None:
+            on_written(df)
+        state["chunks_done"] = chunk_index + 1
+        state["rows_done"] += len(chunk)
+        save_checkpoint(progress_path, state)
+        print(f"Chunk {chunk_index + 1} done ({state['rows_done']} rows).")
+
+    state["completed"] = True
+    save_checkpoint(progress_path, state)
+    return file_path
+
+
+@contextmanager
+def handle_termination(signals=(signal.SIGTERM,)):
+    """
+    Turns termination signals into a clean shutdown.
+
+    While active, a received signal only sets `shutdown_event`: crawl loops stop at the next
+    page and rate limit and retry waits return early (see `rate_limit.sleep`), so every open
+    sink is closed (flushed and fsynced) by its `with` block. Nothing is raised from the
+    signal handler, so a write can never be interrupted halfway. When the block ends after
+    a signal, SystemExit with the signal's exit status is raised.
+
+    Args:
+        signals (tuple, optional): Signals to handle. Default is (SIGTERM,), which is what
+            `docker stop` sends. SIGINT already raises KeyboardInterrupt.
+    """
+    received = []
+
+    def handler(signum, frame):
+        print(f"Received signal {signum}, shutting down.")
+        received.append(signum)
+        shutdown_event.set()
+
+    previous = {sig: signal.signal(sig, handler) for sig in signals}
+    try:
+        yield
+    except BaseException:
+        shutdown_event.set()
+        raise
+    finally:
+        for sig, previous_handler in previous.items():
+            signal.signal(sig, previous_handler)
+    if received:
+        raise SystemExit(128 + received[0])
@@ -0,0 +1,104 @@
+import json
+
+
+DEFAULT_SERVER_URL = "http://127.0.0.1:8765"
+
+MARIAN_MODEL = "Helsinki-NLP/opus-mt-ar-en"
+
+# Twitter language codes that differ from the source language codes of the opus-mt models
+MARIAN_LANGUAGES = {"iw": "he", "in": "id"}
+
+# Backend names used in translation cache keys; both local engines run the same model
+CACHE_BACKENDS = {"google": "google-translate-v3", "marian": MARIAN_MODEL, "ctranslate2": MARIAN_MODEL}
+
+
+def get_translator(backend="google", batch_size=20, workers=4, model_dir="./models", chars_per_minute=6_000_000):
+    """
+    Sets up the translation function of a backend.
+
+    The backend modules are imported here, so the pipeline and the translation server
+    only need the dependencies of the backends they use.
+
+    Args:
+        backend (str, optional): "google" (Cloud Translation API, see `translator_api`),
+            "marian" (local opus-mt-ar-en, GPU if available) or "ctranslate2" (int8-quantized
+            opus-mt-ar-en on CPU, see `translator_gpu`). Default is "google".
+        batch_size (int, optional): Maximum number of texts per request or batch. Default is 20.
+        workers (int, optional): Concurrent requests of the Google backend. Default is 4.
+        model_dir (str, optional): Folder of converted CTranslate2 models. Default is "./models".
+        chars_per_minute (int, optional): Characters per minute quota of the Google backend, shared by
+            all calls of the returned function; 0 disables it. Default is 6,000,000.
+
+    Returns:
+        tuple: Function translating a list of texts, and the backend name used in cache keys.
+    """
+    if backend == "google":
+        from translator_api import get_client as get_translation_client, batch_translate
+        from rate_limit import TokenBucket
+
+        client, parent = get_translation_client()
+        limiter = TokenBucket(chars_per_minute) if chars_per_minute else None
+        translate = lambda texts: batch_translate(client, parent, texts, batch_size=batch_size, max_workers=workers,
+                                                  limiter=limiter)
+        return translate, CACHE_BACKENDS[backend]
+
+    if backend in ("marian", "ctranslate2"):
+        from translator_gpu import load_pipeline, bucketed_translate
+
+        model_name = MARIAN_MODEL
+        device_index = -1
+        if backend == "marian":
+            import torch
+
+            device_index = 0 if torch.cuda.is_available() else -1
+        pipe = load_pipeline(model_name, backend="transformers" if backend == "marian" else backend,
+                             model_dir=model_dir, device_index=device_index)
+        translate = lambda texts: bucketed_translate(pipe, texts, max_batch_size=batch_size, progress=False)
+        return translate, model_name
+
+    raise ValueError(f"Unknown translation backend: {backend}")
+
+
+def marian_model(lang):
+    """Returns the name of the opus-mt model translating a language to English, e.g. 'Helsinki-NLP/opus-mt-he-en'."""
+    return f"Helsinki-NLP/opus-mt-{MARIAN_LANGUAGES.get(lang, lang)}-en"
+
+
+def server_translator(backend, url=DEFAULT_SERVER_URL, timeout=600.0):
+    """
+    Returns a translation function backed by a running translation server (see `translation_server`).
+
+    Args:
+        backend (str): Backend to use: "google", "marian" or "ctranslate2".
+        url (str, optional): Server URL. Default is "http://127.0.0.1:8765".
+        timeout (float, optional): Timeout in seconds of a translation request. Default is 600.
+
+    Returns:
+        callable or None: Takes a list of texts and returns their translations in order,
+            or None if no server is reachable or it does not serve `backend`.
+    """
+    if not url:
+        return None
+
+    from urllib import request as urllib_request
+    from urllib.error import URLError
+
+    try:
+        with urllib_request.urlopen(f"{url}/health", timeout=1.0) as response:
+            backends = json.load(response)["backends"]
+    except (URLError, OSError, ValueError, KeyError):
+        return None
+    if backend not in backends:
+        print(f"Translation server at {url} does not serve {backend}, translating in process.")
+        return None
+
+    def translate(texts):
+        if not texts:
+            return []
+        body = json.dumps({"backend": backend, "texts": list(texts)}).encode("utf-8")
+        request = urllib_request.Request(f"{url}/translate", data=body, headers={"Content-Type": "application/json"})
+        with urllib_request.urlopen(request, timeout=timeout) as response:
+            return json.load(response)["translations"]
+
+    print(f"Using translation server at {url} ({backend}).")
+    return translate
@@ -0,0 +1,198 @@
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+from metrics import metrics
+
+
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def normalize_text(text):
+    """
+    Normalizes a source text for cache lookups: Unicode NFKC and collapsed whitespace.
+
+    Args:
+        text (str): Source text.
+
+    Returns:
+        str: Normalized text.
+    """
+    return WHITESPACE_PATTERN.sub(" ", unicodedata.normalize("NFKC", text)).strip()
+
+
+def cache_key(text, backend, target_language):
+    """
+    Returns the content address of a translation.
+
+    Args:
+        text (str): Normalized source text.
+        backend (str): Translation backend or model name.
+        target_language (str): Target language code.
+
+    Returns:
+        str: Hex SHA-256 digest of backend, target language and text.
+    """
+    return hashlib.sha256(f"{backend}\0{target_language}\0{text}".encode("utf-8")).hexdigest()
+
+
+class TranslationCache:
+    """
+    Persistent, size-bounded LRU cache of translations shared by both translators.
+
+    Entries are keyed by a hash of the normalized source text, the backend (API or model)
+    and the target language, and stored in SQLite. Every lookup refreshes the entry's
+    last use; once more than `max_entries` are stored, the least recently used are evicted.
+
+    Args:
+        path (str): Path to the SQLite database file.
+        max_entries (int, optional): Maximum number of cached translations. Default is 1,000,000.
+
+    Example:
+        with TranslationCache("./output/translation_cache.sqlite") as cache:
+            translations = translate_with_cache(texts, translate, cache, backend="google")
+            print(f"Cache hit rate: {cache.hit_rate:.1%}")
+    """
+
+    def __init__(self, path, max_entries=1_000_000):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS translations "
+            "(key TEXT PRIMARY KEY, translation TEXT NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS translations_last_used ON translations (last_used)")
+        self._connection.commit()
+        # Upper bound of the stored entries, so inserts need no full count; replaced keys and
+        # entries evicted by other processes are corrected by the exact count before an eviction
+        self._count = self._connection.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+
+    @property
+    def hit_rate(self):
+        """float: Share of lookups answered from the cache."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def get_many(self, keys):
+        """
+        Looks up translations and refreshes their last use.
+
+        Args:
+            keys (list): Cache keys (see `cache_key`).
+
+        Returns:
+            dict: Cached translations by key; missing keys are absent.
+        """
+        found = {}
+        with self._lock:
+            # SQLite limits the number of bound parameters per statement
+            for i in range(0, len(keys), 500):
+                chunk = keys[i: i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._connection.execute(
+                    f"SELECT key, translation FROM translations WHERE key IN ({placeholders})", chunk
+                )
+                found.update(rows)
+
+            now = time.time()
+            self._connection.executemany(
+                "UPDATE translations SET last_used = ? WHERE key = ?", [(now, key) for key in found]
+            )
+            self._connection.commit()
+        return found
+
+    def put_many(self, items):
+        """
+        Stores translations and evicts the least recently used entries above `max_entries`.
+
+        Args:
+            items (dict): Translations by cache key.
+        """
+        now = time.time()
+        with self._lock:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO translations VALUES (?, ?, ?)",
+                [(key, translation, now) for key, translation in items.items()]
+            )
+            self._count += len(items)
+            if self._count > self.max_entries:
+                self._count = self._connection.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+            if self._count > self.max_entries:
+                self._connection.execute(
+                    "DELETE FROM translations WHERE key IN "
+                    "(SELECT key FROM translations ORDER BY last_used LIMIT ?)",
+                    (self._count - self.max_entries,)
+                )
+                self._count = self.max_entries
+            self._connection.commit()
+
+    def close(self):
+        """Closes the database."""
+        with self._lock:
+            self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def translate_with_cache(texts, translate, cache, backend, target_language="en"):
+    """
+    Translates texts, sending only cache misses to the translation backend.
+
+    Texts that are identical after normalization are translated once, also within a run.
+    Translation time, translated texts and characters, and cache hits and misses are
+    recorded in the process metrics.
+
+    Args:
+        texts (list): Source texts.
+        translate (callable): Takes a list of texts and returns their translations in order.
+        cache (TranslationCache or None): Cache to use. Without a cache all texts are translated.
+        backend (str): Translation backend or model name, part of the cache key.
+        target_language (str, optional): Target language code. Default is "en".
+
+    Returns:
+        list: Translations in the order of `texts`.
+    """
+    def timed_translate(texts):
+        with metrics.time("translation_seconds", backend=backend):
+            translations = translate(texts)
+        metrics.inc("translated_texts_total", len(texts), backend=backend)
+        metrics.inc("translated_chars_total", sum(len(text) for text in texts), backend=backend)
+        return translations
+
+    if cache is None:
+        return timed_translate(texts)
+
+    keys = [cache_key(normalize_text(text), backend, target_language) for text in texts]
+    found = cache.get_many(list(set(keys)))
+
+    # One source text per missing key, in first-seen order
+    missing = {}
+    for key, text in zip(keys, texts):
+        if key not in found and key not in missing:
+            missing[key] = text
+
+    # Repeated texts within the run are served like cache hits
+    cache.hits += len(keys) - len(missing)
+    cache.misses += len(missing)
+    metrics.inc("translation_cache_lookups_total", len(keys) - len(missing), result="hit")
+    metrics.inc("translation_cache_lookups_total", len(missing), result="miss")
+
+    if missing:
+        translations = timed_translate(list(missing.values()))
+        new_items = dict(zip(missing.keys(), translations))
+        cache.put_many(new_items)
+        found.update(new_items)
+
+    return [found[key] for key in keys]
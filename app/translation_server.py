@@ -0,0 +1,189 @@
+import json
+import time
+import queue
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from translation_backends import get_translator
+from metrics import metrics
+
+
+class MicroBatcher:
+    """
+    Combines concurrent translation requests into shared backend calls.
+
+    Requests arriving within `max_wait` seconds of each other are translated together,
+    up to `max_batch_size` texts, and every caller gets its own slice of the result.
+
+    Args:
+        translate (callable): Takes a list of texts and returns their translations in order.
+        max_batch_size (int, optional): Number of texts that closes a batch early. Default is 256.
+        max_wait (float, optional): Seconds a batch waits for more requests. Default is 0.02.
+
+    Example:
+        batcher = MicroBatcher(translate)
+        translations = batcher.translate(["..."])  # thread-safe
+    """
+
+    def __init__(self, translate, max_batch_size=256, max_wait=0.02):
+        self._translate = translate
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def translate(self, texts):
+        """
+        Translates texts together with concurrent requests.
+
+        Args:
+            texts (list): Texts to be translated.
+
+        Returns:
+            list: Translated texts in order.
+        """
+        if not texts:
+            return []
+        pending = {"texts": list(texts), "done": threading.Event(), "result": None, "error": None}
+        self._queue.put(pending)
+        pending["done"].wait()
+        if pending["error"] is not None:
+            raise pending["error"]
+        return pending["result"]
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            size = len(batch[0]["texts"])
+            deadline = time.monotonic() + self.max_wait
+            while size < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+                size += len(batch[-1]["texts"])
+
+            # Requests per batch is micro_batch_requests_total / micro_batches_total
+            metrics.inc("micro_batches_total")
+            metrics.inc("micro_batch_requests_total", len(batch))
+            try:
+                translations = self._translate([text for pending in batch for text in pending["texts"]])
+                start = 0
+                for pending in batch:
+                    pending["result"] = translations[start: start + len(pending["texts"])]
+                    start += len(pending["texts"])
+            except Exception as e:
+                for pending in batch:
+                    pending["error"] = e
+            finally:
+                for pending in batch:
+                    pending["done"].set()
+
+
+class TranslationRequestHandler(BaseHTTPRequestHandler):
+    """
+    HTTP interface of the translation server.
+
+    - `GET /health` returns `{"backends": [...]}`.
+    - `POST /translate` with `{"backend": "google", "texts": [...]}` returns `{"translations": [...]}`.
+    """
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/metrics":
+            body = metrics.prometheus_text({"entry_point": "translation_server"}).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        if self.path != "/health":
+            self._send_json(404, {"error": f"Unknown path: {self.path}"})
+            return
+        self._send_json(200, {"backends": sorted(self.server.batchers)})
+
+    def do_POST(self):
+        if self.path != "/translate":
+            self._send_json(404, {"error": f"Unknown path: {self.path}"})
+            return
+        try:
+            payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            batcher = self.server.batchers[payload["backend"]]
+            texts = payload["texts"]
+        except (ValueError, KeyError) as e:
+            self._send_json(400, {"error": f"Bad request: {e}"})
+            return
+        try:
+            self._send_json(200, {"translations": batcher.translate(texts)})
+        except Exception as e:
+            self._send_json(500, {"error": str(e)})
+
+    def log_message(self, format, *args):
+        # One line per request would drown the batch statistics
+        pass
+
+
+def serve(backends, host="127.0.0.1", port=8765, batch_size=20, workers=4, model_dir="./models",
+          max_batch_size=256, max_wait=0.02):
+    """
+    Runs the translation server until interrupted.
+
+    Every backend is loaded once at start-up (model weights, API client and credentials)
+    and stays loaded for all requests.
+
+    Args:
+        backends (list): Backends to load: "google", "marian" and/or "ctranslate2".
+        host (str, optional): Interface to listen on. Default is "127.0.0.1".
+        port (int, optional): Port to listen on. Default is 8765.
+        batch_size (int, optional): Maximum number of texts per API request or model batch. Default is 20.
+        workers (int, optional): Concurrent requests of the Google backend. Default is 4.
+        model_dir (str, optional): Folder of converted CTranslate2 models. Default is "./models".
+        max_batch_size (int, optional): Number of texts that closes a micro-batch early. Default is 256.
+        max_wait (float, optional): Seconds a micro-batch waits for more requests. Default is 0.02.
+    """
+    server = ThreadingHTTPServer((host, port), TranslationRequestHandler)
+    server.daemon_threads = True
+    server.batchers = {}
+    for backend in backends:
+        start = time.monotonic()
+        translate, _ = get_translator(backend, batch_size=batch_size, workers=workers, model_dir=model_dir)
+        server.batchers[backend] = MicroBatcher(translate, max_batch_size=max_batch_size, max_wait=max_wait)
+        metrics.set("backend_load_seconds", time.monotonic() - start, backend=backend)
+        print(f"Loaded {backend} in {time.monotonic() - start:.1f}s.")
+
+    print(f"Translation server listening on http://{host}:{port} ({', '.join(backends)}).")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve translations with models and API clients kept loaded.")
+    parser.add_argument("--backends", type=str, default="google", help="Comma separated backends to load: google, marian, ctranslate2. Default is 'google'.")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Interface to listen on. Default is '127.0.0.1'.")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on. Default is 8765.")
+    parser.add_argument("--batch-size", type=int, default=20, help="Maximum number of texts per API request or model batch. Default is 20.")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent requests of the Google backend. Default is 4.")
+    parser.add_argument("--model-dir", type=str, default="./models", help="Folder of converted CTranslate2 models. Default is './models'.")
+    parser.add_argument("--max-batch-size", type=int, default=256, help="Number of texts that closes a micro-batch early. Default is 256.")
+    parser.add_argument("--max-wait-ms", type=float, default=20, help="Milliseconds a micro-batch waits for concurrent requests. Default is 20.")
+    args = parser.parse_args()
+
+    serve(backends=[backend.strip() for backend in args.backends.split(",") if backend.strip()], host=args.host,
+          port=args.port, batch_size=args.batch_size, workers=args.workers, model_dir=args.model_dir,
+          max_batch_size=args.max_batch_size, max_wait=args.max_wait_ms / 1000)
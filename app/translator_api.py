@@ -1,27 +1,29 @@
 import os
-import re
-import pandas as pd
-from google.oauth2 import service_account
-from google.cloud import translate
+import sys
+from preprocessing import preprocess_arabic
+from storage import read_tweets, write_tweets, process_in_chunks
+from dedup_index import TweetIdIndex, indexed_mask, tweet_id_column
+from translation_cache import TranslationCache, translate_with_cache
+from translation_backends import DEFAULT_SERVER_URL, server_translator
+from rate_limit import TokenBucket, backoff_delay
+from metrics import metrics, record_run
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
 import time
-from tqdm import tqdm
 import json
 
 
-def extract_arabic(text):
-    """
-    Extracts Arabic text from a given string.
-
-    Args:
-        text (str): Input text.
-
-    Returns:
-        str: Extracted Arabic text.
-    """
-    arabic_pattern = r'[\u0600-\u06FF\u0750-\u077F\u08A0-\u08FF]+'
-    arabic_text = re.findall(arabic_pattern, text)
-    return " ".join(arabic_text)
+@lru_cache(maxsize=None)
+def transient_errors():
+    """Returns the API errors worth retrying: quota, overload and timeouts."""
+    from google.api_core import exceptions as google_exceptions
 
+    return (
+        google_exceptions.TooManyRequests,
+        google_exceptions.ServiceUnavailable,
+        google_exceptions.InternalServerError,
+        google_exceptions.DeadlineExceeded,
+    )
 
 def get_client():
     """
@@ -30,6 +32,8 @@ def get_client():
     Returns:
         tuple: A tuple containing the Translation API client and the parent resource.
     """
+    from google.oauth2 import service_account
+    from google.cloud import translate
 
     credentials_path = "google_credentials.json"
     service_account_info = json.load(open(credentials_path))
@@ -44,91 +48,272 @@ def get_client():
     return client, parent
 
 
-def batch_translate(client, parent, texts, batch_size=20, delay_seconds=0.0):
+def pack_batches(texts, max_items=20, max_chars=30_000):
+    """
+    Groups consecutive texts into request batches by item count and character budget.
+
+    The Translation API limits a request by the number of contents and by their total
+    length in codepoints, so short texts are packed densely and long texts get batches
+    of their own.
+
+    Args:
+        texts (list): Texts to be translated.
+        max_items (int, optional): Maximum number of texts per batch. Default is 20.
+        max_chars (int, optional): Maximum number of codepoints per batch. Default is 30,000.
+
+    Returns:
+        list: (start, end) index ranges of the batches, in order.
+    """
+    batches = []
+    start, chars = 0, 0
+    for i, text in enumerate(texts):
+        if i > start and (i - start >= max_items or chars + len(text) > max_chars):
+            batches.append((start, i))
+            start, chars = i, 0
+        chars += len(text)
+    if start < len(texts):
+        batches.append((start, len(texts)))
+    return batches
+
+
+def translate_request(client, parent, texts, limiter=None, max_retries=5, delay_seconds=0.0):
+    """
+    Sends one translate_text request, retrying transient API errors with exponential backoff.
+
+    Args:
+        client: Translation API client.
+        parent (str): Parent resource of the form `projects/project-number/locations/location`.
+        texts (list): Texts of the batch.
+        limiter (TokenBucket, optional): Characters per minute limiter. Default is None.
+        max_retries (int, optional): Maximum number of retries of transient errors. Default is 5.
+        delay_seconds (float, optional): Delay in seconds after the request. Default is 0.0.
+
+    Returns:
+        list: Translated texts in order.
+    """
+    if limiter is not None:
+        metrics.inc("wait_seconds_total", limiter.acquire(sum(len(text) for text in texts)), reason="translation_quota")
+
+    for attempt in range(max_retries + 1):
+        try:
+            with metrics.time("api_request_seconds", api="google_translate"):
+                response = client.translate_text(
+                    request={
+                        "parent": parent,
+                        "contents": texts,
+                        "mime_type": "text/plain",  # mime types: text/plain, text/html
+                        "target_language_code": "en",
+                    }
+                )
+            break
+        except transient_errors() as e:
+            metrics.inc("api_errors_total", api="google_translate", error=type(e).__name__)
+            if attempt == max_retries:
+                raise
+            delay = backoff_delay(attempt)
+            print(f"Translation request failed ({e}), retrying in {delay:.1f} seconds.")
+            time.sleep(delay)
+            metrics.inc("wait_seconds_total", delay, reason="retry")
+
+    if delay_seconds:
+        time.sleep(delay_seconds)
+        metrics.inc("wait_seconds_total", delay_seconds, reason="sleep_delay")
+    return [translation.translated_text for translation in response.translations]
+
+
+def batch_translate(client, parent, texts, batch_size=20, delay_seconds=0.0, max_chars=30_000, max_workers=4,
+                    limiter=None):
     """
-    Translates a batch of texts using the provided Translation API client.
+    Translates texts using the provided Translation API client.
+
+    Texts are packed into batches of at most `batch_size` texts and `max_chars` codepoints,
+    and up to `max_workers` batches are in flight at once. A token bucket keeps the sent
+    characters within the characters per minute quota. A batch that still fails after its
+    retries is split and its texts are translated one by one, so a single bad text does
+    not fail its neighbours. Results keep the order of `texts`.
 
     Args:
         client: Translation API client.
         parent (str): Parent resource of the form `projects/project-number/locations/location`.
         texts (list): List of texts to be translated.
-        batch_size (int, optional): Size of each translation batch. Default is 20.
-        delay_seconds (float, optional): Delay in seconds between each batch. Default is 0.0.
+        batch_size (int, optional): Maximum number of texts per request. Default is 20.
+        delay_seconds (float, optional): Delay in seconds after each request of a worker. Default is 0.0.
+        max_chars (int, optional): Maximum number of codepoints per request. Default is 30,000.
+        max_workers (int, optional): Number of concurrent requests. Default is 4.
+        limiter (TokenBucket, optional): Characters per minute limiter. Create it once per process and
+            pass it to every call, so the quota holds across calls. Default is None (no limit).
 
     Returns:
         list: List of translated texts.
     """
-    translated_texts = []
-    for i in tqdm(range(0, len(texts), batch_size)):
-        batch = texts[i: i+batch_size]
-        response = client.translate_text(
-            request={
-                "parent": parent,
-                "contents": batch,
-                "mime_type": "text/plain",  # mime types: text/plain, text/html
-                "target_language_code": "en",
-            }
-        )
-        batch_result = [translation.translated_text for translation in response.translations]
-        translated_texts.extend(batch_result)
+    from tqdm import tqdm
 
-        time.sleep(delay_seconds)
+    translated_texts = [None] * len(texts)
+
+    def translate_batch(start, end):
+        batch = texts[start:end]
+        try:
+            translated_texts[start:end] = translate_request(client, parent, batch, limiter, delay_seconds=delay_seconds)
+        except Exception as e:
+            if len(batch) == 1:
+                raise
+            print(f"Batch {start}-{end} failed ({e}), translating its texts individually.")
+            for i in range(start, end):
+                translated_texts[i], = translate_request(client, parent, [texts[i]], limiter, delay_seconds=delay_seconds)
+        return end - start
+
+    batches = pack_batches(texts, max_items=batch_size, max_chars=max_chars)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor, tqdm(total=len(texts)) as progress:
+        futures = [executor.submit(translate_batch, start, end) for start, end in batches]
+        try:
+            for future in as_completed(futures):
+                progress.update(future.result())
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
 
     return translated_texts
 
 
-def main(file_path, output_folder="./output", batch_size=20, delay_seconds=0.0):
+def main(file_path, output_folder="./output", batch_size=20, delay_seconds=0.0, output_format="csv", index_path=None,
+         cache_path=None, cache_size=1_000_000, max_chars=30_000, workers=4, chars_per_minute=6_000_000,
+         chunk_size=None, resume=False, server_url=DEFAULT_SERVER_URL):
     """
-    Process Arabic text from a CSV file, translate it to English, and save the results.
+    Process Arabic text from a CSV file or Parquet dataset, translate it to English, and save the results.
 
     Args:
-        file_path (str): Path to the input CSV file.
+        file_path (str): Path to the input CSV file, Parquet file or Parquet dataset folder.
         output_folder (str): Path to the output folder. Default is "./output".
-        batch_size (int): Batch size for translation. Default is 20.
+        batch_size (int): Maximum number of texts per translation request. Default is 20.
+        delay_seconds (float): Delay in seconds after each request of a worker. Default is 0.0.
+        output_format (str): "csv" or "parquet" (dataset partitioned by day and language). Default is "csv".
+        index_path (str): Optional path to a tweet id index. Tweets translated by earlier runs are
+            kept in the output but not translated again. Default is None.
+        cache_path (str): Optional path to the persistent translation cache shared with translator_gpu. Default is None.
+        cache_size (int): Maximum number of cached translations. Default is 1,000,000.
+        max_chars (int): Maximum number of codepoints per translation request. Default is 30,000.
+        workers (int): Number of concurrent translation requests. Default is 4.
+        chars_per_minute (int): Characters per minute quota, 0 to disable. Default is 6,000,000.
+        chunk_size (int): Stream the input in chunks of this many rows, appending each translated chunk
+            to the output. None translates the whole file at once. Default is None.
+        resume (bool): In chunked mode, continue an interrupted run after its last completed chunk. Default is False.
+        server_url (str): URL of a translation server (see `translation_server`). If it is reachable,
+            texts are translated there; otherwise in this process. None disables it. Default is "http://127.0.0.1:8765".
     """
-    base_name = os.path.basename(file_path)
+    base_name = os.path.basename(os.path.normpath(file_path))
     file_name = os.path.splitext(base_name)[0]
 
-    df = pd.read_csv(file_path)
+    index = TweetIdIndex(index_path, namespace="translated") if index_path else None
+    # A running translation server already holds the API client
+    translate = server_translator("google", url=server_url)
+    if translate is None:
+        client, parent = get_client()
+        # One bucket for the whole run, so the quota holds across chunks
+        limiter = TokenBucket(chars_per_minute) if chars_per_minute else None
+        translate = lambda texts: batch_translate(
+            client=client,
+            parent=parent,
+            texts=texts,
+            batch_size=batch_size,
+            delay_seconds=delay_seconds,
+            max_chars=max_chars,
+            max_workers=workers,
+            limiter=limiter
+        )
+    cache = TranslationCache(cache_path, max_entries=cache_size) if cache_path else None
 
-    mask = df.lang == "ar"
-    print(f"df len: {len(df)} len mask: {sum(mask)}")
-    tweet_text = df[mask]["text"]
-    clean_tweet_text = [extract_arabic(tweet) for tweet in tweet_text]
+    def translate_chunk(df):
+        # Tweets translated by earlier runs stay in the output, only their translation is skipped
+        indexed = indexed_mask(df, index)
+        if index is not None:
+            print(f"Skipping {indexed.sum()} already translated tweets.")
 
-    client, parent = get_client()
+        mask = (df.lang == "ar") & ~indexed
+        clean_tweet_text = preprocess_arabic(df.loc[mask, "text"])
+        print(f"df len: {len(df)} len mask: {sum(mask)} non-empty: {len(clean_tweet_text)}")
 
-    translation = batch_translate(
-        client=client,
-        parent=parent,
-        texts=clean_tweet_text,
-        batch_size=batch_size,
-        delay_seconds=delay_seconds
-    )
-    print(f" translated len: {len(translation)}")
+        translation = translate_with_cache(
+            texts=clean_tweet_text.tolist(),
+            translate=translate,
+            cache=cache,
+            backend="google-translate-v3"
+        )
+        print(f" translated len: {len(translation)}")
+
+        df["en_translation"] = None
+        df.loc[clean_tweet_text.index, "en_translation"] = translation
+        return df
 
-    df["en_translation"] = None
-    df.loc[mask, "en_translation"] = translation
+    def mark_translated(df):
+        id_column = tweet_id_column(df) if index is not None else None
+        if id_column is not None:
+            index.add_many(df.loc[df.lang == "ar", id_column].dropna())
+            index.commit()
 
-    csv_filename = os.path.join(output_folder, f"{file_name}_post_processed.csv")
+    output_path = os.path.join(output_folder, f"{file_name}_post_processed")
     # Create folder if it doesn't exist
     os.makedirs(output_folder, exist_ok=True)
-    df.to_csv(csv_filename, index=False)
-    print(f"Saved to: {csv_filename}")
+    try:
+        if chunk_size:
+            output_path = process_in_chunks(file_path, output_path, translate_chunk, output_format=output_format,
+                                            chunk_size=chunk_size, resume=resume, on_written=mark_translated)
+        else:
+            df = translate_chunk(read_tweets(file_path))
+            output_path = write_tweets(df, output_path, output_format=output_format)
+            mark_translated(df)
+        print(f"Saved to: {output_path}")
+    finally:
+        if cache is not None:
+            print(f"Translation cache: {cache.hits} hits, {cache.misses} misses, hit rate {cache.hit_rate:.1%}")
+            cache.close()
+        if index is not None:
+            index.close()
 
 
 if __name__ == "__main__":
 
     file_path = os.getenv("FILE_TO_TRANSLATE")
+    if file_path is None or not os.path.exists(file_path):
+        sys.exit(f"FILE_TO_TRANSLATE not found: {file_path}")
     output_folder = os.getenv("TRANSLATION_OUTPUT_FOLDER")
     batch_size = int(os.getenv("TRANSLATION_BATCH_SIZE"))
-    delay_seconds = int(os.getenv("TRANSLATION_API_DELAY"))
+    delay_seconds = float(os.getenv("TRANSLATION_API_DELAY"))
+    output_format = os.getenv("TRANSLATION_OUTPUT_FORMAT", "csv")
+    index_path = os.getenv("TRANSLATION_INDEX_PATH")
+    cache_path = os.getenv("TRANSLATION_CACHE_PATH")
+    cache_size = int(os.getenv("TRANSLATION_CACHE_SIZE", 1_000_000))
+    max_chars = int(os.getenv("TRANSLATION_MAX_CHARS", 30_000))
+    workers = int(os.getenv("TRANSLATION_WORKERS", 4))
+    chars_per_minute = int(os.getenv("TRANSLATION_CHARS_PER_MINUTE", 6_000_000))
+    chunk_size = int(os.getenv("TRANSLATION_CHUNK_SIZE", 0)) or None
+    resume = os.getenv("TRANSLATION_RESUME", "false").lower() == "true"
+    server_url = os.getenv("TRANSLATION_SERVER_URL", DEFAULT_SERVER_URL)
+    server_url = None if server_url.lower() in {"", "none"} else server_url
+    metrics_path = os.getenv("METRICS_PATH") or os.path.join(output_folder or ".", "metrics_translator_api.json")
+    prometheus_path = os.getenv("METRICS_PROMETHEUS_PATH")
 
     print(
         f"Passed env variables:\nfilepath: {file_path} {type(file_path)}"
         f"\noutput_folder: {output_folder} {type(output_folder)}"
         f"\nbatch_size: {batch_size} {type(batch_size)}"
         f"\ndelay_seconds: {delay_seconds} {type(delay_seconds)}"
+        f"\noutput_format: {output_format} {type(output_format)}"
+        f"\nindex_path: {index_path} {type(index_path)}"
+        f"\ncache_path: {cache_path} {type(cache_path)}"
+        f"\ncache_size: {cache_size} {type(cache_size)}"
+        f"\nmax_chars: {max_chars} {type(max_chars)}"
+        f"\nworkers: {workers} {type(workers)}"
+        f"\nchars_per_minute: {chars_per_minute} {type(chars_per_minute)}"
+        f"\nchunk_size: {chunk_size} {type(chunk_size)}"
+        f"\nresume: {resume} {type(resume)}"
+        f"\nserver_url: {server_url} {type(server_url)}"
+        f"\nmetrics_path: {metrics_path} {type(metrics_path)}"
+        f"\nprometheus_path: {prometheus_path} {type(prometheus_path)}"
     )
 
-    main(file_path=file_path, output_folder=output_folder, batch_size=batch_size, delay_seconds=delay_seconds)
\ No newline at end of file
+    with record_run("translator_api", json_path=metrics_path, prometheus_path=prometheus_path):
+        main(file_path=file_path, output_folder=output_folder, batch_size=batch_size, delay_seconds=delay_seconds,
+             output_format=output_format, index_path=index_path, cache_path=cache_path, cache_size=cache_size,
+             max_chars=max_chars, workers=workers, chars_per_minute=chars_per_minute,
+             chunk_size=chunk_size, resume=resume, server_url=server_url)
\ No newline at end of file
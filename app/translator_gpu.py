@@ -1,71 +1,626 @@
 import os
-import re
+import gc
+import sys
+import shutil
+import time
 import argparse
-import torch
-import pandas as pd
-from transformers import pipeline
+import itertools
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from preprocessing import preprocess_text
+from storage import read_tweets, write_tweets, process_in_chunks
+from dedup_index import TweetIdIndex, indexed_mask, tweet_id_column
+from translation_cache import TranslationCache, translate_with_cache
+from translation_backends import DEFAULT_SERVER_URL, MARIAN_MODEL, marian_model, server_translator
+from metrics import metrics, record_run
 
 
-def extract_arabic(text):
+class ModelLoadError(Exception):
+    """Raised when a translation model cannot be loaded or converted, e.g. because it does not exist."""
+
+
+def token_batches(lengths, max_tokens=2048, max_batch_size=64):
+    """
+    Groups inputs of similar token length into batches under a padded token budget.
+
+    Inputs are sorted by length (longest first, so memory problems show up on the first
+    batch) and a batch is closed once `batch size * longest input` would exceed `max_tokens`.
+    Batches of short tweets therefore hold many inputs and little padding.
+
+    Args:
+        lengths (list): Token length of every input.
+        max_tokens (int, optional): Budget of padded tokens per batch. Default is 2048.
+        max_batch_size (int, optional): Maximum number of inputs per batch. Default is 64.
+
+    Returns:
+        list: Batches as lists of input indices.
+    """
+    batches = []
+    batch = []
+    for i in sorted(range(len(lengths)), key=lambda i: lengths[i], reverse=True):
+        # The first input of a batch is its longest one
+        if batch and (len(batch) >= max_batch_size or (len(batch) + 1) * lengths[batch[0]] > max_tokens):
+            batches.append(batch)
+            batch = []
+        batch.append(i)
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def bucketed_translate(pipe, texts, max_tokens=2048, max_batch_size=64, progress=True):
+    """
+    Translates texts with a translation pipeline in length-bucketed batches.
+
+    Args:
+        pipe: Hugging Face translation pipeline.
+        texts (list): Texts to be translated.
+        max_tokens (int, optional): Budget of padded tokens per batch. Default is 2048.
+        max_batch_size (int, optional): Maximum number of texts per batch. Default is 64.
+        progress (bool, optional): Show a progress bar. Default is True.
+
+    Returns:
+        list: Translated texts in the order of `texts`.
     """
-    Extracts Arabic text from a given string.
+    from tqdm import tqdm
+
+    lengths = [len(ids) for ids in pipe.tokenizer(texts, truncation=True)["input_ids"]] if texts else []
+    translations = [None] * len(texts)
+    for batch in tqdm(token_batches(lengths, max_tokens, max_batch_size), disable=not progress):
+        # Padded tokens against tokens show how much compute the padding wastes
+        metrics.inc("model_tokens_total", sum(lengths[i] for i in batch))
+        metrics.inc("model_padded_tokens_total", len(batch) * lengths[batch[0]])
+        with metrics.time("model_batch_seconds"):
+            outputs = pipe([texts[i] for i in batch], batch_size=len(batch))
+        for i, output in zip(batch, outputs):
+            translations[i] = output["translation_text"]
+    return translations
+
+
+def convert_model(model_name, model_dir="./models", quantization="int8"):
+    """
+    Converts a Hugging Face translation model to a quantized CTranslate2 model, once.
+
+    The converted model is cached in `<model_dir>/<model name>-<quantization>` and reused
+    by later runs. Conversion writes to a temporary folder first, so an interrupted
+    conversion is never mistaken for a finished one.
 
     Args:
-        text (str): Input text.
+        model_name (str): Hugging Face model name, e.g. "Helsinki-NLP/opus-mt-ar-en".
+        model_dir (str, optional): Folder of converted models. Default is "./models".
+        quantization (str, optional): CTranslate2 weight quantization. Default is "int8".
 
     Returns:
-        str: Extracted Arabic text.
+        str: Path to the converted model.
     """
-    arabic_pattern = r'[\u0600-\u06FF\u0750-\u077F\u08A0-\u08FF]+'
-    arabic_text = re.findall(arabic_pattern, text)
-    return " ".join(arabic_text)
+    import ctranslate2
 
+    output_dir = os.path.join(model_dir, f"{model_name.replace('/', '--')}-{quantization}")
+    if os.path.exists(os.path.join(output_dir, "model.bin")):
+        return output_dir
 
-def main(file_path, output_folder="./output", batch_size=15):
+    print(f"Converting {model_name} to CTranslate2 ({quantization}), this is done once.")
+    tmp_dir = f"{output_dir}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    try:
+        converter = ctranslate2.converters.TransformersConverter(model_name)
+        converter.convert(tmp_dir, quantization=quantization, force=True)
+    except OSError as e:
+        # Raised by transformers for models that do not exist or cannot be downloaded
+        raise ModelLoadError(f"Cannot convert {model_name} ({e})") from e
+    os.replace(tmp_dir, output_dir)
+    return output_dir
+
+
+class CTranslate2Pipeline:
     """
-    Process Arabic text from a CSV file, translate it to English, and save the results.
+    Int8-quantized CPU engine with the calling convention of a transformers translation pipeline.
 
     Args:
-        file_path (str): Path to the input CSV file.
+        model_name (str): Hugging Face model name; its tokenizer is used as is.
+        model_dir (str, optional): Folder of converted models. Default is "./models".
+        threads (int, optional): Number of CPU threads, 0 for all cores. Default is 0.
+
+    Example:
+        pipe = CTranslate2Pipeline("Helsinki-NLP/opus-mt-ar-en")
+        pipe(["مرحبا"])  # [{'translation_text': 'Hello'}]
+    """
+
+    def __init__(self, model_name, model_dir="./models", threads=0):
+        import ctranslate2
+
+        from transformers import AutoTokenizer
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model_path = convert_model(model_name, model_dir)
+        self.model_bytes = os.path.getsize(os.path.join(model_path, "model.bin"))
+        self.translator = ctranslate2.Translator(model_path, device="cpu", compute_type="int8", intra_threads=threads)
+
+    def __call__(self, texts, batch_size=32):
+        sources = [self.tokenizer.convert_ids_to_tokens(ids) for ids in self.tokenizer(texts, truncation=True)["input_ids"]]
+        results = self.translator.translate_batch(sources, max_batch_size=batch_size)
+        return [
+            {"translation_text": self.tokenizer.decode(
+                self.tokenizer.convert_tokens_to_ids(result.hypotheses[0]), skip_special_tokens=True
+            )}
+            for result in results
+        ]
+
+
+def load_pipeline(model_name, backend="transformers", model_dir="./models", threads=0, device_index=-1):
+    """
+    Loads the translation engine of a backend.
+
+    Args:
+        model_name (str): Hugging Face model name.
+        backend (str, optional): "transformers" or "ctranslate2". Default is "transformers".
+        model_dir (str, optional): Folder of converted CTranslate2 models. Default is "./models".
+        threads (int, optional): Number of CPU threads, 0 to keep the library default. Default is 0.
+        device_index (int, optional): CUDA device of the transformers backend, -1 for CPU. Default is -1.
+
+    Returns:
+        Callable translation pipeline.
+
+    Raises:
+        ModelLoadError: If the model cannot be loaded.
+
+    Note:
+        The load time (including a first CTranslate2 conversion) is recorded in the
+        `model_load_seconds` gauge of the process metrics, by backend and model.
+    """
+    start = time.perf_counter()
+    try:
+        if backend == "ctranslate2":
+            pipe = CTranslate2Pipeline(model_name, model_dir=model_dir, threads=threads)
+        else:
+            import torch
+            from transformers import pipeline
+
+            if threads:
+                torch.set_num_threads(threads)
+            pipe = pipeline("translation", model=model_name, device=device_index)
+    except OSError as e:
+        # Raised by transformers for models that do not exist or cannot be downloaded
+        raise ModelLoadError(f"Cannot load {model_name} ({e})") from e
+    metrics.set("model_load_seconds", time.perf_counter() - start, backend=backend, model=model_name)
+    return pipe
+
+
+def model_memory(pipe):
+    """
+    Estimates the memory held by a loaded translation engine.
+
+    Args:
+        pipe: Engine returned by `load_pipeline`.
+
+    Returns:
+        int: Size in bytes of the CTranslate2 weights or of the PyTorch parameters and buffers,
+            0 for engines of unknown size.
+    """
+    if isinstance(pipe, CTranslate2Pipeline):
+        return pipe.model_bytes
+    model = getattr(pipe, "model", None)
+    if not hasattr(model, "parameters"):
+        return 0
+    return sum(tensor.numel() * tensor.element_size() for tensor in itertools.chain(model.parameters(), model.buffers()))
+
+
+class ModelPool:
+    """
+    Memory-bounded LRU pool of loaded translation engines.
+
+    Engines are loaded on first use and kept for later calls, so an input mixing several
+    languages loads every model once. When the estimated memory of the loaded engines (see
+    `model_memory`) would exceed `max_bytes`, the least recently used engines are unloaded,
+    before a load as well, assuming the new engine is as large as the largest loaded one.
+    The engine in use is never unloaded, so a model larger than the budget still works.
+
+    Args:
+        load (callable): Takes a model name and returns a loaded engine.
+        max_bytes (int, optional): Memory budget of the loaded engines. Default is 2 GiB.
+
+    Example:
+        pool = ModelPool(lambda model_name: load_pipeline(model_name, backend="ctranslate2"))
+        translations = bucketed_translate(pool.get("Helsinki-NLP/opus-mt-he-en"), texts)
+    """
+
+    def __init__(self, load, max_bytes=2 * 1024 ** 3):
+        self._load = load
+        self.max_bytes = max_bytes
+        # Model name -> (engine, size in bytes), least recently used first
+        self._engines = OrderedDict()
+
+    def __contains__(self, model_name):
+        return model_name in self._engines
+
+    def __len__(self):
+        return len(self._engines)
+
+    @property
+    def memory(self):
+        """Estimated memory of the loaded engines in bytes."""
+        return sum(size for _, size in self._engines.values())
+
+    def get(self, model_name):
+        """
+        Returns the engine of a model, loading it if it is not in the pool.
+
+        Args:
+            model_name (str): Hugging Face model name.
+
+        Returns:
+            Callable translation pipeline.
+        """
+        if model_name in self._engines:
+            self._engines.move_to_end(model_name)
+            metrics.inc("model_pool_lookups_total", result="hit")
+            return self._engines[model_name][0]
+
+        metrics.inc("model_pool_lookups_total", result="miss")
+        self._evict(reserve=max((size for _, size in self._engines.values()), default=0))
+        pipe = self._load(model_name)
+        self._engines[model_name] = (pipe, model_memory(pipe))
+        self._evict(keep=model_name)
+        metrics.set("model_pool_bytes", self.memory)
+        print(f"Loaded {model_name}, {len(self._engines)} models ({self.memory / 1024 ** 2:.0f} MB) in memory.")
+        return pipe
+
+    def _evict(self, reserve=0, keep=None):
+        """Unloads least recently used engines until `reserve` more bytes fit the budget."""
+        evicted = False
+        while self._engines and self.memory + reserve > self.max_bytes:
+            model_name = next(iter(self._engines))
+            if model_name == keep:
+                break
+            del self._engines[model_name]
+            evicted = True
+            metrics.inc("model_evictions_total")
+            print(f"Unloaded {model_name} to stay within {self.max_bytes / 1024 ** 2:.0f} MB.")
+        if evicted:
+            gc.collect()
+            # Only if the engines were PyTorch ones, importing torch here would cost seconds
+            torch = sys.modules.get("torch")
+            if torch is not None and torch.cuda.is_available():
+                torch.cuda.empty_cache()
+
+    def close(self):
+        """Unloads all engines."""
+        self._engines.clear()
+        gc.collect()
+
+
+# Engines of a worker process, set up by `init_worker` and loaded on first use
+worker_pool = None
+
+
+def init_worker(backend, model_dir, threads, max_model_bytes):
+    """Sets up the engine pool of a worker process with a pinned number of threads."""
+    global worker_pool
+    worker_pool = ModelPool(
+        lambda model_name: load_pipeline(model_name, backend=backend, model_dir=model_dir, threads=threads),
+        max_bytes=max_model_bytes
+    )
+
+
+def translate_shard(start, texts, model_name, max_tokens, max_batch_size):
+    """
+    Translates one shard with a model of the worker's pool in a worker process.
+
+    Returns:
+        tuple: Start offset, translations, and the metrics recorded by the worker since its last shard.
+    """
+    translations = bucketed_translate(worker_pool.get(model_name), texts, max_tokens, max_batch_size, progress=False)
+    return start, translations, metrics.drain()
+
+
+class ShardedTranslator:
+    """
+    Translates texts on CPU with a pool of worker processes.
+
+    Texts are split into shards of `shard_size` that the workers pull one by one. Every
+    worker keeps the engines it used in a `ModelPool` and runs them with `cpu_count // workers`
+    threads, so workers do not compete for cores. The pool is kept between calls (e.g. for
+    every chunk or language of a streamed file). Finished shards are gathered by their offset;
+    if a worker process dies, the pool is restarted and only the unfinished shards are sent again.
+
+    Args:
+        model_name (str): Hugging Face model name used when a call names none.
+        workers (int): Number of worker processes.
+        backend (str, optional): "transformers" or "ctranslate2". Default is "transformers".
+        model_dir (str, optional): Folder of converted CTranslate2 models. Default is "./models".
+        max_tokens (int, optional): Budget of padded tokens per batch. Default is 2048.
+        max_batch_size (int, optional): Maximum number of texts per batch. Default is 64.
+        shard_size (int, optional): Number of texts per shard. Default is 256.
+        max_restarts (int, optional): How often the pool is restarted after a worker crash per call. Default is 3.
+        max_model_bytes (int, optional): Memory budget of the engines of every worker. Default is 2 GiB.
+
+    Example:
+        with ShardedTranslator("Helsinki-NLP/opus-mt-ar-en", workers=4) as translate:
+            translations = translate(texts)
+            hebrew_translations = translate(hebrew_texts, model_name="Helsinki-NLP/opus-mt-he-en")
+    """
+
+    def __init__(self, model_name, workers, backend="transformers", model_dir="./models", max_tokens=2048,
+                 max_batch_size=64, shard_size=256, max_restarts=3, max_model_bytes=2 * 1024 ** 3):
+        self.model_name = model_name
+        self.workers = workers
+        self.backend = backend
+        self.model_dir = model_dir
+        self.max_tokens = max_tokens
+        self.max_batch_size = max_batch_size
+        self.shard_size = shard_size
+        self.max_restarts = max_restarts
+        self._initargs = (backend, model_dir, max(1, (os.cpu_count() or 1) // workers), max_model_bytes)
+        self._executor = None
+        self._converted = set()
+
+    def _start(self):
+        self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"),
+                                             initializer=init_worker, initargs=self._initargs)
+
+    def __call__(self, texts, model_name=None):
+        """
+        Translates texts.
+
+        Args:
+            texts (list): Texts to be translated.
+            model_name (str, optional): Hugging Face model name. Defaults to the model of the translator.
+
+        Returns:
+            list: Translated texts in the order of `texts`.
+
+        Raises:
+            BrokenProcessPool: If workers keep crashing after `max_restarts` restarts.
+        """
+        model_name = model_name or self.model_name
+        if self.backend == "ctranslate2" and model_name not in self._converted:
+            # Convert in the parent, so workers do not race to convert the model
+            convert_model(model_name, self.model_dir)
+            self._converted.add(model_name)
+
+        translations = [None] * len(texts)
+        pending = list(range(0, len(texts), self.shard_size))
+
+        from tqdm import tqdm
+
+        with tqdm(total=len(texts)) as progress:
+            for restart in range(self.max_restarts + 1):
+                if self._executor is None:
+                    self._start()
+                futures = [
+                    self._executor.submit(translate_shard, start, texts[start: start + self.shard_size],
+                                          model_name, self.max_tokens, self.max_batch_size)
+                    for start in pending
+                ]
+                try:
+                    for future in as_completed(futures):
+                        start, shard, worker_metrics = future.result()
+                        translations[start: start + len(shard)] = shard
+                        metrics.merge(worker_metrics)
+                        pending.remove(start)
+                        progress.update(len(shard))
+                    return translations
+                except BrokenProcessPool:
+                    self.close()
+                    if restart == self.max_restarts:
+                        raise
+                    print(f"A translation worker died, restarting the pool for {len(pending)} unfinished shards.")
+
+    def close(self):
+        """Stops the worker processes."""
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def main(file_path, output_folder="./output", batch_size=64, output_format="csv", index_path=None,
+         cache_path=None, cache_size=1_000_000, max_tokens=2048, backend="transformers", model_dir="./models",
+         workers=1, chunk_size=None, resume=False, server_url=DEFAULT_SERVER_URL, languages=("ar", "he"),
+         max_model_memory=2048):
+    """
+    Process tweets of one or more languages from a CSV file or Parquet dataset, translate them to English, and save the results.
+
+    Rows are grouped by `lang` and every group is translated by its opus-mt-<lang>-en model after
+    the preprocessing of its script (see `preprocessing.preprocess_text`). Models are loaded on
+    first use and kept in a memory-bounded `ModelPool`, so a mixed-language input loads every model
+    once. Languages without an opus-mt model are reported and left untranslated.
+
+    Args:
+        file_path (str): Path to the input CSV file, Parquet file or Parquet dataset folder.
         output_folder (str): Path to the output folder. Default is "./output".
-        batch_size (int): Batch size for translation. Default is 15.
+        batch_size (int): Maximum number of texts per batch. Default is 64.
+        output_format (str): "csv" or "parquet" (dataset partitioned by day and language). Default is "csv".
+        index_path (str): Optional path to a tweet id index. Tweets translated by earlier runs are
+            kept in the output but not translated again. Default is None.
+        cache_path (str): Optional path to the persistent translation cache shared with translator_api. Default is None.
+        cache_size (int): Maximum number of cached translations. Default is 1,000,000.
+        max_tokens (int): Budget of padded tokens per batch; texts are batched by token length. Default is 2048.
+        backend (str): "transformers" (PyTorch, GPU if available) or "ctranslate2" (int8-quantized CPU engine).
+            Default is "transformers".
+        model_dir (str): Folder where converted CTranslate2 models are cached. Default is "./models".
+        workers (int): Number of CPU worker processes the texts are sharded across; 1 translates
+            in this process (on the GPU if available). Default is 1.
+        chunk_size (int): Stream the input in chunks of this many rows, appending each translated chunk
+            to the output. None translates the whole file at once. Default is None.
+        resume (bool): In chunked mode, continue an interrupted run after its last completed chunk. Default is False.
+        server_url (str): URL of a translation server (see `translation_server`) serving `backend`. If it is
+            reachable, Arabic texts are translated there; otherwise in this process. None disables it.
+            Default is "http://127.0.0.1:8765".
+        languages (Iterable[str]): Twitter language codes of the tweets to translate. Default is ("ar", "he").
+        max_model_memory (int): Memory budget in MB of the loaded models (of every worker process). Default is 2048.
     """
-    base_name = os.path.basename(file_path)
+    base_name = os.path.basename(os.path.normpath(file_path))
     file_name = os.path.splitext(base_name)[0]
 
-    df = pd.read_csv(file_path)
+    index = TweetIdIndex(index_path, namespace="translated") if index_path else None
+
+    model_names = {lang: marian_model(lang) for lang in languages}
+    # A running translation server already holds the Arabic model in memory
+    server_translate = None
+    if MARIAN_MODEL in model_names.values():
+        server_translate = server_translator("marian" if backend == "transformers" else backend, url=server_url)
+    local_models = [name for name in model_names.values() if server_translate is None or name != MARIAN_MODEL]
+
+    sharded, pool = None, None
+
+    def start_local():
+        # Engines are loaded on first use, only the device is chosen here
+        nonlocal sharded, pool
+        if workers > 1:
+            print(f"Running on: cpu ({backend}), {workers} worker processes")
+            sharded = ShardedTranslator(MARIAN_MODEL, workers, backend=backend, model_dir=model_dir,
+                                        max_tokens=max_tokens, max_batch_size=batch_size,
+                                        max_model_bytes=max_model_memory * 1024 ** 2)
+            return
+        if backend == "ctranslate2":
+            print("Running on: cpu (ctranslate2, int8)")
+            device_index = -1
+        else:
+            import torch
+
+            # Check if GPU Available:
+            device = "cuda" if torch.cuda.is_available() else "cpu"
+            device_index = -1
+            if device == "cuda":
+                device_index = 0
+            print(f"Running on: {device}: {device_index}")
+        pool = ModelPool(
+            lambda model_name: load_pipeline(model_name, backend=backend, model_dir=model_dir, device_index=device_index),
+            max_bytes=max_model_memory * 1024 ** 2
+        )
+
+    if local_models:
+        start_local()
+    cache = TranslationCache(cache_path, max_entries=cache_size) if cache_path else None
+    # Languages whose model could not be loaded, left untranslated for the rest of the run
+    unavailable = set()
+    # Models by last use, most recent last
+    used_models = []
+
+    def translate_on_server(texts):
+        nonlocal server_translate
+        try:
+            return server_translate(texts)
+        except OSError as e:
+            # URLError, HTTPError and connection errors; the rest of the run translates in process
+            print(f"Translation server request failed ({e}), translating in process.")
+            server_translate = None
+            return translator(MARIAN_MODEL)(texts)
+
+    def translator(model_name):
+        if server_translate is not None and model_name == MARIAN_MODEL:
+            return translate_on_server
+        if sharded is None and pool is None:
+            start_local()
+        if sharded is not None:
+            return lambda texts: sharded(texts, model_name=model_name)
+        return lambda texts: bucketed_translate(pool.get(model_name), texts, max_tokens=max_tokens,
+                                                max_batch_size=batch_size)
 
-    mask = df.lang == "ar"
-    print(f"df len: {len(df)} len mask: {sum(mask)}")
-    tweet_text = df[mask]["text"]
-    clean_tweet_text = [extract_arabic(tweet) for tweet in tweet_text]
+    def translate_chunk(df):
+        # Tweets translated by earlier runs stay in the output, only their translation is skipped
+        indexed = indexed_mask(df, index)
+        if index is not None:
+            print(f"Skipping {indexed.sum()} already translated tweets.")
 
-    # Check if GPU Available:
-    device = "cuda" if torch.cuda.is_available() else "cpu"
-    device_index = -1
-    if device == "cuda":
-        device_index = 0
-    print(f"Running on: {device}: {device_index}")
+        df["en_translation"] = None
+        # Most recently used models first, so a chunk starts with the models that are still loaded
+        by_use = sorted(model_names.items(),
+                        key=lambda item: -used_models.index(item[1]) if item[1] in used_models else 1)
+        for lang, model_name in by_use:
+            mask = (df.lang == lang) & ~indexed
+            if lang in unavailable or not mask.any():
+                continue
+            clean_tweet_text = preprocess_text(df.loc[mask, "text"], lang)
+            print(f"{lang}: df len: {len(df)} len mask: {sum(mask)} non-empty: {len(clean_tweet_text)}")
 
-    pipe = pipeline("translation", model="Helsinki-NLP/opus-mt-ar-en", device=device_index, batch_size=batch_size)
-    translation = [t['translation_text'] for t in pipe(clean_tweet_text)]
-    print(f" translated len: {len(translation)}")
+            try:
+                translation = translate_with_cache(
+                    texts=clean_tweet_text.tolist(),
+                    translate=translator(model_name),
+                    cache=cache,
+                    backend=model_name
+                )
+            except ModelLoadError as e:
+                print(f"{e}, '{lang}' tweets are not translated.")
+                unavailable.add(lang)
+                continue
+            print(f" translated len: {len(translation)}")
+            df.loc[clean_tweet_text.index, "en_translation"] = translation
+            if model_name in used_models:
+                used_models.remove(model_name)
+            used_models.append(model_name)
+        return df
 
-    df["en_translation"] = None
-    df.loc[mask, "en_translation"] = translation
+    def mark_translated(df):
+        id_column = tweet_id_column(df) if index is not None else None
+        if id_column is not None:
+            translated = [lang for lang in model_names if lang not in unavailable]
+            index.add_many(df.loc[df.lang.isin(translated), id_column].dropna())
+            index.commit()
 
-    csv_filename = os.path.join(output_folder, f"{file_name}_post_processed.csv")
+    output_path = os.path.join(output_folder, f"{file_name}_post_processed")
     # Create folder if it doesn't exist
     os.makedirs(output_folder, exist_ok=True)
-    df.to_csv(csv_filename, index=False)
-    print(f"Saved to: {csv_filename}")
+    try:
+        if chunk_size:
+            output_path = process_in_chunks(file_path, output_path, translate_chunk, output_format=output_format,
+                                            chunk_size=chunk_size, resume=resume, on_written=mark_translated)
+        else:
+            df = translate_chunk(read_tweets(file_path))
+            output_path = write_tweets(df, output_path, output_format=output_format)
+            mark_translated(df)
+        print(f"Saved to: {output_path}")
+    finally:
+        if sharded is not None:
+            sharded.close()
+        if pool is not None:
+            pool.close()
+        if cache is not None:
+            print(f"Translation cache: {cache.hits} hits, {cache.misses} misses, hit rate {cache.hit_rate:.1%}")
+            cache.close()
+        if index is not None:
+            index.close()
 
 
 if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="Process Arabic text from a CSV file and translate it to English.")
+    parser = argparse.ArgumentParser(description="Translate tweets of one or more languages from a CSV file to English.")
     parser.add_argument("file_path", type=str, default="data/20231020_230726.csv", help="Path to the input CSV file.")
     parser.add_argument("--output-folder", type=str, default="./output", help="Path to the output folder. Default is './output'.")
-    parser.add_argument("--batch-size", type=int, default=15, help="Batch size for translation. Default is 15.")
+    parser.add_argument("--batch-size", type=int, default=64, help="Maximum number of texts per batch. Default is 64.")
+    parser.add_argument("--max-tokens", type=int, default=2048, help="Budget of padded tokens per batch; texts are batched by token length. Default is 2048.")
+    parser.add_argument("--backend", choices=["transformers", "ctranslate2"], default="transformers", help="Inference backend. 'ctranslate2' runs an int8-quantized copy of the model on CPU. Default is 'transformers'.")
+    parser.add_argument("--workers", type=int, default=1, help="Number of CPU worker processes to shard the texts across. Default is 1.")
+    parser.add_argument("--languages", type=str, default="ar,he", help="Comma separated language codes of the tweets to translate, each with its opus-mt-<lang>-en model. Default is 'ar,he'.")
+    parser.add_argument("--max-model-memory", type=int, default=2048, help="Memory budget in MB of the loaded models (per worker process); least recently used models are unloaded. Default is 2048.")
+    parser.add_argument("--model-dir", type=str, default="./models", help="Folder where converted CTranslate2 models are cached. Default is './models'.")
+    parser.add_argument("--output-format", choices=["csv", "parquet"], default="csv", help="Output format. Parquet output is partitioned by day and language. Default is 'csv'.")
+    parser.add_argument("--chunk-size", type=int, default=None, help="Stream the input in chunks of this many rows. Default is the whole file at once.")
+    parser.add_argument("--resume", action="store_true", help="Continue an interrupted chunked run after its last completed chunk.")
+    parser.add_argument("--server-url", type=str, default=DEFAULT_SERVER_URL, help="URL of a running translation server; 'none' always translates in this process. Default is '%(default)s'.")
+    parser.add_argument("--index-path", type=str, default=None, help="Path to a tweet id index; tweets translated by earlier runs are skipped.")
+    parser.add_argument("--cache-path", type=str, default=None, help="Path to the persistent translation cache shared with translator_api.")
+    parser.add_argument("--cache-size", type=int, default=1_000_000, help="Maximum number of cached translations. Default is 1000000.")
+    parser.add_argument("--metrics-path", type=str, default=None, help="Path of the JSON metrics written at the end of the run. Default is '<output folder>/metrics_translator_gpu.json'.")
+    parser.add_argument("--prometheus-path", type=str, default=None, help="Optional path of a Prometheus textfile with the metrics of the run.")
     args = parser.parse_args()
+    if not os.path.exists(args.file_path):
+        parser.error(f"file not found: {args.file_path}")
 
-    main(file_path=args.file_path, output_folder=args.output_folder, batch_size=args.batch_size)
+    metrics_path = args.metrics_path or os.path.join(args.output_folder, "metrics_translator_gpu.json")
+    with record_run("translator_gpu", json_path=metrics_path, prometheus_path=args.prometheus_path):
+        main(file_path=args.file_path, output_folder=args.output_folder, batch_size=args.batch_size, output_format=args.output_format,
+             index_path=args.index_path, cache_path=args.cache_path, cache_size=args.cache_size, max_tokens=args.max_tokens,
+             backend=args.backend, model_dir=args.model_dir, workers=args.workers,
+             chunk_size=args.chunk_size, resume=args.resume,
+             server_url=None if args.server_url.lower() == "none" else args.server_url,
+             languages=[lang.strip() for lang in args.languages.split(",") if lang.strip()],
+             max_model_memory=args.max_model_memory)
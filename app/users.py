@@ -0,0 +1,200 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from metrics import metrics
+
+
+# Name of the users store the crawlers keep next to their output
+USERS_FILE_NAME = "users.sqlite"
+
+# Columns of the users table, in the order of `user_record`
+USER_COLUMNS = [
+    "author_id",
+    "username",
+    "name",
+    "description",
+    "created_at",
+    "verified",
+    "location",
+    "url",
+    "profile_image_url",
+    "followers_count",
+    "following_count",
+    "tweet_count",
+    "listed_count",
+    "withheld",
+]
+
+
+def user_record(user):
+    """
+    Flattens a user object of a Twitter API response into the columns of `USER_COLUMNS`.
+
+    Args:
+        user: User from `response.includes['users']`, with the `user_fields` requested by `get_tweets`.
+
+    Returns:
+        tuple: Values in the order of `USER_COLUMNS`; fields missing from the response are None.
+    """
+    public_metrics = getattr(user, "public_metrics", None) or {}
+    created_at = getattr(user, "created_at", None)
+    verified = getattr(user, "verified", None)
+    withheld = getattr(user, "withheld", None)
+    return (
+        int(user.id),
+        user.username,
+        user.name,
+        getattr(user, "description", None),
+        created_at.isoformat() if created_at is not None else None,
+        int(verified) if verified is not None else None,
+        getattr(user, "location", None),
+        getattr(user, "url", None),
+        getattr(user, "profile_image_url", None),
+        public_metrics.get("followers_count"),
+        public_metrics.get("following_count"),
+        public_metrics.get("tweet_count"),
+        public_metrics.get("listed_count"),
+        json.dumps(withheld) if withheld else None,
+    )
+
+
+class UserStore:
+    """
+    Deduplicated store of tweet authors keyed by `author_id`.
+
+    Tweet rows only keep the `author_id`; the author's profile is written here once, in
+    an SQLite table next to the crawler output. An in-memory cache of the last written
+    record of every author seen in the run spans all pages (and all threads sharing the
+    store), so a prolific author costs a dictionary lookup per page instead of a write.
+    An author is written again only when the profile changed, e.g. a new display name or
+    follower count; the row then holds the latest profile.
+
+    Added authors become durable on `commit`; the crawlers commit whenever tweet rows
+    reached the output, so every stored tweet has its author stored.
+
+    Args:
+        path (str): Path to the SQLite database file.
+
+    Example:
+        with UserStore("./data/users.sqlite") as users:
+            users.add_users(response.includes["users"])
+            users.commit()
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._cache = {}
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS users (author_id INTEGER PRIMARY KEY, username TEXT, name TEXT, "
+            "description TEXT, created_at TEXT, verified INTEGER, location TEXT, url TEXT, profile_image_url TEXT, "
+            "followers_count INTEGER, following_count INTEGER, tweet_count INTEGER, listed_count INTEGER, "
+            "withheld TEXT, updated_at REAL NOT NULL)"
+        )
+        self._connection.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    def add_users(self, users):
+        """
+        Stores authors that are new to this run or whose profile changed.
+
+        Args:
+            users (Iterable): User objects of a Twitter API response.
+
+        Returns:
+            int: Number of authors written.
+        """
+        records = [user_record(user) for user in users]
+        with self._lock:
+            changed = [record for record in records if self._cache.get(record[0]) != record]
+            if not changed:
+                return 0
+            now = time.time()
+            updates = ", ".join(f"{column} = excluded.{column}" for column in USER_COLUMNS[1:] + ["updated_at"])
+            self._connection.executemany(
+                f"INSERT INTO users VALUES ({', '.join('?' * (len(USER_COLUMNS) + 1))}) "
+                f"ON CONFLICT (author_id) DO UPDATE SET {updates}",
+                [record + (now,) for record in changed]
+            )
+            for record in changed:
+                self._cache[record[0]] = record
+        metrics.inc("users_written_total", len(changed))
+        return len(changed)
+
+    def commit(self):
+        """Makes all added authors durable."""
+        with self._lock:
+            self._connection.commit()
+
+    def close(self):
+        """Commits pending authors and closes the database."""
+        with self._lock:
+            if self._connection is None:
+                return
+            self._connection.commit()
+            self._connection.close()
+            self._connection = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def users_path(folder_path):
+    """Returns the path of the users store of a crawler output folder."""
+    return os.path.join(folder_path, USERS_FILE_NAME)
+
+
+def read_users(path, columns=None):
+    """
+    Reads the users store.
+
+    Args:
+        path (str): Path to the SQLite database file.
+        columns (list, optional): Columns to load. Defaults to all `USER_COLUMNS`.
+
+    Returns:
+        pandas.DataFrame: One row per author.
+    """
+    import pandas as pd
+
+    with sqlite3.connect(path) as connection:
+        return pd.read_sql_query(f"SELECT {', '.join(columns or USER_COLUMNS)} FROM users", connection)
+
+
+def with_authors(df, path, columns=("username", "name")):
+    """
+    Joins author details to tweets and derives the profile and tweet URLs.
+
+    Args:
+        df (pandas.DataFrame): Tweets with `author_id` and `tweet_id` columns, e.g. from `read_tweets`.
+        path (str): Path to the users store written by the crawler.
+        columns (Iterable[str], optional): Author columns to add. `username` is always loaded.
+            Default is ("username", "name").
+
+    Returns:
+        pandas.DataFrame: Tweets with the author columns, `user_url` and `tweet_url`. Tweets of
+            unknown authors get the username-free status URL 'https://twitter.com/i/web/status/<id>'.
+
+    Example:
+        df = with_authors(read_tweets("data/20231020_230726.csv"), "data/users.sqlite")
+    """
+    columns = ["author_id"] + list(dict.fromkeys(["username", *columns]))
+    users = read_users(path, columns=columns)
+    df = df.merge(users.astype({"author_id": df["author_id"].dtype}), on="author_id", how="left")
+
+    known = df["username"].notna()
+    df["user_url"] = ("https://twitter.com/" + df["username"]).where(known)
+    df["tweet_url"] = ("https://twitter.com/" + df["username"] + "/status/" + df["tweet_id"].astype(str)).where(
+        known, "https://twitter.com/i/web/status/" + df["tweet_id"].astype(str)
+    )
+    return df
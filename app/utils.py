@@ -1,9 +1,47 @@
 import os
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 import tweepy
 import json
-import csv
-import time
+import threading
+from functools import lru_cache, partial
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+import requests
+from rate_limit import RequestScheduler, ShutdownRequested, parse_rate_limit_headers, backoff_delay, sleep, wait_until
+from storage import CsvSink, EnrichingSink, open_sink, shutdown_event
+from checkpoint import checkpoint_path, load_checkpoint, save_checkpoint, update_id_range
+from query_planner import match_seeds
+from metrics import metrics
+from users import UserStore, users_path
+# Kept importable from utils; lives in settings so entry points can read their config without tweepy
+from settings import env_variable_handler
+
+
+# Errors worth retrying: Twitter 5xx responses and network failures.
+TRANSIENT_ERRORS = (tweepy.TwitterServerError, requests.ConnectionError, requests.Timeout)
+
+
+class RateLimitClient(tweepy.Client):
+    """
+    Twitter API client that remembers the rate limit headers of the last response.
+
+    The state is kept per thread, so concurrent crawlers sharing one client
+    each see the headers of their own request.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._local = threading.local()
+
+    def request(self, method, route, params=None, json=None, user_auth=False):
+        response = super().request(method, route, params=params, json=json, user_auth=user_auth)
+        self._local.rate_limit = parse_rate_limit_headers(response.headers)
+        return response
+
+    @property
+    def rate_limit(self):
+        """RateLimitStatus or None: Rate limit state reported with the last response of this thread."""
+        return getattr(self._local, "rate_limit", None)
 
 
 def get_client(bearer_token):
@@ -11,17 +49,20 @@ def get_client(bearer_token):
     Reads the bearer token from a JSON file named 'credentials.json' in the same directory.
 
     Returns:
-        tweepy.Client: Authenticated Twitter API client.
+        RateLimitClient: Authenticated Twitter API client.
     """
 
     # Twitter Authentification:
-    client = tweepy.Client(bearer_token)
+    client = RateLimitClient(bearer_token)
     return client
 
 
+@lru_cache(maxsize=None)
 def load_seeds(path="./seeds.json"):
     """Load seed terms from a JSON file.
 
+    The file is read once per path; later calls return the cached dictionary.
+
     Args:
         path (str, optional): Path to the JSON file. Defaults to "./seeds.json".
 
@@ -68,7 +109,8 @@ def query_builder(body, include_retweets=False, language="", seed="", start_date
     return query
 
 
-def get_tweets(client, query, start_time=None, end_time=None, next_token=None, max_results=100):
+def get_tweets(client, query, start_time=None, end_time=None, next_token=None, max_results=100,
+               scheduler=None, max_retries=5, since_id=None):
     """
     Retrieve recent tweets based on a given query.
 
@@ -79,16 +121,24 @@ def get_tweets(client, query, start_time=None, end_time=None, next_token=None, m
         end_time (str, optional): End time for filtering tweets (ISO 8601 format).
         next_token (str, optional): Token for paginating through results.
         max_results (int, optional): Maximum number of results to retrieve (default is 100).
+        scheduler (RequestScheduler, optional): Shared scheduler handing out request slots.
+        max_retries (int, optional): Number of retries on transient errors (default is 5).
+        since_id (str, optional): Only return tweets newer than this tweet id.
 
     Returns:
         dict: Response containing recent tweets.
 
     Raises:
-        Exception: If an error occurs while fetching tweets.
+        tweepy.TweepyException: If the request fails with a non transient error
+            or still fails after `max_retries` retries.
 
     Note:
         - `start_time` and `end_time` should be in ISO 8601 format (YYYY-MM-DDTHH:mm:ssZ).
         - This function uses the 'search_recent_tweets' method from the Twitter API client.
+        - Pacing follows the rate limit headers: when the quota is exhausted, or the API answers
+          with 429 Too Many Requests, the next request waits exactly until the window resets.
+          Server errors and network failures are retried with jittered exponential backoff.
+          Every retry, including one after a 429, counts against `max_retries`.
 
     Example:
         response = get_tweets(client, query="#Python", max_results=50)
@@ -101,35 +151,145 @@ def get_tweets(client, query, start_time=None, end_time=None, next_token=None, m
     user_fields =  ["profile_image_url", "name", "description", "created_at", "verified", "location", "public_metrics", "url", "withheld"]
     place_fields = None
 
-    try:
-        response = client.search_recent_tweets(
-            query,
-            max_results=max_results,
-            next_token=next_token,
-            start_time=start_time,
-            end_time=end_time,
-            expansions=expansions,
-            tweet_fields=tweet_fields,
-            user_fields=user_fields,
-            place_fields=place_fields
-        )
+    attempt = 0
+    while True:
+        if scheduler is not None:
+            metrics.inc("wait_seconds_total", scheduler.acquire(), reason="scheduler")
+
+        try:
+            with metrics.time("api_request_seconds", api="twitter"):
+                response = client.search_recent_tweets(
+                    query,
+                    max_results=max_results,
+                    next_token=next_token,
+                    start_time=start_time,
+                    end_time=end_time,
+                    since_id=since_id,
+                    expansions=expansions,
+                    tweet_fields=tweet_fields,
+                    user_fields=user_fields,
+                    place_fields=place_fields
+                )
+
+        except tweepy.TooManyRequests as e:
+            metrics.inc("api_errors_total", api="twitter", error="TooManyRequests")
+            # Waits for the window reset count as retries too, so a persistent 429 still gives up
+            if attempt >= max_retries:
+                raise
+            attempt += 1
+            status = parse_rate_limit_headers(e.response.headers)
+            if status is None:
+                delay = backoff_delay(attempt - 1)
+                print(f"Rate limited without reset time. Retry {attempt}/{max_retries} in {delay:.1f}s.")
+                sleep(delay)
+                metrics.inc("wait_seconds_total", delay, reason="retry")
+            else:
+                print(f"Rate limited. Retry {attempt}/{max_retries} at {datetime.fromtimestamp(status.reset)}.")
+                _wait_for_reset(status.reset, scheduler)
+            continue
+
+        except TRANSIENT_ERRORS as e:
+            metrics.inc("api_errors_total", api="twitter", error=type(e).__name__)
+            if attempt >= max_retries:
+                raise
+            delay = backoff_delay(attempt)
+            attempt += 1
+            print(f"Error getting tweets: {e}. Retry {attempt}/{max_retries} in {delay:.1f}s.")
+            sleep(delay)
+            metrics.inc("wait_seconds_total", delay, reason="retry")
+            continue
+
+        status = getattr(client, "rate_limit", None)
+        if status is not None and status.remaining == 0:
+            print(f"Rate limit exhausted. Waiting until {datetime.fromtimestamp(status.reset)}.")
+            try:
+                _wait_for_reset(status.reset, scheduler)
+            except ShutdownRequested:
+                # The page is still returned and written; the crawl loop stops before the next one
+                pass
 
         return response
 
-    except Exception as e:
-        print("Error getting tweets", e)
+
+def _wait_for_reset(reset_time, scheduler=None):
+    """
+    Holds back further requests until the rate limit window resets.
+
+    Args:
+        reset_time (int): UNIX epoch seconds at which the window resets.
+        scheduler (RequestScheduler, optional): Shared scheduler. If given, all threads
+            using it are paused instead of sleeping in the current one.
+    """
+    if scheduler is not None:
+        scheduler.pause_until(reset_time)
+    else:
+        metrics.inc("wait_seconds_total", wait_until(reset_time), reason="rate_limit")
+
+
+# Authors are kept in the users store (see `users.with_authors` for names and URLs)
+TWEET_COLUMNS = [
+    "created_at",
+    "tweet_id",
+    "author_id",
+    "text",
+    "lang",
+    "retweet_count",
+    "like_count"
+]
+
+
+def tweet_columns(seeds=None):
+    """Returns the output columns, including `matched_seeds` for packed queries."""
+    return TWEET_COLUMNS + ["matched_seeds"] if seeds else TWEET_COLUMNS
+
+
+def tweet_rows(response, seeds=None):
+    """
+    Yields one row per tweet of a Twitter API response, in the order of `TWEET_COLUMNS`.
+
+    Args:
+        response (dict): Response from a Twitter API request.
+        seeds (dict, optional): Seed keys mapped to phrases of a packed query (see `query_planner`).
+            If given, a `matched_seeds` column with the '|'-separated keys matched by each tweet is appended.
+
+    Yields:
+        list: Row with tweet metadata and the author id.
+    """
+    for tweet in response.data:
+        yield [
+            tweet.created_at,
+            tweet.id,
+            tweet.author_id,
+            tweet.text,
+            tweet.lang,
+            tweet.public_metrics["retweet_count"],
+            tweet.public_metrics["like_count"],
+        ] + (["|".join(match_seeds(tweet.text, seeds))] if seeds else [])
+
+
+def _user_store(users, folder_path):
+    """Returns a context with `users`, or with the users store of `folder_path` that is closed on exit."""
+    return nullcontext(users) if users is not None else UserStore(users_path(folder_path))
 
 
-def tweets_to_csv(response, destination_name):
+def tweets_to_csv(response, destination_name=None, sink=None, seeds=None, index=None, users=None, on_written=None):
     """
     Convert tweet data from a Twitter API response to a CSV file.
 
     Args:
         response (dict): Response from a Twitter API request.
-        destination_name (str): Name of the destination CSV file.
+        destination_name (str, optional): Name of the destination CSV file.
+        sink (CsvSink, optional): Open sink to write to instead of `destination_name`.
+        seeds (dict, optional): Seeds of a packed query; adds the `matched_seeds` column.
+        index (TweetIdIndex, optional): Index of already stored tweet ids. Tweets found in it are
+            skipped, written tweets are added to it.
+        users (UserStore, optional): Store the authors of the response are added to. Defaults to the
+            store of the folder of the output ('<folder>/users.sqlite'), as the rows only hold author ids.
+        on_written (callable, optional): Called without arguments once the rows reached the sink,
+            e.g. to advance the crawl state checkpointed by the sink's `on_flush`.
 
     Returns:
-        None
+        int: Number of rows written.
 
     Raises:
         Exception: If an error occurs while writing to the CSV file.
@@ -137,8 +297,11 @@ def tweets_to_csv(response, destination_name):
     Note:
         - The function expects a response in the format returned by the Twitter API.
         - The CSV file will include columns for tweet metadata such as creation timestamp,
-          tweet ID, author ID, username, name, URLs, tweet content, language, retweet count, and like count.
+          tweet ID, author ID, tweet content, language, retweet count, and like count. Author
+          details go to the `users` store once per author instead of into every row.
         - If the specified CSV file already exists, the function will append new data to it.
+        - Long running crawls should pass a `sink` that stays open for the whole run, so the file
+          is not reopened for every page.
 
     Example:
         response = { ... }  # Response from a Twitter API request
@@ -146,62 +309,55 @@ def tweets_to_csv(response, destination_name):
         tweets_to_csv(response, destination_name)
 
     """
-    usersdict = {x.id: {"username": x.username, "name": x.name} for x in response.includes['users']}
-
-    tweet_data = [
-        [
-            "created_at",
-            "tweet_id",
-            "author_id",
-            "username",
-            "name",
-            "user_url",
-            "tweet_url",
-            "text",
-            "lang",
-            "retweet_count",
-            "like_count"
-        ]
-    ]
-
-    for tweet in response.data:
-        tweet_data.append(
-            [
-                tweet.created_at,
-                tweet.id,
-                tweet.author_id,
-                usersdict[tweet.author_id]["username"],
-                usersdict[tweet.author_id]["name"],
-                f"https://twitter.com/{usersdict[tweet.author_id]['username']}",
-                f"https://twitter.com/{usersdict[tweet.author_id]['username']}/status/{tweet.id}",
-                tweet.text,
-                tweet.lang,
-                tweet.public_metrics["retweet_count"],
-                tweet.public_metrics["like_count"],
-            ]
-        )
-
-    # Check if the file already exists
-    if not os.path.exists(destination_name):
-        # If not, create it with headers
-        with open(destination_name, mode='w', newline='', encoding='utf-8') as file:
-            writer = csv.writer(file)
-            writer.writerow(tweet_data[0])
-
-    # Append the rest of the data to the CSV
-    row_counter = 0
-    with open(destination_name, mode='a', newline='', encoding='utf-8') as file:
-        writer = csv.writer(file)
-        for row in tweet_data[1:]:
-            writer.writerow(row)
-            row_counter += 1
-
-    print(f"Wrote {row_counter} lines to {destination_name}.")
+    if users is None:
+        folder_path = os.path.dirname(destination_name if sink is None else sink.path) or "."
+        with _user_store(None, folder_path) as users:
+            return tweets_to_csv(response, destination_name, sink=sink, seeds=seeds, index=index, users=users,
+                                 on_written=on_written)
+
+    if sink is None:
+        with CsvSink(destination_name, columns=tweet_columns(seeds)) as file_sink:
+            row_counter = tweets_to_csv(response, sink=file_sink, seeds=seeds, index=index, users=users,
+                                        on_written=on_written)
+        if index is not None:
+            index.commit()
+        users.commit()
+        return row_counter
+
+    users.add_users(response.includes.get("users", []))
+
+    rows = tweet_rows(response, seeds=seeds)
+    skipped = 0
+    if index is not None:
+        rows = list(rows)
+        new_rows = [row for row in rows if row[1] not in index]
+        skipped = len(rows) - len(new_rows)
+        rows = new_rows
+
+    # Ids are only added once their rows reached the sink, an enrichment error may still drop them
+    ids = [row[1] for row in rows] if index is not None else []
+
+    def rows_written():
+        if ids:
+            index.add_many(ids)
+        if on_written is not None:
+            on_written()
+
+    row_counter = sink.write_rows(rows, on_written=rows_written)
+    metrics.inc("tweets_written_total", row_counter)
+    if skipped:
+        metrics.inc("tweets_skipped_total", skipped)
+
+    print(f"Wrote {row_counter} lines to {sink.path}." + (f" Skipped {skipped} already stored." if skipped else ""))
+    return row_counter
 
 
 def recent_tweets_crawler(client, query, tweets_limit, since=None,
                           until=None, folder_path="./data/",
-                          tweets_per_request=100, sleep_delay=15):
+                          tweets_per_request=100, sleep_delay=0,
+                          scheduler=None, file_name=None, flush_rows=500, flush_seconds=30.0,
+                          output_format="csv", resume=False, incremental=False, seeds=None,
+                          index=None, enrich=None, enrich_columns=(), queue_size=8, users=None):
     """
     Crawl recent tweets from Twitter based on specified criteria.
 
@@ -213,16 +369,44 @@ def recent_tweets_crawler(client, query, tweets_limit, since=None,
         until (str, optional): End date for the search in format 'YYYY-MM-DDTHH:mm:ssZ'.
         folder_path (str, optional): Path to the folder for saving the data. Default is "./data/".
         tweets_per_request (int, optional): Number of tweets to retrieve per request. Default is 100.
-        sleep_delay (int, optional): Delay in seconds between requests. Default is 15.
+        sleep_delay (int, optional): Minimum delay in seconds between requests. Default is 0,
+            i.e. requests are paced by the rate limit headers only.
+        scheduler (RequestScheduler, optional): Shared scheduler handing out request slots.
+        file_name (str, optional): Name of the output file without extension.
+            Defaults to a timestamp of the form 'YYYYMMDD_HHMMSS'.
+        flush_rows (int, optional): Number of buffered rows written to disk at once. Default is 500.
+        flush_seconds (float, optional): Maximum time in seconds rows stay buffered. Default is 30.
+        output_format (str, optional): "csv" or "parquet" (dataset partitioned by day and language). Default is "csv".
+        resume (bool, optional): Continue an interrupted crawl of the same query from its checkpoint,
+            appending to the same output. Default is False.
+        incremental (bool, optional): Only fetch tweets newer than the newest tweet of the
+            last crawl of the same query (since_id). Default is False.
+        seeds (dict, optional): Seed keys mapped to phrases if `query` was packed by `plan_queries`.
+            Each tweet is routed back to the seeds it matched in a `matched_seeds` column.
+        index (TweetIdIndex, optional): Cross-run index of stored tweet ids. Tweets already
+            stored by earlier runs are not written again.
+        enrich (callable, optional): Takes a page of rows and returns them extended by `enrich_columns`,
+            e.g. with a translation. Runs in a background thread fed by a queue of `queue_size` pages,
+            so it overlaps with the requests and rate limit waits of the crawler.
+        enrich_columns (Iterable[str], optional): Columns appended by `enrich`.
+        queue_size (int, optional): Maximum number of pages waiting for `enrich`. Default is 8.
+        users (UserStore, optional): Store of tweet authors. Defaults to the store of `folder_path`
+            ('<folder_path>/users.sqlite').
 
     Returns:
-        None
+        str: Path to the CSV file or Parquet dataset with the collected tweets.
 
     Note:
         - The function collects recent tweets based on the provided query and criteria.
-        - The collected tweets are saved in a CSV file with a unique timestamp as the file name.
+        - The collected tweets are saved in a CSV file (or Parquet dataset) with a unique timestamp as the file name.
         - The function continues collecting tweets until the specified limit is reached or there are no more results.
         - The search can be further refined by specifying 'since' and 'until' parameters.
+        - The output file stays open for the whole run; rows are buffered and fsynced when the
+          crawl ends or the process is asked to terminate (see `storage.handle_termination`).
+        - Every time buffered rows reach the output, the pagination state (next token, newest and
+          oldest tweet id, row count) is saved to a checkpoint file per query in '<folder_path>/.checkpoints/'.
+        - A run is completed once the search has no more pages. An incremental run following an
+          uncompleted one continues its pagination, so tweets skipped by the tweets limit are still collected.
 
     Example:
         client = get_twitter_api_client()
@@ -231,12 +415,47 @@ def recent_tweets_crawler(client, query, tweets_limit, since=None,
         recent_tweets_crawler(client, query, tweets_limit, since="2022-01-01T00:00:00Z")
 
     """
+    checkpoint_file = checkpoint_path(folder_path, query)
+    previous = load_checkpoint(checkpoint_file) if resume or incremental else None
 
-    # Generate a unique timestamp
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    file_path = os.path.join(folder_path, f"{timestamp}.csv")
-    saved_tweets_count = 0
-    next_token = None
+    resuming = resume and previous is not None and not previous["completed"]
+    if resuming:
+        print(f"Resuming crawl from checkpoint {checkpoint_file}.")
+        state = previous
+    else:
+        if file_name is None:
+            # Generate a unique timestamp
+            file_name = datetime.now().strftime("%Y%m%d_%H%M%S")
+        state = {
+            "query": query,
+            "file_name": file_name,
+            "output_format": output_format,
+            "since_id": None,
+            "next_token": None,
+            "newest_id": None,
+            "oldest_id": None,
+            "row_count": 0,
+            "output_size": 0,
+            "completed": False
+        }
+        if incremental and previous is not None:
+            # Only ask for tweets newer than everything collected so far. An unfinished run
+            # (stopped by the tweets limit, an error or a shutdown) left a gap between its
+            # starting point and its oldest tweet, so its pagination is continued first.
+            if previous["completed"]:
+                state["since_id"] = previous["newest_id"]
+            else:
+                state.update(since_id=previous["since_id"], next_token=previous["next_token"],
+                             oldest_id=previous["oldest_id"])
+            state["newest_id"] = previous["newest_id"]
+            print(f"Incremental crawl since tweet id {state['since_id']}.")
+
+    file_path = os.path.join(folder_path, state["file_name"])
+    saved_tweets_count = state["row_count"]
+    next_token = state["next_token"]
+    # Pagination of the last fetched page; the checkpointed `state` follows it once the sink holds the page
+    latest = {key: state[key] for key in ("next_token", "newest_id", "oldest_id", "row_count")}
+    completed = False
 
     # Replace with time period of your choice
     # YYYY-MM-DDTHH:mm:ssZ
@@ -245,87 +464,368 @@ def recent_tweets_crawler(client, query, tweets_limit, since=None,
     # Replace with time period of your choice
     # end_time = '2020-08-01T23:59:59Z'
 
-    while True:
+    with _user_store(users, folder_path) as users, \
+            open_sink(file_path, columns=tweet_columns(seeds) + list(enrich_columns), output_format=state["output_format"],
+                      flush_rows=flush_rows, flush_seconds=flush_seconds,
+                      # Drops rows written after the last checkpoint, including a row cut off by a kill
+                      size=state.get("output_size") if resuming else None) as file_sink, \
+            (EnrichingSink(file_sink, enrich, queue_size) if enrich else nullcontext(file_sink)) as sink:
+        def on_flush():
+            # The index, the authors and the checkpoint only advance once the rows of a page reached the output
+            if index is not None:
+                index.commit()
+            users.commit()
+            if state["output_format"] == "csv":
+                state["output_size"] = file_sink.size
+            save_checkpoint(checkpoint_file, state)
+
+        sink.on_flush = on_flush
+
+        while not shutdown_event.is_set():
+            try:
+                response = get_tweets(
+                    client=client,
+                    query=query,
+                    start_time=since,
+                    end_time=until,
+                    next_token=next_token,
+                    max_results=tweets_per_request,
+                    scheduler=scheduler,
+                    since_id=state["since_id"]
+                )
+            except ShutdownRequested:
+                break
+            except Exception as e:
+                print("Error getting tweets", e)
+                break
+
+            # Response meta content:
+            # {'newest_id': '1715330213880472004',
+            # 'oldest_id': '1715110596729840128',
+            # 'result_count': 10,
+            # 'next_token': 'b26v89c19zqg8o3fr5efrxgy7ldru6bjtu3sygkg4jybh'}
+
+            meta = response.meta
+            results_count = meta.get("result_count")
+            next_token = meta.get("next_token")
+
+            if results_count is not None and results_count > 0:
+                saved_tweets_count += results_count
+                latest = page_state = dict(latest, next_token=next_token, row_count=saved_tweets_count)
+                update_id_range(page_state, meta)
+                # The state advances under the sink's lock once it holds the page, so every
+                # checkpoint matches the rows and the output size of the same flush
+                tweets_to_csv(response=response, sink=sink, seeds=seeds, index=index, users=users,
+                              on_written=partial(state.update, page_state))
+
+                if saved_tweets_count >= tweets_limit:
+                    print("Finished scrapping.")
+                    break
+                if next_token:
+                    print(f"Next token: {next_token}. Seved {saved_tweets_count} tweets.")
+                    if sleep_delay:
+                        sleep(sleep_delay)
+                        metrics.inc("wait_seconds_total", sleep_delay, reason="sleep_delay")
+                else:
+                    completed = True
+                    print("Finished scrapping.")
+                    break
+            else:
+                completed = True
+                print("Finished scrapping.")
+                break
+
+    # Only the end of the pagination completes the run; the tweets limit, errors and shutdowns leave it resumable
+    state["completed"] = completed
+    save_checkpoint(checkpoint_file, state)
+
+    return sink.path
+
+
+def multi_query_crawler(client, queries, tweets_limit, since=None,
+                        until=None, folder_path="./data/",
+                        tweets_per_request=100, max_workers=4,
+                        max_requests=60, window_seconds=900,
+                        flush_rows=500, flush_seconds=30.0, output_format="csv",
+                        resume=False, incremental=False, query_seeds=None, index=None, users=None):
+    """
+    Crawl several Twitter search queries concurrently.
+
+    Args:
+        client: Twitter API client.
+        queries (list): Twitter search query strings.
+        tweets_limit (int): Maximum number of tweets to collect per query.
+        since (str, optional): Start date for the search in format 'YYYY-MM-DDTHH:mm:ssZ'.
+        until (str, optional): End date for the search in format 'YYYY-MM-DDTHH:mm:ssZ'.
+        folder_path (str, optional): Path to the folder for saving the data. Default is "./data/".
+        tweets_per_request (int, optional): Number of tweets to retrieve per request. Default is 100.
+        max_workers (int, optional): Number of queries crawled at the same time. Default is 4.
+        max_requests (int, optional): Requests allowed per rate limit window for all queries combined. Default is 60.
+        window_seconds (float, optional): Length of the rate limit window in seconds. Default is 900.
+        flush_rows (int, optional): Number of buffered rows written to disk at once. Default is 500.
+        flush_seconds (float, optional): Maximum time in seconds rows stay buffered. Default is 30.
+        output_format (str, optional): "csv" or "parquet". Default is "csv".
+        resume (bool, optional): Continue interrupted crawls from their checkpoints. Default is False.
+        incremental (bool, optional): Only fetch tweets newer than the last crawl of each query. Default is False.
+        query_seeds (dict, optional): Seeds (key to phrase) of each packed query, see `plan_queries`.
+        index (TweetIdIndex, optional): Cross-run index of stored tweet ids, shared by all queries.
+        users (UserStore, optional): Store of tweet authors, shared by all queries. Defaults to the
+            store of `folder_path`.
+
+    Returns:
+        dict: Mapping of each query to the path of its output file.
+
+    Note:
+        - Every query is crawled by `recent_tweets_crawler` in its own thread.
+        - A single `RequestScheduler` is shared by all threads, so the combined request rate
+          stays within the endpoint limit instead of sleeping a fixed delay after every page.
+        - Each query writes to its own output named '<timestamp>_<query index>'.
+
+    Example:
+        client = get_client(bearer_token)
+        queries = [query_builder("gaza", language=lang) for lang in ("en", "ar", "he")]
+        multi_query_crawler(client, queries, tweets_limit=1000)
+
+    """
+    scheduler = RequestScheduler(max_requests=max_requests, window_seconds=window_seconds)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    output_files = {}
+
+    with _user_store(users, folder_path) as users, ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(
+                recent_tweets_crawler,
+                client=client,
+                query=query,
+                tweets_limit=tweets_limit,
+                since=since,
+                until=until,
+                folder_path=folder_path,
+                tweets_per_request=tweets_per_request,
+                scheduler=scheduler,
+                file_name=f"{timestamp}_{position:03d}",
+                flush_rows=flush_rows,
+                flush_seconds=flush_seconds,
+                output_format=output_format,
+                resume=resume,
+                incremental=incremental,
+                seeds=(query_seeds or {}).get(query),
+                index=index,
+                users=users
+            ): query
+            for position, query in enumerate(queries)
+        }
+
+        try:
+            for future in as_completed(futures):
+                query = futures[future]
+                try:
+                    output_files[query] = future.result()
+                    print(f"Query '{query}' saved to {output_files[query]}.")
+                except Exception as e:
+                    print(f"Error crawling query '{query}'", e)
+        except BaseException:
+            # Let the worker threads close their files before the executor waits for them
+            shutdown_event.set()
+            raise
+
+    return output_files
+
+
+def parse_twitter_time(value):
+    """
+    Parses a Twitter API timestamp.
+
+    Args:
+        value (str): Time in format 'YYYY-MM-DDTHH:mm:ssZ'.
+
+    Returns:
+        datetime: Timezone aware UTC datetime.
+    """
+    return datetime.strptime(value, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc)
+
+
+def split_time_range(start, end, window):
+    """
+    Splits a time range into consecutive windows.
+
+    Args:
+        start (datetime): Start of the range.
+        end (datetime): End of the range.
+        window (timedelta): Length of each window. The last window may be shorter.
+
+    Returns:
+        list: (window_start, window_end) tuples covering [start, end).
+    """
+    windows = []
+    while start < end:
+        windows.append((start, min(start + window, end)))
+        start += window
+    return windows
+
+
+def crawl_time_window(client, query, start, end, tweets_per_request=100, scheduler=None,
+                      min_window=timedelta(minutes=5), users=None):
+    """
+    Paginates through the tweets of one time window, splitting it if it turns out to be dense.
+
+    Args:
+        client: Twitter API client.
+        query (str): Twitter search query string.
+        start (datetime): Start of the window.
+        end (datetime): End of the window.
+        tweets_per_request (int, optional): Number of tweets to retrieve per request. Default is 100.
+        scheduler (RequestScheduler, optional): Shared scheduler handing out request slots.
+        min_window (timedelta, optional): Windows shorter than this are never split. Default is 5 minutes.
+        users (UserStore, optional): Store the authors of the collected tweets are added to.
+
+    Returns:
+        tuple: (rows, sub_windows). `rows` are the collected rows in the order of `TWEET_COLUMNS`.
+            `sub_windows` are the (start, end) windows still to be crawled: if the first page is full
+            and more pages follow, the part of the window older than that page is split in two
+            halves, so it is paginated in parallel instead of by one long cursor chain.
+    """
+    rows = []
+    next_token = None
+
+    while not shutdown_event.is_set():
         response = get_tweets(
             client=client,
             query=query,
-            start_time=since,
-            end_time=until,
+            start_time=start,
+            end_time=end,
             next_token=next_token,
-            max_results=tweets_per_request
+            max_results=tweets_per_request,
+            scheduler=scheduler
         )
 
-        """
-        TODO: ADD RESPONSE HANDLING!
-        ============================
-
-        As in tweepy.paginator:
-        +++++++++++++++++++++++++++++++++++++++++++++++++++++++
-        response = self.method(*self.args, **self.kwargs)
+        results_count = response.meta.get("result_count")
+        next_token = response.meta.get("next_token")
+        if not results_count:
+            break
 
-        if isinstance(response, Response):
-            meta = response.meta
-        elif isinstance(response, dict):
-            meta = response.get("meta", {})
-        elif isinstance(response, requests.Response):
-            meta = response.json().get("meta", {})
-        else:
-            raise RuntimeError(
-                f"Unknown {type(response)} return type for "
-                f"{self.method.__qualname__}"
-            )
+        page_rows = list(tweet_rows(response))
+        rows.extend(page_rows)
+        if users is not None:
+            users.add_users(response.includes.get("users", []))
+        if not next_token:
+            break
 
-        self.previous_token = meta.get("previous_token")
-        self.next_token = meta.get("next_token")
-        self.count += 1
+        if len(rows) == len(page_rows) and end - start > min_window:
+            # Dense window: the first page covers [oldest tweet, end), split what remains.
+            # The boundary second is kept in both parts, duplicates are removed when merging.
+            oldest = min(row[0] for row in page_rows) + timedelta(seconds=1)
+            if start < oldest < end:
+                middle = start + (oldest - start) / 2
+                return rows, [(start, middle), (middle, oldest)]
 
-        return response
-        +++++++++++++++++++++++++++++++++++++++++++++++++++++++
-        """
-        # Response meta content:
-        # {'newest_id': '1715330213880472004',
-        # 'oldest_id': '1715110596729840128',
-        # 'result_count': 10,
-        # 'next_token': 'b26v89c19zqg8o3fr5efrxgy7ldru6bjtu3sygkg4jybh'}
-
-        meta = response.meta
-        results_count = meta["result_count"]
-        next_token = meta["next_token"]
-
-        if results_count is not None and results_count > 0:
-            tweets_to_csv(response=response, destination_name=file_path)
-            saved_tweets_count += results_count
-
-            if saved_tweets_count >= tweets_limit:
-                print("Finished scrapping.")
-                break
-            if next_token:
-                print(f"Next token: {next_token}. Seved {saved_tweets_count} tweets.")
-                time.sleep(sleep_delay)
-            else:
-                print("Finished scrapping.")
-                break
-        else:
-            print("Finished scrapping.")
-            break
+    return rows, []
 
 
-def env_variable_handler(variable):
+def backfill_crawler(client, query, since=None, until=None, folder_path="./data/",
+                     tweets_per_request=100, window=timedelta(hours=1), max_parallel=4,
+                     max_requests=60, window_seconds=900, file_name=None,
+                     flush_rows=500, flush_seconds=30.0, output_format="csv", index=None, users=None):
     """
-    Handles a specific environment variable.
+    Backfill a time range by crawling its time windows in parallel.
 
     Args:
-        variable (str): The environment variable to handle.
+        client: Twitter API client.
+        query (str): Twitter search query string.
+        since (str, optional): Start date in format 'YYYY-MM-DDTHH:mm:ssZ'. Defaults to 7 days ago,
+            the limit of the recent search endpoint.
+        until (str, optional): End date in format 'YYYY-MM-DDTHH:mm:ssZ'. Defaults to now.
+        folder_path (str, optional): Path to the folder for saving the data. Default is "./data/".
+        tweets_per_request (int, optional): Number of tweets to retrieve per request. Default is 100.
+        window (timedelta, optional): Length of the initial windows. Default is 1 hour.
+        max_parallel (int, optional): Number of windows paginated at the same time. Default is 4.
+        max_requests (int, optional): Requests allowed per rate limit window for all windows combined. Default is 60.
+        window_seconds (float, optional): Length of the rate limit window in seconds. Default is 900.
+        file_name (str, optional): Name of the output file without extension.
+            Defaults to a timestamp of the form 'YYYYMMDD_HHMMSS'.
+        flush_rows (int, optional): Number of buffered rows written to disk at once. Default is 500.
+        flush_seconds (float, optional): Maximum time in seconds rows stay buffered. Default is 30.
+        output_format (str, optional): "csv" or "parquet". Default is "csv".
+        index (TweetIdIndex, optional): Cross-run index of stored tweet ids. Tweets already
+            stored by earlier runs are not written again.
+        users (UserStore, optional): Store of tweet authors. Defaults to the store of `folder_path`.
 
     Returns:
-        str or None: The processed value of the environment variable.
+        str: Path to the CSV file or Parquet dataset with the collected tweets.
+
+    Note:
+        - Windows that turn out to be dense are split adaptively (see `crawl_time_window`).
+        - Results of all windows are merged, deduplicated by `tweet_id` and written newest first,
+          the same order as `recent_tweets_crawler`, once all windows are done.
+        - A window that fails after all retries is reported and skipped.
+
+    Example:
+        client = get_client(bearer_token)
+        backfill_crawler(client, "hamas lang:en", since="2023-10-10T00:00:00Z", until="2023-10-17T00:00:00Z")
+
     """
-    # Check if the variable is set
-    if variable is not None:
-        # Check if it's an empty string or the string "None"
-        if variable == "" or variable.lower() == "none":
-            return None
-        else:
-            return variable
-    else:
-        return None
+    now = datetime.now(timezone.utc) - timedelta(seconds=30)
+    start = parse_twitter_time(since) if since else now - timedelta(days=7) + timedelta(minutes=1)
+    end = min(parse_twitter_time(until), now) if until else now
+
+    if file_name is None:
+        file_name = datetime.now().strftime("%Y%m%d_%H%M%S")
+    scheduler = RequestScheduler(max_requests=max_requests, window_seconds=window_seconds)
+    tweets = {}
+
+    with _user_store(users, folder_path) as users, ThreadPoolExecutor(max_workers=max_parallel) as executor:
+        pending = {}
+
+        def submit(window_start, window_end):
+            future = executor.submit(
+                crawl_time_window,
+                client=client,
+                query=query,
+                start=window_start,
+                end=window_end,
+                tweets_per_request=tweets_per_request,
+                scheduler=scheduler,
+                users=users
+            )
+            pending[future] = (window_start, window_end)
+
+        for window_start, window_end in split_time_range(start, end, window):
+            submit(window_start, window_end)
+
+        try:
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    window_start, window_end = pending.pop(future)
+                    try:
+                        rows, sub_windows = future.result()
+                    except ShutdownRequested:
+                        continue
+                    except Exception as e:
+                        print(f"Error crawling window {window_start} - {window_end}", e)
+                        continue
+
+                    for row in rows:
+                        tweets[row[1]] = row
+                    for sub_start, sub_end in sub_windows:
+                        print(f"Splitting dense window into {sub_start} - {sub_end}.")
+                        submit(sub_start, sub_end)
+                    print(f"Window {window_start} - {window_end}: {len(rows)} tweets, {len(tweets)} unique so far.")
+        except BaseException:
+            shutdown_event.set()
+            raise
+
+    tweet_ids = sorted(tweets, key=int, reverse=True)
+    if index is not None:
+        tweet_ids = [tweet_id for tweet_id in tweet_ids if tweet_id not in index]
+        index.add_many(tweet_ids)
+
+    file_path = os.path.join(folder_path, file_name)
+    with open_sink(file_path, columns=TWEET_COLUMNS, output_format=output_format,
+                   flush_rows=flush_rows, flush_seconds=flush_seconds) as sink:
+        sink.write_rows(tweets[tweet_id] for tweet_id in tweet_ids)
+    if index is not None:
+        index.commit()
+
+    print(f"Finished backfill. Wrote {len(tweet_ids)} of {len(tweets)} tweets to {sink.path}.")
+    return sink.path